@@ -11,6 +11,7 @@ import gpiozero as gpz
 from utils import serial_utils  # CRC_TABLE
 from utils import file_utils    # get_timestamped_filename(), make_file(), write_pcd_header_to_file()
 from utils import math_utils    # pol_to_cart_array()
+from utils import metrics_utils # Metrics
 from utils import pin_utils as pins    # LiDAR pins
 
 class Lidar:
@@ -32,9 +33,13 @@ class Lidar:
             with the STL27L communication protocol (0x54).
         hit_rate_threshold (float): The percentage of points per ring above 
             which a ring is considered acceptable.
+        packet_delay_s (float): The pause after each packet read, giving the
+            sensor time to scan. Only zero it for simulated serial ports.
         pwm_pin (OutputDevice): The PWM control pin, currently pulled low 
             (~10Hz). Note that this is currently on a digital (non-PWM) pin.
         serial (Serial): The pyserial connection between Raspberry Pi and LiDAR.
+        metrics (Metrics): Packet, CRC, resync and ring retry counters, and 
+            ring capture and decode timers.
     '''
 
     def __init__(self) -> None:
@@ -48,16 +53,24 @@ class Lidar:
         self.packet_size = 47
         self.start_byte  = 0x54
         self.hit_rate_threshold = 0.80
+        self.packet_delay_s = 0.0005
 
         self.pwm_pin = gpz.OutputDevice(pin=pins.LIDAR_PWM, initial_value=False)
         
         self.serial = serial.Serial()
 
+        self.metrics = metrics_utils.Metrics()
+
     def open_serial(self) -> None:
         '''
         Opens a serial connection with parameters set in the class initializer.
         '''
 
+        # Already streaming (drive mode), just drop anything stale
+        if self.serial.is_open:
+            self.serial.reset_input_buffer()
+            return
+
         self.serial.port = pins.LIDAR_PORT	    # UART port on GPIO 14 and 15
         self.serial.baudrate = serial_utils.LIDAR_BAUDRATE  # STL27L Baudrate
         self.serial.bytesize = 8                # 8 bits per byte
@@ -102,6 +115,7 @@ class Lidar:
             if (len(data) != self.packet_size):
                 if verbose: 
                     print("Incorrect Packet Size! N =", len(data), end='')
+                self.metrics.incr("short_reads")
                 packets += 1
                 continue
             
@@ -110,6 +124,7 @@ class Lidar:
                 if verbose: 
                     print("Misaligned Packet!", end='')
                 self.serial.read_until(bytes(self.start_byte))  # Realigns stream
+                self.metrics.incr("resyncs")
                 packets += 1
                 continue
             
@@ -118,12 +133,15 @@ class Lidar:
                 if verbose: 
                     print("Incorrect Checksum!", end='')
                 self.serial.read_until(bytes(self.start_byte))  # Realigns stream
+                self.metrics.incr("crc_failures")
+                self.metrics.incr("resyncs")
                 packets += 1
                 continue
             
             data_arr.append(data)
+            self.metrics.incr("packets_read")
 
-            time.sleep(0.0005)	# Allow time to scan, this cannot be zero!
+            time.sleep(self.packet_delay_s)	# Allow time to scan, this cannot be zero!
             
         return data_arr 
 
@@ -192,6 +210,7 @@ class Lidar:
                 stepper motor.
         '''
 
+        start_s: float = time.perf_counter()
         while True:
             ring: list[list[float]] = []
             packets: list[bytes] = self.capture_packets(
@@ -203,11 +222,71 @@ class Lidar:
 
             if len(ring) >= self.max_packets * 12 * self.hit_rate_threshold:
                 break
+            self.metrics.incr("ring_retries")
+
+        self.metrics.add_time("ring_capture", time.perf_counter() - start_s)
+        self.metrics.incr("rings")
+        self.metrics.incr("points", len(ring))
 
         if verbose: print(f"Recieved {len(ring)} points...")
         
         return ring
 
+    def decode_packets(self, packets: list[bytes]) -> numpy.ndarray:
+        '''
+        Vectorized process_packet() for a whole ring of packets at once.
+
+        Args:
+            packets (list[bytes]): Validated packets, as from capture_packets().
+        Returns:
+            points (numpy.ndarray): An (N, 3) float32 array of (rho, phi, 
+                intensity) points, with rho in meters and phi in degrees.
+        '''
+
+        if not packets:
+            return numpy.empty((0, 3), dtype=numpy.float32)
+
+        raw = numpy.frombuffer(b''.join(packets), dtype=numpy.uint8)
+        raw = raw.reshape(-1, self.packet_size).astype(numpy.int32)
+
+        start_angle = raw[:, 5] * (2**8) + raw[:, 4]            # 0.01 deg
+        end_angle = raw[:, 43] * (2**8) + raw[:, 42]            # 0.01 deg
+        angle_delta = numpy.where(end_angle < start_angle,
+            end_angle - start_angle + 36000, end_angle - start_angle) / 11
+
+        samples = raw[:, 6:42].reshape(-1, 12, 3)               # dist LSB, MSB, intensity
+        points = numpy.empty((len(packets), 12, 3), dtype=numpy.float32)
+        points[:, :, 0] = (samples[:, :, 1] * (2**8) + samples[:, :, 0]) / 1000
+        points[:, :, 1] = (start_angle[:, None] 
+            + angle_delta[:, None] * numpy.arange(12)) / 100 % 360
+        points[:, :, 2] = samples[:, :, 2] / 255
+
+        return points.reshape(-1, 3)
+
+    def capture_ring_array(self) -> numpy.ndarray:
+        '''
+        Obtains a ring's worth of points as a numpy array, retrying until the
+        hit rate threshold is met like capture_ring(). The serial connection
+        must already be open.
+
+        Returns:
+            ring (numpy.ndarray): An (N, 3) array of (rho, phi, intensity).
+        '''
+
+        start_s: float = time.perf_counter()
+        while True:
+            packets: list[bytes] = self.capture_packets(self.max_packets)
+            with self.metrics.timed("decode"):
+                ring = self.decode_packets(packets)
+            if len(ring) >= self.max_packets * 12 * self.hit_rate_threshold:
+                break
+            self.metrics.incr("ring_retries")
+
+        self.metrics.add_time("ring_capture", time.perf_counter() - start_s)
+        self.metrics.incr("rings")
+        self.metrics.incr("points", len(ring))
+        return ring
+
     def validate_crc(self, packet: bytes) -> int:
         '''
         Calculates the CRC8 checksum of a data packet in accordance with the 
@@ -14,10 +14,187 @@ Compatible with A4988 Stepper motor driver and NEMA17 stepper motor.
 #################################
 
 import gpiozero as gpz		# gpz.OutputDevice, gpz.CompositeOutputDevice
-from time import sleep
+from gpiozero.pins.mock import MockFactory
+from math import sqrt
+from time import perf_counter, sleep
 
+try:
+    import pigpio           # DMA-timed waveforms, needs the pigpiod daemon
+except ImportError:
+    pigpio = None
+
+from utils import metrics_utils # Metrics
 from utils import pin_utils as pins
 
+# Fastest safe speed per backend in Hz (revolutions per second). Bit-banged
+# pulses are limited by Python sleep jitter; waveforms are timed by DMA.
+SPEED_LIMITS_HZ: dict[str, float] = {"gpiozero": 4.5, "pigpio": 10.0, "mock": 10.0}
+ACCEL_HZ_PER_S = 50.0       # Trapezoidal ramp acceleration (rev/s^2)
+START_SPEED_HZ = 1.0        # Ramps start and end here, safe without a ramp (rev/s)
+STEP_PULSE_US = 5           # STEP high time, A4988 needs at least 1 us
+WAVE_CHUNK_STEPS = 2000     # Steps per pigpio waveform (pulse memory is finite)
+WAVE_POLL_S = 0.002         # How often to check whether a waveform finished
+
+
+def ramp_delays(steps: int, speed_hz: float, steps_per_rev: int,
+                accel_hz_per_s: float = ACCEL_HZ_PER_S,
+                start_hz: float = START_SPEED_HZ) -> list[float]:
+    """
+    Plans a trapezoidal velocity profile for a move: accelerate from start_hz,
+    cruise at speed_hz, decelerate back to start_hz. Short moves never reach
+    cruise speed and get a triangular profile instead.
+
+    Args:
+        steps (int): The number of steps in the move.
+        speed_hz (float): The cruise speed in revolutions per second.
+        steps_per_rev (int): Steps per revolution at the current microstep
+            resolution.
+        accel_hz_per_s (float): Acceleration in revolutions per second^2.
+        start_hz (float): The speed of the first and last step.
+    Returns:
+        delays (list[float]): The period of each step in seconds.
+    """
+
+    v_max: float = speed_hz * steps_per_rev
+    v_0: float = min(start_hz, speed_hz) * steps_per_rev
+    accel: float = accel_hz_per_s * steps_per_rev
+
+    delays: list[float] = []
+    for i in range(0, steps):
+        ramp: float = v_0 ** 2 + 2 * accel * min(i, steps - 1 - i)
+        delays.append(1 / min(v_max, sqrt(ramp)))
+    return delays
+
+
+class GpioStepper:
+    """
+    Bit-bangs the STEP pin through gpiozero, timing pulses with sleep().
+
+    Attributes:
+        name (str): The backend name ("gpiozero").
+        step (gpiozero.OutputDevice): The motor driver's step pin.
+    """
+
+    name: str = "gpiozero"
+
+    def __init__(self, step_pin: int, pin_factory=None) -> None:
+        self.step: gpz.OutputDevice = gpz.OutputDevice(
+            pin=step_pin, pin_factory=pin_factory)
+
+    def pulse(self, delays: list[float]) -> None:
+        '''
+        Sends one step per entry in delays, each lasting that many seconds.
+        '''
+        for delay in delays:
+            self.step.on()
+            sleep(delay/2)
+            self.step.off()
+            sleep(delay/2)
+
+    def close(self) -> None:
+        self.step.close()
+
+
+class MockStepper(GpioStepper):
+    """
+    Toggles a gpiozero mock pin without sleeping, for testing off the Pi.
+
+    Attributes:
+        name (str): The backend name ("mock").
+        step (gpiozero.OutputDevice): The (mock) step pin.
+        steps (int): The total number of steps sent.
+        elapsed_s (float): How long the steps sent would have taken.
+    """
+
+    name: str = "mock"
+
+    def __init__(self, step_pin: int, pin_factory=None) -> None:
+        super().__init__(step_pin, pin_factory)
+        self.steps: int = 0
+        self.elapsed_s: float = 0.0
+
+    def pulse(self, delays: list[float]) -> None:
+        for delay in delays:
+            self.step.on()
+            self.step.off()
+        self.steps += len(delays)
+        self.elapsed_s += sum(delays)
+
+
+class PigpioStepper:
+    """
+    Sends step trains as DMA-timed pigpio waveforms. Long moves are split into
+    chunks, each queued to start the instant the previous one ends, so the
+    pulse train is seamless while the CPU sleeps.
+
+    Attributes:
+        name (str): The backend name ("pigpio").
+        pi (pigpio.pi): The connection to the pigpiod daemon.
+        step_pin (int): The BCM number of the motor driver's step pin.
+    """
+
+    name: str = "pigpio"
+
+    def __init__(self, step_pin: int) -> None:
+        """
+        Connects to the pigpio daemon and claims the step pin.
+
+        Args:
+            step_pin (int): The BCM number of the step pin.
+        Raises:
+            RuntimeError: If pigpio isn't installed or pigpiod isn't running.
+        """
+
+        if pigpio is None:
+            raise RuntimeError("[ERR] motor.py: pigpio is not installed!")
+
+        self.pi = pigpio.pi()
+        if not self.pi.connected:
+            raise RuntimeError("[ERR] motor.py: Could not connect to pigpiod!")
+
+        self.step_pin: int = step_pin
+        self.pi.set_mode(step_pin, pigpio.OUTPUT)
+        self.pi.wave_clear()
+
+    def make_wave(self, delays: list[float]) -> int:
+        '''
+        Builds a waveform of one step per entry in delays and returns its ID.
+        '''
+        mask: int = 1 << self.step_pin
+        pulses: list = []
+        for delay in delays:
+            period_us: int = max(2 * STEP_PULSE_US, round(delay * 1e6))
+            pulses.append(pigpio.pulse(mask, 0, STEP_PULSE_US))
+            pulses.append(pigpio.pulse(0, mask, period_us - STEP_PULSE_US))
+        self.pi.wave_add_generic(pulses)
+        return self.pi.wave_create()
+
+    def pulse(self, delays: list[float]) -> None:
+        '''
+        Sends one step per entry in delays, blocking until the last one is out.
+        '''
+        queued: list[int] = []
+        for i in range(0, len(delays), WAVE_CHUNK_STEPS):
+            wave_id: int = self.make_wave(delays[i:i + WAVE_CHUNK_STEPS])
+            self.pi.wave_send_using_mode(wave_id, pigpio.WAVE_MODE_ONE_SHOT_SYNC)
+            queued.append(wave_id)
+
+            # Keep one chunk queued behind the one transmitting, no more
+            while len(queued) > 1 and self.pi.wave_tx_at() == queued[-2]:
+                sleep(WAVE_POLL_S)
+            while len(queued) > 1:
+                self.pi.wave_delete(queued.pop(0))
+
+        while self.pi.wave_tx_busy():
+            sleep(WAVE_POLL_S)
+        for wave_id in queued:
+            self.pi.wave_delete(wave_id)
+
+    def close(self) -> None:
+        self.pi.wave_tx_stop()
+        self.pi.wave_clear()
+        self.pi.stop()
+
 
 class Motor:
     """
@@ -35,11 +212,15 @@ class Motor:
         ms_res_denom (int): The denominator of the current microstep resolution.
         dir (str): The motor's turn direction. Either clockwise ("CW") or 
             counterclockwise ("CCW"). 
-        step (gpiozero.OutputDevice): A GPZ device that provides access to the 
-            motor driver's step pin via the step.on() and step.off() methods.
-        speed (float): The speed at which the motor turns in Hz (0, 4.5].
+        stepper (GpioStepper | MockStepper | PigpioStepper): The backend that
+            sends pulses to the motor driver's step pin.
+        pin_factory (MockFactory | None): The gpiozero pin factory used for 
+            every pin, or None for the default (real) pins.
+        speed (float): The speed at which the motor turns in Hz, up to the 
+            backend's limit in SPEED_LIMITS_HZ.
         start_angle (float): The starting angle of the motor in degrees.
         curr_angle (float): The current angle of the motor in degrees.
+        metrics (Metrics): Move and step counters and the move timer.
     """
 
     microstep_resolutions: dict[str, dict[str, tuple[int,int,int] | int]] = {
@@ -50,31 +231,75 @@ class Motor:
         "sixteenth":{ "pin_vals": (1,1,1), "denom": 16 }
     }
 
-    def __init__(self, res_name: str, start_angle: float, speed: float) -> None:
+    def __init__(self, res_name: str, start_angle: float, speed: float,
+                 backend: str = "auto") -> None:
         """
         Initializes a motor object by attaching R.Pi GPIO pins to various fields
         and declaring the speed and starting angle.
         
         Args:
             res_name (str): The name of the microstep resolution of the motor.
-            speed (float): The speed at which the motor turns in Hz (0, 4.5].
+            speed (float): The speed at which the motor turns in Hz.
             start_angle (float): The starting angle of the motor in degrees.
+            backend (str): How step pulses are sent: "pigpio" (DMA-timed 
+                waveforms), "gpiozero" (bit-banged), "mock" (mock pins, no 
+                sleeping), or "auto" (pigpio if pigpiod is running, otherwise
+                gpiozero). Defaults to "auto".
+        Raises:
+            ValueError: If the backend or speed is invalid.
         """
         
+        self.metrics = metrics_utils.Metrics()
+        self.pin_factory: MockFactory | None = MockFactory() if backend == "mock" else None
+        self.stepper: GpioStepper | MockStepper | PigpioStepper = \
+            self.make_stepper(backend)
+
         self.ms_res_pins: gpz.CompositeOutputDevice = gpz.CompositeOutputDevice(
-            MS1 = gpz.OutputDevice(pin=pins.MS1_PIN),
-            MS2 = gpz.OutputDevice(pin=pins.MS2_PIN),
-            MS3 = gpz.OutputDevice(pin=pins.MS3_PIN))
+            MS1 = gpz.OutputDevice(pin=pins.MS1_PIN, pin_factory=self.pin_factory),
+            MS2 = gpz.OutputDevice(pin=pins.MS2_PIN, pin_factory=self.pin_factory),
+            MS3 = gpz.OutputDevice(pin=pins.MS3_PIN, pin_factory=self.pin_factory),
+            pin_factory=self.pin_factory)
         self.ms_res: str = "full"                            # Always overriden
         self.ms_res_denom: int = 1                           # Always overriden
         self.set_microstep_resolution(res_name)
 
-        self.dir: gpz.OutputDevice = gpz.OutputDevice(pin=pins.DIR_PIN)
-        self.step: gpz.OutputDevice = gpz.OutputDevice(pin=pins.STEP_PIN)
-        self.speed: float = speed
+        self.dir: gpz.OutputDevice = gpz.OutputDevice(
+            pin=pins.DIR_PIN, pin_factory=self.pin_factory)
+        self.speed: float = 0.0
+        self.set_speed(speed)
         self.start_angle: float = start_angle
         self.curr_angle: float = start_angle
 
+    def make_stepper(self, backend: str) -> GpioStepper | MockStepper | PigpioStepper:
+        """
+        Creates the step pulse backend.
+
+        Args:
+            backend (str): "pigpio", "gpiozero", "mock", or "auto".
+        Returns:
+            stepper (GpioStepper | MockStepper | PigpioStepper): The backend.
+        Raises:
+            ValueError: If backend is not a known backend.
+            RuntimeError: If "pigpio" was requested but is unavailable.
+        """
+
+        match backend:
+            case "pigpio":
+                return PigpioStepper(pins.STEP_PIN)
+            case "gpiozero":
+                return GpioStepper(pins.STEP_PIN)
+            case "mock":
+                return MockStepper(pins.STEP_PIN, self.pin_factory)
+            case "auto":
+                try:
+                    return PigpioStepper(pins.STEP_PIN)
+                except RuntimeError as e:
+                    print(f"{e} Falling back to gpiozero step pulses.")
+                    return GpioStepper(pins.STEP_PIN)
+            case _:
+                raise ValueError(
+                    f"[ERR] motor.py: Invalid stepper backend! ('{backend}')")
+
     def set_microstep_resolution(self, res_name: str) -> None:
         """
         Sets the microstep resolution by looking up the argument key in the 
@@ -104,14 +329,16 @@ class Motor:
         Sets the speed of the motor.
 
         Args:
-            speed (float): The speed at which the motor turns in Hz (0, 4.5].
+            speed (float): The speed at which the motor turns in Hz, in 
+                (0, SPEED_LIMITS_HZ[backend]].
         Raises:
             ValueError: If speed is outside of the valid range.
         """
 
-        if speed <= 0 or speed > 4.5:
+        limit: float = SPEED_LIMITS_HZ[self.stepper.name]
+        if speed <= 0 or speed > limit:
             raise ValueError(
-                f"[ERR] motor.py: Invalid speed (0, 4.5]! ({speed})")
+                f"[ERR] motor.py: Invalid speed (0, {limit}]! ({speed})")
         
         self.speed = speed
 
@@ -144,8 +371,9 @@ class Motor:
 
     def turn(self, direction: str, steps: int, verbose: bool = False) -> None:
         """
-        Turns the stepper motor a specified number of steps. Also updates
-        curr_angle in accordance with the current microstep resolution. 
+        Turns the stepper motor a specified number of steps along a 
+        trapezoidal speed ramp. Also updates curr_angle in accordance with the
+        current microstep resolution. 
 
         Args:
             steps (int): The number of steps to turn.
@@ -160,16 +388,17 @@ class Motor:
             raise ValueError(f"Steps argument must be positive! ({steps})")
 
         degrees: float = float(steps) / (200 * self.ms_res_denom) * 360
-        step_delay: float = 1 / (200 * self.ms_res_denom * self.speed)
+        delays: list[float] = ramp_delays(
+            steps, self.speed, steps_per_rev=200 * self.ms_res_denom)
         
         if verbose:
             print(f"Current Angle: {round(self.curr_angle, 3)}")
 
-        for i in range(0, steps):
-            self.step.on()
-            sleep(step_delay/2)
-            self.step.off()
-            sleep(step_delay/2)
+        start_s: float = perf_counter()
+        self.stepper.pulse(delays)
+        self.metrics.add_time("move", perf_counter() - start_s)
+        self.metrics.incr("moves")
+        self.metrics.incr("steps", steps)
 
         if direction == "CCW":
             self.curr_angle += degrees
@@ -0,0 +1,150 @@
+'''
+Drive mode obstacle stream for AEGIS senior design.
+While the rover drives, the scanner's motor is parked and the LiDAR streams
+rings continuously (~10 Hz). Each ring is reduced to the nearest return per
+angular bin. The nearest return is recorded with telemetry, and the whole
+latest histogram is published on its own (see on_histogram) for the viewer's
+/obstacles route, so it isn't written into the trip JSON every second.
+
+The STL27L spins in a vertical plane, so with the motor parked at rest a ring
+is a slice through the rover's heading: ahead, overhead, behind, and the
+ground. Bin 0 is the LiDAR's zero angle; angles increase with LiDAR phi.
+
+Drive mode shares the hardware with ScanService and always gives way to it:
+it takes the hardware lock one ring at a time and pauses while any scan is
+running or queued.
+'''
+
+from threading import Event, Thread
+from typing import Callable
+import time
+
+import numpy as np
+
+from lidar import scan_jobs
+from utils import math_utils    # polar_min_histogram()
+
+OBSTACLE_BINS = 360             # 1 degree bins
+DRIVE_PARK_POSITION = "rest"    # Where the motor is parked while streaming
+YIELD_POLL_S = 0.1              # How often to check if a scan has finished
+
+
+class ObstacleStream:
+    """
+    Streams LiDAR rings in drive mode and keeps the latest obstacle histogram.
+
+    Attributes:
+        scans (ScanService): Owns the scanner's hardware; scans take priority.
+        bins (int): The number of angular bins per histogram.
+        histogram (np.ndarray | None): Nearest return per bin in meters (zero
+            for no return) of the latest ring.
+        seq (int): The number of rings processed.
+        updated_s (float | None): When the latest histogram was produced.
+        process_ms (float): How long the latest ring took to reduce.
+        on_histogram (Callable | None): Called with histogram_summary() after
+            every ring, on the streaming thread.
+    """
+
+    def __init__(self, scans: scan_jobs.ScanService, bins: int = OBSTACLE_BINS) -> None:
+        self.scans: scan_jobs.ScanService = scans
+        self.bins: int = bins
+        self.histogram: np.ndarray | None = None
+        self.seq: int = 0
+        self.updated_s: float | None = None
+        self.process_ms: float = 0.0
+        self.on_histogram: Callable[[dict], None] | None = None
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        '''
+        Starts streaming on a background thread. Has no effect if running.
+        '''
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print("[INI] obstacles.py: Drive mode obstacle stream started.")
+
+    def stop(self, timeout: float | None = None) -> None:
+        '''
+        Stops streaming after the ring in progress and closes the LiDAR port.
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            obstacles (dict): The latest histogram's nearest return and age,
+                as recorded with telemetry.
+        """
+
+        histogram = self.histogram
+        if histogram is None or self.updated_s is None:
+            return {"streaming": self.running, "seq": self.seq}
+
+        hits = np.flatnonzero(histogram)
+        nearest = hits[np.argmin(histogram[hits])] if len(hits) else None
+        return {
+            "streaming":   self.running,
+            "seq":         self.seq,
+            "age_ms":      round((time.time() - self.updated_s) * 1000),
+            "nearest_m":   round(float(histogram[nearest]), 3) if nearest is not None else None,
+            "nearest_deg": round(float(nearest * 360 / self.bins), 1) if nearest is not None else None
+        }
+
+    def histogram_summary(self) -> dict:
+        """
+        Returns:
+            obstacles (dict): summary(), plus the latest histogram in
+                millimeters (0 for no return), its bin size and processing
+                time.
+        """
+
+        out: dict = self.summary()
+        if self.histogram is not None:
+            out.update(process_ms=round(self.process_ms, 3), bin_deg=360 / self.bins,
+                       ranges_mm=np.round(self.histogram * 1000).astype(int).tolist())
+        return out
+
+    def _run(self) -> None:
+        '''
+        Streaming loop. Holds the hardware lock for one ring at a time and
+        closes the port (while still holding it) before giving way to a scan.
+        '''
+
+        scanner = self.scans.scanner
+        try:
+            while not self._stop.is_set():
+                if self.scans.busy:
+                    time.sleep(YIELD_POLL_S)
+                    continue
+
+                with self.scans.hardware_lock:
+                    if scanner.position != DRIVE_PARK_POSITION:
+                        scanner.move_to(DRIVE_PARK_POSITION)
+                    scanner.lidar.open_serial()
+                    ring: np.ndarray = scanner.lidar.capture_ring_array()
+                    if self.scans.busy:
+                        scanner.lidar.close_serial()    # Hand over to the scan
+
+                start_s: float = time.perf_counter()
+                self.histogram = math_utils.polar_min_histogram(
+                    ring[:, 0], ring[:, 1], self.bins)
+                self.process_ms = (time.perf_counter() - start_s) * 1000
+                self.updated_s = time.time()
+                self.seq += 1
+                if self.on_histogram is not None:
+                    self.on_histogram(self.histogram_summary())
+        except Exception as e:
+            print(f"[ERR] obstacles.py: Obstacle stream stopped! ({e})")
+        finally:
+            with self.scans.hardware_lock:
+                scanner.lidar.close_serial()
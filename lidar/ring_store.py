@@ -0,0 +1,315 @@
+'''
+Ring storage for AEGIS senior design scans.
+Holds captured rings as compact float32 arrays within a memory budget. Rings
+captured after the budget is used up are spilled to a binary file next to the
+scan, so very dense scans never have to fit in memory. Readers get the rings
+back, in capture order, either one at a time or in fixed-size chunks.
+
+A checkpointed scan journals every ring to the file instead (synced as it is
+written), next to a small JSON checkpoint holding the scan's plan and motor
+position, so an interrupted scan can be resumed or its partial cloud read.
+
+Spill file layout, one record per ring:
+
+    [ position in steps (i32) | point count (u32) | points (f32 x 4 x count) ]
+
+Each point is (rho, phi, theta, intensity), as returned by capture_ring().
+'''
+
+from itertools import islice
+from typing import Iterator
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from utils import file_utils    # get_timestamped_filename()
+
+RING_HEADER = struct.Struct("<iI")  # Position in steps, number of points
+POINT_FIELDS = 4                    # rho, phi, theta, intensity
+POINT_BYTES = POINT_FIELDS * 4      # float32
+DEFAULT_MEMORY_BUDGET_MB = 64.0     # ~1400 rings of ~2,900 points
+CHUNK_POINTS = 262144               # Points per chunk when streaming rings out
+CHECKPOINT_EXT = '.ckpt'            # JSON, but kept out of the viewer's .json list
+FAILED_EXT = '.failed'              # Appended to checkpoints that keep failing
+MAX_SCAN_FAILURES = 3               # Failed attempts before a scan is given up on
+
+
+class RingStore:
+    """
+    The rings of one scan, in memory up to a budget and on disk beyond it.
+
+    Attributes:
+        spill_dir (str): The folder the spill file is created in.
+        memory_budget_bytes (int): How many bytes of rings to keep in memory.
+        memory_rings (list[tuple[int, np.ndarray]]): The in-memory rings and
+            their positions in steps.
+        memory_bytes (int): The size of the in-memory rings.
+        spill_path (str | None): The spill file, once the budget is exceeded,
+            or the journal.
+        journal (bool): Whether every ring is written (and synced) to the 
+            spill file, not just those beyond the budget.
+        spilled_rings (int): The number of rings only in the spill file.
+        num_points (int): The total number of points stored.
+    """
+
+    def __init__(self, spill_dir: str = '.',
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                 journal_path: str | None = None) -> None:
+        self.spill_dir: str = spill_dir
+        self.memory_budget_bytes: int = int(memory_budget_mb * 1024 * 1024)
+        self.memory_rings: list[tuple[int, np.ndarray]] = []
+        self.memory_bytes: int = 0
+        self.spill_path: str | None = journal_path
+        self.journal: bool = journal_path is not None
+        self.spilled_rings: int = 0
+        self.num_points: int = 0
+        self._spilling: bool = False
+        self._spill_file = None
+
+    @classmethod
+    def reopen(cls, journal_path: str,
+               memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB) -> "RingStore":
+        """
+        Reopens the journal of an interrupted scan to read or extend it. A
+        ring cut short by the interruption is discarded.
+
+        Args:
+            journal_path (str): The journal file.
+            memory_budget_mb (float): The budget for rings appended from now.
+        Returns:
+            rings (RingStore): The journaled rings, read from disk as needed.
+        """
+
+        store = cls(os.path.dirname(journal_path) or '.', memory_budget_mb, journal_path)
+        store._spilling = True      # Memory must hold a prefix of the journal
+        if not os.path.exists(journal_path):
+            return store
+
+        valid_bytes: int = 0
+        for _, ring in read_spill_file(journal_path):
+            store.spilled_rings += 1
+            store.num_points += len(ring)
+            valid_bytes += RING_HEADER.size + ring.nbytes
+        with open(journal_path, 'ab') as file:
+            file.truncate(valid_bytes)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.memory_rings) + self.spilled_rings
+
+    def append(self, position: int, ring: np.ndarray | list[list[float]]) -> None:
+        """
+        Stores a ring, spilling it to disk if the memory budget is used up.
+
+        Args:
+            position (int): The motor position the ring was captured at, in
+                steps from the start of a sweep.
+            ring (np.ndarray | list[list[float]]): The ring's
+                (rho, phi, theta, intensity) points.
+        """
+
+        points = np.asarray(ring, dtype=np.float32).reshape(-1, POINT_FIELDS)
+        self.num_points += len(points)
+
+        in_memory: bool = not self._spilling and \
+            self.memory_bytes + points.nbytes <= self.memory_budget_bytes
+        if in_memory:
+            self.memory_rings.append((position, points))
+            self.memory_bytes += points.nbytes
+        else:
+            self._spilling = True
+            self.spilled_rings += 1
+        if in_memory and not self.journal:
+            return
+
+        if self._spill_file is None:
+            if self.spill_path is None:
+                self.spill_path = file_utils.get_timestamped_filename(
+                    save_path=self.spill_dir, prefix='rings', ext='.bin')
+                print(f"[RUN] ring_store.py: Memory budget reached, spilling "
+                      f"rings to {self.spill_path}...")
+            self._spill_file = open(self.spill_path, 'ab')
+
+        self._spill_file.write(RING_HEADER.pack(position, len(points)))
+        self._spill_file.write(points.tobytes())
+        self._spill_file.flush()
+        if self.journal:
+            os.fsync(self._spill_file.fileno())     # Survive a brownout
+
+    def rings(self) -> Iterator[tuple[int, np.ndarray]]:
+        '''
+        Yields every ring and its position, in capture order.
+        '''
+        yield from self.memory_rings
+        if self.spill_path is not None and self.spilled_rings > 0:
+            skip: int = len(self.memory_rings) if self.journal else 0
+            yield from islice(read_spill_file(self.spill_path), skip, None)
+
+    def iter_chunks(self, max_points: int = CHUNK_POINTS) -> Iterator[np.ndarray]:
+        """
+        Yields every point in capture order, in arrays of about max_points
+        (whole rings, so a chunk can run over by up to one ring).
+
+        Args:
+            max_points (int): The target number of points per chunk.
+        """
+
+        chunk: list[np.ndarray] = []
+        chunk_points: int = 0
+        for _, ring in self.rings():
+            chunk.append(ring)
+            chunk_points += len(ring)
+            if chunk_points >= max_points:
+                yield np.concatenate(chunk)
+                chunk, chunk_points = [], 0
+        if chunk:
+            yield np.concatenate(chunk)
+
+    def to_list(self) -> list[list[float]]:
+        '''
+        Returns every point as a list, loading spilled rings into memory.
+        '''
+        return [point for chunk in self.iter_chunks() for point in chunk.tolist()]
+
+    def close(self, delete: bool = True) -> None:
+        '''
+        Closes the spill file (or journal), and by default deletes it.
+        '''
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if delete and self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+
+def read_spill_file(path: str) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Yields the rings in a spill file and their positions. A record cut short
+    (e.g. by a power loss mid-write) ends the file.
+
+    Args:
+        path (str): The spill file.
+    """
+
+    with open(path, 'rb') as file:
+        while header := file.read(RING_HEADER.size):
+            if len(header) < RING_HEADER.size:
+                return
+            position, count = RING_HEADER.unpack(header)
+            data: bytes = file.read(count * POINT_BYTES)
+            if len(data) < count * POINT_BYTES:
+                return
+            yield position, np.frombuffer(data, dtype=np.float32).reshape(-1, POINT_FIELDS)
+
+
+class ScanCheckpoint:
+    """
+    The JSON checkpoint of a scan in progress, saved next to its ring journal.
+    Written atomically (write, then rename), so it is always either the old
+    or the new version.
+
+    Attributes:
+        path (str): The checkpoint file.
+        state (dict): The checkpoint's contents: status ("capturing" or
+            "saving"), rings_file (the journal), rings_per_cloud, sweep_mode,
+            ms_res_denom, plan (every ring position in steps, in capture 
+            order, as far as it is known), phase (adaptive scans only, 
+            "coarse" or "fine"), park (where the motor goes after the last 
+            ring), pos_steps (the last known motor position in steps), 
+            moving_to (the target of a move in progress, if any), rings_done,
+            scan_kwargs, meta (what the scan is recorded with, e.g. pose), 
+            saving_to (the cloud being written, if any), failures (attempts
+            that raised), and updated_s.
+    """
+
+    def __init__(self, path: str, state: dict) -> None:
+        self.path: str = path
+        self.state: dict = state
+
+    @classmethod
+    def create(cls, folder: str, **state) -> "ScanCheckpoint":
+        """
+        Starts a checkpoint and names its (not yet created) ring journal.
+
+        Args:
+            folder (str): Where to keep the checkpoint and journal.
+            **state: The initial checkpoint contents.
+        Returns:
+            checkpoint (ScanCheckpoint): The saved checkpoint.
+        """
+
+        path: str = file_utils.get_timestamped_filename(
+            save_path=folder, prefix='scan', ext=CHECKPOINT_EXT)
+        rings_file: str = path[:-len(CHECKPOINT_EXT)] + '.rings.bin'
+        checkpoint = cls(path, {"status": "capturing", "rings_file": rings_file,
+                                "rings_done": 0, "moving_to": None, **state})
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, path: str) -> "ScanCheckpoint":
+        with open(path, 'r') as file:
+            return cls(path, json.load(file))
+
+    def update(self, **changes) -> None:
+        '''
+        Changes some fields and saves the checkpoint.
+        '''
+        self.state.update(changes)
+        self.save()
+
+    def save(self) -> None:
+        self.state["updated_s"] = round(time.time(), 3)
+        temp_path: str = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.state, file)
+        os.replace(temp_path, self.path)
+
+    def record_failure(self, error: str) -> bool:
+        """
+        Counts a failed attempt at the scan. After MAX_SCAN_FAILURES, the
+        checkpoint is renamed (e.g. scan_19690420_080085.ckpt.failed) so it
+        isn't resumed again; its journal is kept for save_partial_cloud().
+
+        Args:
+            error (str): What went wrong.
+        Returns:
+            given_up (bool): Whether the checkpoint was renamed.
+        """
+
+        self.update(failures=self.state.get("failures", 0) + 1, last_error=error)
+        if self.state["failures"] < MAX_SCAN_FAILURES:
+            return False
+        os.replace(self.path, self.path + FAILED_EXT)
+        self.path += FAILED_EXT
+        return True
+
+    def delete(self) -> None:
+        '''
+        Removes the checkpoint and its journal once the scan is saved.
+        '''
+        for path in (self.path, self.state["rings_file"]):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def find_checkpoints(root: str) -> list[str]:
+    """
+    Finds the checkpoints of interrupted scans under a folder (e.g. the trips
+    folder), oldest first. Checkpoints given up on (see record_failure()) are
+    skipped.
+
+    Args:
+        root (str): The folder to search recursively.
+    Returns:
+        paths (list[str]): Checkpoint files.
+    """
+
+    paths: list[str] = []
+    for folder, _, files in os.walk(root):
+        paths.extend(os.path.join(folder, name) for name in files
+                     if name.endswith(CHECKPOINT_EXT))
+    return sorted(paths, key=os.path.getmtime)
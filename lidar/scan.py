@@ -4,15 +4,34 @@ Compatible with STL27L LiDAR scanner, A4988 motor driver, and NEMA17 stepper
 motor.
 '''
 
+import json                     # dump()
+import os                       # path.dirname()
 import time                     # time()
-import random                   # seed(), sample()
+from itertools import islice
+from typing import Callable
+
+import numpy as np              # bincount(), adaptive scan analysis
 
 from lidar import lidar
 from lidar import motor
+from lidar import ring_store    # RingStore
 from utils import file_utils    # get_timestamped_filename()
-from utils import math_utils    # sph_to_cart_array()
+from utils import math_utils    # sph_to_cart_np()
+from utils import metrics_utils # Metrics
 from utils.led_utils import *   # set_pixel
 
+SWEEP_MODES: tuple[str, ...] = ("forward", "alternating", "interleaved", "adaptive")
+# Parked motor positions in full steps from the start of a sweep (0 degrees)
+PARK_POSITIONS: dict[str, int] = {"start": 0, "rest": 50, "end": 100}
+METRICS_EXT = '.metrics'        # JSON, but kept out of the viewer's .json list
+PARTIAL_EXT = '.part'           # Appended to a cloud until it is fully written
+
+# Adaptive scans: a coarse pass, then full resolution only where it's needed
+ADAPTIVE_COARSE_RINGS = 100     # Resolution of the coarse pass
+ADAPTIVE_ANGLE_BINS = 360       # LiDAR angle bins compared between rings
+ADAPTIVE_JUMP_M = 0.10          # A bin's range jumps if it changes by more than
+ADAPTIVE_JUMP_PCT = 0.10        # this many meters and this fraction of range
+ADAPTIVE_SCORE_THRESHOLD = 0.05 # Fraction of bins that must change to refine
 
 class Scanner():
     """
@@ -33,21 +52,58 @@ class Scanner():
             after capturing each ring.
         resolution (float): The angular resolution of scans on the XY plane
             (i.e. the angular distance between rings).
+        stage (str): What the scanner is doing ("idle", "capturing", 
+            "trimming", "converting", or "saving").
+        scan_pct (float): Percentage of rings captured in the current scan.
+        on_progress (Callable[[str, float], None] | None): Called with the 
+            stage and scan_pct whenever either changes (once per ring while 
+            capturing). Runs on the scanning thread, so keep it short.
+        on_ring (Callable[[int, np.ndarray], None] | None): Called with the
+            index and (rho, phi, theta, intensity) points of every ring as it
+            is captured, e.g. for a live preview. Also runs on the scanning
+            thread.
+        sweep_mode (str): How the motor sweeps while capturing ("forward", 
+            "alternating", "interleaved", or "adaptive"). See 
+            capture_rings().
+        pos_steps (int): The motor position in microsteps from the start of a
+            sweep (0 degrees). Rest is 90 degrees.
+        memory_budget_mb (float): How much captured ring data to hold in 
+            memory before spilling rings to disk.
+        checkpointing (bool): Whether scans are journaled so they can be 
+            resumed after an interruption.
+        metrics (Metrics): Stage timers (capture, trim, convert, write, save)
+            and point and byte counters. See metrics_summary().
+        last_scan_metrics (dict | None): The metrics of the latest saved scan,
+            as written to its sidecar file.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, motor_backend: str = "auto") -> None:
         """
         Initializes a scanner object by combining an instance of the Lidar class
         and an instance of the Motor class. Configures the number of rings per
         cloud (400 by default) and related values.
+
+        Args:
+            motor_backend (str): How the motor sends step pulses. See Motor.
+                Defaults to "auto".
         """
         self.lidar: lidar.Lidar = lidar.Lidar()
-        self.motor: motor.Motor = motor.Motor(res_name="sixteenth", start_angle=90, speed=1)
+        self.motor: motor.Motor = motor.Motor(res_name="sixteenth", start_angle=90, speed=1,
+                                              backend=motor_backend)
         self.rings_per_cloud: int = 400
         self.steps_per_ring: int = int(100 * self.motor.ms_res_denom / self.rings_per_cloud)
         self.resolution: float = 180 / self.rings_per_cloud
         self.is_scanning = False
+        self.stage: str = "idle"
         self.scan_pct = 0.0
+        self.on_progress: Callable[[str, float], None] | None = None
+        self.on_ring: Callable[[int, np.ndarray], None] | None = None
+        self.sweep_mode: str = "forward"
+        self.pos_steps: int = PARK_POSITIONS["rest"] * self.motor.ms_res_denom
+        self.memory_budget_mb: float = ring_store.DEFAULT_MEMORY_BUDGET_MB
+        self.checkpointing: bool = True
+        self.metrics = metrics_utils.Metrics()
+        self.last_scan_metrics: dict | None = None
         self.is_trimming = False
         self.is_converting = False
         self.is_saving = False
@@ -69,180 +125,586 @@ class Scanner():
                 selected stepper motor microstep resolution.
         '''
 
-        if (num_rings > self.motor.ms_res_denom * 100):
-            raise ValueError(f"Resolution is too high!",
-                "Must not exceed (steps/rev) / 2 at currently configured",
-                "microstep resolution. ({resolution}, {self.motor.ms_res})")
+        self.check_rings_per_cloud(num_rings)
         
         self.rings_per_cloud = num_rings
         self.steps_per_ring: int = int(100 * self.motor.ms_res_denom / self.rings_per_cloud)
         self.resolution: float = 180 / self.rings_per_cloud
 
-    def capture_cloud(self) -> list[list[float]]:
-        """
-        Takes a 3D scan of the environment. This function is the powerhouse of 
-        the cell.\n
-        Performs the following steps:
-            1. Sets direction of stepper motor to counterclockwise.
-            2. Captures a ring's worth of points, extends a cloud array with the 
-               points, and turns the motor a specified amount.
-            3. Repeats step 2 until the motor angle is at least 180 degrees.
-            4. Reverses direction of stepper motor and resets to starting 
-               position.
-            5. Prints information about size and duration of scan.
-            6. Returns the captured cloud.
+    def check_rings_per_cloud(self, num_rings: int) -> None:
+        '''
+        Checks that a number of rings per scan can be captured.
+
+        Args:
+            num_rings (int): The number of rings per scan.
+        Raises:
+            ValueError: If there are fewer than one ring, or the selected
+                resolution is too high for the currently selected stepper
+                motor microstep resolution.
+        '''
+
+        if num_rings < 1:
+            raise ValueError(f"Resolution is too low! Must be at least 1 ring. ({num_rings})")
+        if num_rings > self.motor.ms_res_denom * 100:
+            raise ValueError("Resolution is too high! "
+                "Must not exceed (steps/rev) / 2 at currently configured "
+                f"microstep resolution. ({num_rings}, {self.motor.ms_res})")
+
+    def report_progress(self, stage: str, pct: float | None = None) -> None:
+        '''
+        Updates the stage and capture percentage and notifies on_progress.
+
+        Args:
+            stage (str): The current stage of the scan pipeline.
+            pct (float | None): The percentage of rings captured. Unchanged if
+                None.
+        '''
+
+        self.stage = stage
+        if pct is not None:
+            self.scan_pct = round(pct, 1)
+        if self.on_progress is not None:
+            self.on_progress(self.stage, self.scan_pct)
+
+    def enter_stage(self, stage: str) -> None:
+        '''
+        Sets the flag of a saving stage ("trimming", "converting" or "saving")
+        and clears the others, reporting progress if the stage changed.
+        '''
+        self.is_trimming = stage == "trimming"
+        self.is_converting = stage == "converting"
+        self.is_saving = stage == "saving"
+        if stage != self.stage:
+            self.report_progress(stage)
+
+    def metrics_snapshot(self) -> dict:
+        '''
+        Returns snapshots of the scanner's, LiDAR's and motor's metrics.
+        '''
+        return {name: source.metrics.snapshot() for name, source in 
+                (("scanner", self), ("lidar", self.lidar), ("motor", self.motor))}
 
+    def metrics_summary(self, since: dict | None = None) -> dict:
+        """
+        Args:
+            since (dict | None): A metrics_snapshot() to count from. Defaults
+                to None (since startup).
         Returns:
-            cloud (list[list[float]]): A 3D point cloud array.
+            metrics (dict): The scanner's, LiDAR's and motor's counters and
+                stage timers, as published in the METRICS_NAME snapshot.
         """
+        sources = (("scanner", self), ("lidar", self.lidar), ("motor", self.motor))
+        if since is None:
+            return {name: source.metrics.summary() for name, source in sources}
+        return {name: source.metrics.since(since[name]) for name, source in sources}
 
-        start_time_s: float = time.time()
-        self.is_scanning = True
-        print("[RUN] scan.py: Beginning cloud capture...")
+    def metrics_compact(self) -> dict:
+        '''
+        Returns the scanner's, LiDAR's and motor's counters and last stage
+        times, as recorded in every telemetry record.
+        '''
+        return {name: source.metrics.compact() for name, source in
+                (("scanner", self), ("lidar", self.lidar), ("motor", self.motor))}
 
-        # Quarter turn to start position from forward facing rest
-        self.motor.set_dir("CW")
-        self.motor.turn("CW", self.motor.ms_res_denom * 50)
-        self.motor.set_dir("CCW")
+    @property
+    def position(self) -> str | None:
+        '''
+        The parked position the motor is at ("start", "rest", or "end"), or
+        None if it is between them.
+        '''
+        for name, full_steps in PARK_POSITIONS.items():
+            if self.pos_steps == full_steps * self.motor.ms_res_denom:
+                return name
+        return None
 
-        cloud: list[list[float]] = []
+    def turn_to(self, pos: int,
+                checkpoint: ring_store.ScanCheckpoint | None = None) -> None:
+        """
+        Turns the motor to a position without capturing.
 
-        while self.motor.curr_angle < 180:
-            if (self.motor.curr_angle >= 0 and self.motor.curr_angle < 60):
-                set_pixel(LQ1_ADDR, PX_BLUE)
-            if (self.motor.curr_angle >= 60 and self.motor.curr_angle < 120):
-                set_pixel(LQ2_ADDR, PX_BLUE)     
-            if (self.motor.curr_angle >= 120 and self.motor.curr_angle < 180):
-                set_pixel(LQ3_ADDR, PX_BLUE)
+        Args:
+            pos (int): The target in microsteps from the start of a sweep
+                (0 degrees).
+            checkpoint (ScanCheckpoint | None): If given, the move is recorded
+                before it starts, so an interruption mid-move is known.
+        """
 
-            self.lidar.open_serial()    # See cylindrical distortion error in documentation
+        delta: int = pos - self.pos_steps
+        if delta == 0:
+            return
+        if checkpoint is not None:
+            checkpoint.update(pos_steps=self.pos_steps, moving_to=pos)
 
-            ring: list[list[float]] = self.lidar.capture_ring(motor_angle=self.motor.curr_angle)
-            cloud.extend(ring)
-            self.motor.turn("CCW", self.steps_per_ring)
+        direction: str = "CCW" if delta > 0 else "CW"
+        self.motor.set_dir(direction)
+        self.motor.turn(direction, abs(delta))
+        self.pos_steps = pos
 
-            self.lidar.close_serial()
+    def move_to(self, position: str) -> None:
+        """
+        Turns the motor to one of its parked positions without capturing.
 
-        set_pixel(LQ1_ADDR, PX_WHITE)
-        set_pixel(LQ2_ADDR, PX_WHITE)
-        set_pixel(LQ3_ADDR, PX_WHITE)
+        Args:
+            position (str): "start" (0 degrees), "rest" (90 degrees, forward
+                facing), or "end" (180 degrees).
+        Raises:
+            ValueError: If position is not one of the parked positions.
+        """
 
-        self.motor.set_dir("CW")
-        self.motor.turn("CW", self.motor.ms_res_denom * 50)
+        if position not in PARK_POSITIONS:
+            raise ValueError(
+                f"[ERR] scan.py: Invalid park position! ('{position}')")
 
-        num_points: int = len(cloud)
+        self.turn_to(PARK_POSITIONS[position] * self.motor.ms_res_denom)
 
-        duration_s: float = time.time() - start_time_s
-        duration_s = round(duration_s, 2)
+    def rest(self) -> None:
+        '''
+        Returns the motor to its forward facing rest position. Call this after
+        a run of alternating sweeps, which leave the motor at either end.
+        '''
+        self.move_to("rest")
 
-        print(f"[RUN] scan.py: Cloud captured in {duration_s} seconds ({num_points} points).")
+    def rehome(self, checkpoint: ring_store.ScanCheckpoint) -> None:
+        """
+        Restores the motor position recorded by an interrupted scan, since 
+        Motor only tracks its angle in memory and assumes rest on startup.
+        There is no home switch, so a move cut off partway is assumed to have
+        finished (ring moves are a single stride; a park move could be off by
+        up to its full length, which is reported).
 
-        self.is_scanning = False
-        return cloud
+        Args:
+            checkpoint (ScanCheckpoint): The interrupted scan's checkpoint.
+        """
+
+        state: dict = self.checkpoint_state(checkpoint)
+        pos: int = state["pos_steps"]
+        if state.get("moving_to") is not None:
+            print(f"[RUN] scan.py: Scan was interrupted mid-move, assuming the "
+                  f"motor reached {state['moving_to']} "
+                  f"(within {abs(state['moving_to'] - pos)} steps).")
+            pos = state["moving_to"]
+
+        self.pos_steps = pos
+        self.motor.set_start_angle(pos / (200 * self.motor.ms_res_denom) * 360)
+        print(f"[RUN] scan.py: Re-homed motor to {round(self.motor.curr_angle, 2)} degrees.")
 
-    def trim_cloud(self, cloud: list[list[float]], nonfat_pct: float = 0.2) -> list[list[float]]:
+    def checkpoint_state(self, checkpoint: ring_store.ScanCheckpoint) -> dict:
         '''
-        Downsamples a cloud (non-destructively) to reduce resolution, file size, 
-        and load times. Uses python random library to uniformly downsample.
+        Returns a checkpoint's state, checking it was made at this scanner's
+        microstep resolution (positions are stored in microsteps).
+        '''
+        if checkpoint.state["ms_res_denom"] != self.motor.ms_res_denom:
+            raise ValueError(f"[ERR] scan.py: Checkpoint was taken at a different "
+                             f"microstep resolution! ({checkpoint.path})")
+        return checkpoint.state
+
+    def capture_ring_here(self) -> np.ndarray:
+        '''
+        Captures one ring of (rho, phi, theta, intensity) points at the motor's
+        current angle.
+        '''
+
+        if (self.motor.curr_angle >= 0 and self.motor.curr_angle < 60):
+            set_pixel(LQ1_ADDR, PX_BLUE)
+        if (self.motor.curr_angle >= 60 and self.motor.curr_angle < 120):
+            set_pixel(LQ2_ADDR, PX_BLUE)     
+        if (self.motor.curr_angle >= 120 and self.motor.curr_angle < 180):
+            set_pixel(LQ3_ADDR, PX_BLUE)
+
+        self.lidar.open_serial()    # See cylindrical distortion error in documentation
+        ring: np.ndarray = self.lidar.capture_ring_array()
+        self.lidar.close_serial()
+
+        return np.insert(ring, 2, self.motor.curr_angle, axis=1)
+
+    def plan_scan(self, mode: str, steps_per_ring: int) -> tuple[list[int], str]:
+        """
+        Lays out where a scan captures its rings. Positions are in microsteps
+        from the start of a sweep (0 degrees), in capture order.
 
         Args:
-            cloud (list[list[float]]): A cloud of points to be trimmed.
-            nonfat_pct (float): A percentage of points to retain (non-fat).
+            mode (str): The sweep mode. For "adaptive", only the coarse pass.
+            steps_per_ring (int): Steps between neighbouring rings.
         Returns:
-            out (list[list[float]]): The trimmed point cloud.
-        '''
+            out (tuple[list[int], str]): The ring positions, and where to park
+                the motor after the last ring.
+        """
 
-        self.is_trimming = True
-        start_time_s: float = time.time()
+        sweep_steps: int = self.motor.ms_res_denom * 100
+        match mode:
+            case "forward":
+                return list(range(0, sweep_steps, steps_per_ring)), "rest"
+            case "alternating" if self.position == "end":
+                return [sweep_steps - pos for pos 
+                        in range(0, sweep_steps, steps_per_ring)], "start"
+            case "alternating":
+                return list(range(0, sweep_steps, steps_per_ring)), "end"
+            case "interleaved":
+                return (list(range(0, sweep_steps, 2 * steps_per_ring)) 
+                        + [sweep_steps - pos for pos 
+                           in range(steps_per_ring, sweep_steps, 2 * steps_per_ring)],
+                        "rest")
+            case "adaptive":
+                coarse_stride: int = max(steps_per_ring, 
+                                         int(sweep_steps / ADAPTIVE_COARSE_RINGS))
+                return list(range(0, sweep_steps, coarse_stride)), "rest"
+            case _:
+                raise ValueError(f"[ERR] scan.py: Invalid sweep mode! ('{mode}')")
+
+    def capture_plan(self, plan: list[int], first: int,
+                     rings: ring_store.RingStore,
+                     checkpoint: ring_store.ScanCheckpoint | None = None,
+                     pct_range: tuple[float, float] = (0.0, 100.0)) -> None:
+        """
+        Captures a ring at each planned position from the first not yet in
+        rings. Each ring is journaled before the motor moves on.
 
-        random.seed()
-        num_pts_untrimmed = len(cloud)
-        num_pts_trimmed = int(num_pts_untrimmed * nonfat_pct)
-        nonfat_cloud: list[list[float]] = random.sample(cloud, num_pts_trimmed)
+        Args:
+            plan (list[int]): Ring positions in microsteps, in capture order.
+            first (int): The index in plan this phase of the scan starts at
+                (for progress).
+            rings (RingStore): Receives the captured rings.
+            checkpoint (ScanCheckpoint | None): Updated after every ring.
+            pct_range (tuple[float, float]): The progress percentages this 
+                phase of the scan runs between.
+        """
 
-        duration_s: float = time.time() - start_time_s
-        duration_s = round(duration_s, 2)
+        start: int = len(rings)
+        if start < len(plan):
+            self.turn_to(plan[start], checkpoint)
+
+        for i in range(start, len(plan)):
+            self.turn_to(plan[i])
+            ring: np.ndarray = self.capture_ring_here()
+            rings.append(plan[i], ring)
+            if self.on_ring is not None:
+                self.on_ring(i, ring)
+            if checkpoint is not None:
+                checkpoint.update(rings_done=i + 1, pos_steps=plan[i], 
+                    moving_to=plan[i + 1] if i + 1 < len(plan) else None)
+
+            self.report_progress("capturing", pct_range[0] 
+                + (pct_range[1] - pct_range[0]) * (i + 1 - first) / (len(plan) - first))
+
+    def find_detail_intervals(self, rings: list[tuple[int, np.ndarray]]
+                              ) -> list[tuple[int, int]]:
+        """
+        Finds the gaps between neighbouring coarse rings that need more detail.
+        Each ring's returns are binned by LiDAR angle; a gap is flagged when 
+        many bins jump in range between its two rings (an edge or object runs
+        through it) or when the rings' return densities differ.
 
-        print(f"[RUN] UART.py: Cloud trimmed to {nonfat_pct * 100}%, "
-              f"removed {num_pts_untrimmed - num_pts_untrimmed} points in "
-              f"{duration_s} seconds.")
+        Args:
+            rings (list[tuple[int, np.ndarray]]): Coarse rings and their
+                positions in steps.
+        Returns:
+            intervals (list[tuple[int, int]]): (start, end) positions in steps
+                of each flagged gap, merged where gaps touch, in order.
+        """
 
-        self.is_trimming = False
-        return nonfat_cloud
-    
-    def convert_cloud(self, cloud: list[list[float]]) -> list[list[float]]:
+        rings = sorted(rings, key=lambda entry: entry[0])
+        profiles: list[tuple[np.ndarray, np.ndarray]] = []
+        for _, ring in rings:
+            points = np.asarray(ring, dtype=np.float64).reshape(-1, 4)
+            valid = points[:, 0] > 0
+            bins = (points[valid, 1] % 360 * ADAPTIVE_ANGLE_BINS / 360).astype(int)
+            hits = np.bincount(bins, minlength=ADAPTIVE_ANGLE_BINS)
+            ranges = np.bincount(bins, weights=points[valid, 0],
+                                 minlength=ADAPTIVE_ANGLE_BINS)
+            profiles.append((hits > 0, np.divide(ranges, hits, 
+                out=np.zeros(ADAPTIVE_ANGLE_BINS), where=hits > 0)))
+
+        intervals: list[tuple[int, int]] = []
+        for i in range(0, len(rings) - 1):
+            (hit_a, range_a), (hit_b, range_b) = profiles[i], profiles[i + 1]
+            both = hit_a & hit_b
+            jump = np.abs(range_a - range_b) > np.maximum(
+                ADAPTIVE_JUMP_M, ADAPTIVE_JUMP_PCT * np.minimum(range_a, range_b))
+            score: float = (np.count_nonzero(jump & both) 
+                            + np.count_nonzero(hit_a ^ hit_b)) / ADAPTIVE_ANGLE_BINS
+
+            if score >= ADAPTIVE_SCORE_THRESHOLD:
+                start, end = rings[i][0], rings[i + 1][0]
+                if intervals and intervals[-1][1] == start:
+                    intervals[-1] = (intervals[-1][0], end)
+                else:
+                    intervals.append((start, end))
+
+        return intervals
+
+    def plan_detail(self, coarse_plan: list[int], rings: ring_store.RingStore,
+                    steps_per_ring: int) -> list[int]:
+        """
+        Plans the fine pass of an adaptive scan: every position inside the
+        gaps flagged by find_detail_intervals(), visited from the far end on
+        the way back to rest.
+
+        Args:
+            coarse_plan (list[int]): The coarse pass's ring positions.
+            rings (RingStore): The captured rings, starting with the coarse 
+                pass.
+            steps_per_ring (int): Steps between rings inside flagged gaps.
+        Returns:
+            fine_plan (list[int]): Fine ring positions in capture order.
+        """
+
+        coarse_rings = list(islice(rings.rings(), len(coarse_plan)))
+        intervals: list[tuple[int, int]] = self.find_detail_intervals(coarse_rings)
+        coarse_positions: set[int] = set(coarse_plan)
+        fine_plan: list[int] = sorted({pos
+            for start, end in intervals
+            for pos in range(start + steps_per_ring, end, steps_per_ring)
+            if pos not in coarse_positions}, reverse=True)
+
+        full_rings: int = -(-self.motor.ms_res_denom * 100 // steps_per_ring)
+        print(f"[RUN] scan.py: Adaptive scan refining {len(intervals)} regions "
+              f"({len(coarse_plan)} coarse + {len(fine_plan)} fine rings, "
+              f"{round(100 * (len(coarse_plan) + len(fine_plan)) / full_rings, 1)}% "
+              f"of a full {full_rings}-ring scan).")
+
+        return fine_plan
+
+    def capture_rings(self, rings_per_cloud: int | None = None,
+                      sweep_mode: str | None = None,
+                      spill_dir: str = '.',
+                      checkpoint: ring_store.ScanCheckpoint | None = None
+                      ) -> ring_store.RingStore:
         """
-        Converts a point cloud from spherical (default) coordinates to cartesian
-        (X,Y,Z) coordinates.
+        Takes a 3D scan of the environment. This function is the powerhouse of 
+        the cell.\n
+        Performs the following steps, depending on the sweep mode:
+            "forward": Turns to the start position, captures rings while 
+                sweeping counterclockwise to 180 degrees, and returns to rest.
+            "alternating": Captures rings while sweeping from whichever end the
+                motor is parked at to the other, and stays there. Consecutive 
+                scans alternate direction and skip both return trips.
+            "interleaved": Captures every other ring sweeping 
+                counterclockwise, then the rings in between on the way back, 
+                so the return trip isn't wasted. Returns to rest.
+            "adaptive": Captures a coarse sweep, then only the regions that 
+                need detail at full resolution on the way back. See 
+                plan_detail(). Returns to rest.
+        Then prints information about size and duration of scan and returns the
+        captured rings. Rings beyond memory_budget_mb are spilled to disk.
+
+        With a checkpoint, every ring and the motor position are persisted as
+        the scan goes. A checkpoint that already has a plan is resumed from its
+        last journaled ring, using its resolution and sweep mode.
 
-        Args: 
-            cloud (list[list[float]]): A cloud of points to be converted.
+        Args:
+            rings_per_cloud (int | None): The number of rings to capture in 
+                this scan only. Defaults to the configured rings_per_cloud.
+            sweep_mode (str | None): "forward", "alternating", "interleaved", 
+                or "adaptive" for this scan only. Defaults to the configured 
+                sweep_mode.
+            spill_dir (str): Where to spill rings beyond the memory budget.
+                Defaults to '.'.
+            checkpoint (ScanCheckpoint | None): The scan's checkpoint, new or
+                being resumed. Defaults to None (not checkpointed).
         Returns:
-            cartesian_cloud (list[list[float]]): The converted cloud.
+            rings (RingStore): The captured rings. Close it when done.
+        Raises:
+            ValueError: If the resolution or sweep mode is invalid.
         """
 
-        self.is_converting = True
-        start_time_s = time.time()
-        print("[RUN] scan.py: Converting scan to Cartesian coordinates...")
+        resuming: bool = checkpoint is not None and "plan" in checkpoint.state
+        if resuming:
+            state: dict = self.checkpoint_state(checkpoint)
+            rings, mode = state["rings_per_cloud"], state["sweep_mode"]
+        else:
+            rings = rings_per_cloud or self.rings_per_cloud
+            mode = sweep_mode or self.sweep_mode
+        self.check_rings_per_cloud(rings)
+        if mode not in SWEEP_MODES:
+            raise ValueError(f"[ERR] scan.py: Invalid sweep mode! ('{mode}')")
+        steps_per_ring: int = int(100 * self.motor.ms_res_denom / rings)
+
+        if resuming:
+            plan, park = state["plan"], state["park"]
+            phase: str | None = state.get("phase")
+            captured = ring_store.RingStore.reopen(state["rings_file"], self.memory_budget_mb)
+        else:
+            plan, park = self.plan_scan(mode, steps_per_ring)
+            phase = "coarse" if mode == "adaptive" else None
+            captured = ring_store.RingStore(spill_dir, self.memory_budget_mb,
+                journal_path=checkpoint.state["rings_file"] if checkpoint else None)
+            if checkpoint is not None:
+                checkpoint.update(plan=plan, park=park, phase=phase,
+                                  pos_steps=self.pos_steps)
 
-        set_pixel(LQ2_ADDR, PX_BLUE)
-        cartesian_cloud: list[list[float]] = math_utils.sph_to_cart_array(cloud)
+        start_time_s: float = time.time()
+        self.is_scanning = True
+        self.report_progress("capturing", 0.0)
+        print(f"[RUN] scan.py: {'Resuming' if resuming else 'Beginning'} cloud "
+              f"capture ({mode} sweep, {len(captured)} rings done)...")
+
+        try:
+            if phase == "coarse":
+                # Coarse pass counts as the first half of progress
+                self.capture_plan(plan, 0, captured, checkpoint, (0.0, 50.0))
+                plan = plan + self.plan_detail(plan, captured, steps_per_ring)
+                phase = "fine"
+                if checkpoint is not None:
+                    checkpoint.update(plan=plan, phase=phase, coarse_rings=len(captured))
+            if phase == "fine":
+                coarse_rings: int = (checkpoint.state["coarse_rings"] 
+                                     if checkpoint is not None else len(captured))
+                self.capture_plan(plan, coarse_rings, captured, checkpoint, (50.0, 100.0))
+            else:
+                self.capture_plan(plan, 0, captured, checkpoint)
+
+            self.turn_to(PARK_POSITIONS[park] * self.motor.ms_res_denom, checkpoint)
+            if checkpoint is not None:
+                checkpoint.update(status="saving", pos_steps=self.pos_steps, moving_to=None)
+        except BaseException:
+            captured.close(delete=checkpoint is None)
+            raise
+
+        set_pixel(LQ1_ADDR, PX_WHITE)
         set_pixel(LQ2_ADDR, PX_WHITE)
+        set_pixel(LQ3_ADDR, PX_WHITE)
+
+        num_points: int = captured.num_points
 
         duration_s: float = time.time() - start_time_s
+        self.metrics.add_time("capture", duration_s)
         duration_s = round(duration_s, 2)
 
-        print(f"[RUN] scan.py: Converted scan in {duration_s} seconds.")
+        print(f"[RUN] scan.py: Cloud captured in {duration_s} seconds ({num_points} points).")
 
-        self.is_converting = False
-        return cartesian_cloud
+        self.is_scanning = False
+        return captured
+
+    def capture_cloud(self, rings_per_cloud: int | None = None,
+                      sweep_mode: str | None = None) -> list[list[float]]:
+        """
+        Takes a 3D scan of the environment and returns it as one list. See 
+        capture_rings(); prefer it (with save_rings()) for dense scans, which 
+        may not fit in memory as a list.
+
+        Args:
+            rings_per_cloud (int | None): The number of rings to capture in 
+                this scan only. Defaults to the configured rings_per_cloud.
+            sweep_mode (str | None): The sweep mode for this scan only. 
+                Defaults to the configured sweep_mode.
+        Returns:
+            cloud (list[list[float]]): A 3D point cloud array.
+        """
 
-    def save_cloud(self,  
-                  cloud: list[list[float]],
-                  filepath: str = '.') -> str:
+        rings: ring_store.RingStore = self.capture_rings(rings_per_cloud, sweep_mode)
+        try:
+            return rings.to_list()
+        finally:
+            rings.close()
+
+    def save_rings(self,
+                   rings: ring_store.RingStore,
+                   filepath: str = '.',
+                   trim: bool = False,
+                   nonfat_pct: float = 0.2,
+                   convert: bool = True,
+                   checkpoint: ring_store.ScanCheckpoint | None = None) -> str:
         """
-        Saves the cloud to a timestamped text file.
+        Trims, converts, and saves captured rings to a timestamped text file 
+        one chunk at a time, so only a chunk is ever in memory. The stage (and
+        its is_trimming, is_converting or is_saving flag) follows each chunk
+        through the pipeline.
+
+        The cloud is written under a temporary name (PARTIAL_EXT) and renamed
+        once complete, so a half-written cloud is never listed as a scan. With
+        a checkpoint, the temporary name is recorded so that resuming an
+        interrupted save can remove it.
 
         Args:
-            cloud (list[list[float]]): A cloud of points to be saved.
-            filepath (str | None): Where to save the file. Defaults to the 
-                current directory ('.').
+            rings (RingStore): The rings to be saved.
+            filepath (str): Where to save the file. Defaults to '.'.
+            trim (bool): Whether or not to randomly downsample the points.
+            nonfat_pct (float): The fraction of points to keep when trimming.
+            convert (bool): Whether or not to convert the points' coordinates
+                to Cartesian.
+            checkpoint (ScanCheckpoint | None): The scan's checkpoint, if any.
         Returns:
             filename (str): The name and path of the saved .txt file. For
                 example, './path/to/cloud_19690420_080085.txt'.
         """
 
-        self.is_saving = True
-
         start_time_s: float = time.time()
 
+        set_pixel(LQ2_ADDR, PX_BLUE)
         set_pixel(LQ3_ADDR, PX_BLUE)
 
         filename = file_utils.get_timestamped_filename(
             save_path=filepath,
             prefix='cloud', ext='.txt')
-            
+        partial: str = filename + PARTIAL_EXT
+        if checkpoint is not None:
+            checkpoint.update(saving_to=partial)
+        if os.path.exists(partial):
+            os.remove(partial)
         print(f"[RUN] scan.py: Saving cloud to {filename}...")
-        file_utils.write_points_to_file( filename=filename, points=cloud)
+
+        rng = np.random.default_rng()
+        num_pts_saved: int = 0
+        try:
+            for chunk in rings.iter_chunks():
+                if trim and nonfat_pct:
+                    self.enter_stage("trimming")
+                    with self.metrics.timed("trim"):
+                        chunk = chunk[rng.random(len(chunk)) < nonfat_pct]
+                if convert:
+                    self.enter_stage("converting")
+                    with self.metrics.timed("convert"):
+                        chunk = math_utils.sph_to_cart_np(chunk)
+                self.enter_stage("saving")
+                with self.metrics.timed("write"):
+                    num_bytes: int = file_utils.write_point_array_to_file(partial, chunk)
+                self.metrics.incr("bytes_written", num_bytes)
+                self.metrics.incr("points_saved", len(chunk))
+                num_pts_saved += len(chunk)
+            if not os.path.exists(partial):
+                open(partial, 'w').close()      # No points survived trimming
+            os.replace(partial, filename)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        finally:
+            self.is_trimming = self.is_converting = self.is_saving = False
 
         duration_s: float = time.time() - start_time_s
+        self.metrics.add_time("save", duration_s)
         duration_s = round(duration_s, 2)
 
-        print(f"[RUN] scan.py: Cloud saved in {duration_s} seconds.")
+        print(f"[RUN] scan.py: Cloud saved in {duration_s} seconds "
+              f"({num_pts_saved} of {rings.num_points} points).")
 
+        set_pixel(LQ2_ADDR, PX_WHITE)
         set_pixel(LQ3_ADDR, PX_WHITE)
 
-        self.is_saving = False
         return filename
-    
+
     def scan(self,
              trim=False,
              nonfat_pct=0.2,
              convert=True,
              save=True,
-             filepath='.') -> str | None:
+             filepath='.',
+             rings_per_cloud: int | None = None,
+             sweep_mode: str | None = None,
+             resume_from: str | None = None,
+             rehome: bool = True,
+             meta: dict | None = None) -> str | None:
         """
         Captures, trims, converts, and saves a cloud. Arguments are optional.
+        Processing streams through the captured rings in chunks, so scans 
+        larger than memory_budget_mb never have to be held in memory at once.
+
+        While checkpointing, a saved scan is checkpointed next to its cloud 
+        until the cloud is written. If the scan is interrupted, pass the 
+        checkpoint as resume_from to finish it (with the settings it was 
+        started with), or read what was captured with save_partial_cloud().
+        A checkpointed scan that fails counts it against its checkpoint, which
+        is given up on after a few failures (see record_failure()).
 
         Args:
             trim (bool): Whether or not to trim the scan.
@@ -251,6 +713,19 @@ class Scanner():
             convert (bool): Whether or not to convert the scan's coordinates to
                 Cartesian.
             save (bool): Whether or not to save the scan to the Raspberry Pi.
+            filepath (str): Where to save the scan. Defaults to '.'.
+            rings_per_cloud (int | None): The number of rings to capture in 
+                this scan only. Defaults to the configured rings_per_cloud.
+            sweep_mode (str | None): The sweep mode for this scan only. 
+                Defaults to the configured sweep_mode.
+            resume_from (str | None): The checkpoint of an interrupted scan to
+                resume instead of starting a new one. Its cloud is saved next 
+                to the checkpoint.
+            rehome (bool): Whether to restore the motor position recorded in
+                resume_from. Only skip this if the scanner has moved the motor
+                since that scan was interrupted.
+            meta (dict | None): What the scan was recorded with (e.g. pose),
+                kept in its checkpoint so a resumed scan is recorded the same.
         Returns:
             filename (str | None): The name and path of the saved .txt file. For
                 example, './path/to/cloud_19690420_080085.txt'. Saves to root by
@@ -258,28 +733,122 @@ class Scanner():
         """
 
         start_time_s = time.time()
-        cloud: list[list[float]] = self.capture_cloud()
-        set_pixel(LQ1_ADDR, PX_GREEN)
-
-        if trim and nonfat_pct:
-            cloud = self.trim_cloud(cloud, nonfat_pct)
-        if convert:
-            cloud = self.convert_cloud(cloud)
-            set_pixel(LQ2_ADDR, PX_GREEN)
-        if save:
-            filename: str = self.save_cloud(cloud=cloud, filepath=filepath)
-            set_pixel(LQ3_ADDR, PX_GREEN)
-            duration_s: float = time.time() - start_time_s
-            duration_s = round(duration_s, 2)
-
-            print(f"[RUN] scan.py: Scan completed in {duration_s} seconds.")
-            return filename
+        metrics_before: dict = self.metrics_snapshot()
+        checkpoint: ring_store.ScanCheckpoint | None = None
+        if resume_from is not None:
+            checkpoint = ring_store.ScanCheckpoint.load(resume_from)
+            trim, nonfat_pct, convert = (checkpoint.state["scan_kwargs"][key]
+                for key in ("trim", "nonfat_pct", "convert"))
+            rings_per_cloud = checkpoint.state["rings_per_cloud"]
+            sweep_mode = checkpoint.state["sweep_mode"]
+            save, filepath = True, os.path.dirname(resume_from) or '.'
+        elif self.checkpointing and save:
+            checkpoint = ring_store.ScanCheckpoint.create(filepath,
+                rings_per_cloud=rings_per_cloud or self.rings_per_cloud,
+                sweep_mode=sweep_mode or self.sweep_mode,
+                ms_res_denom=self.motor.ms_res_denom,
+                scan_kwargs={"trim": trim, "nonfat_pct": nonfat_pct, "convert": convert},
+                meta=meta or {})
+
+        rings: ring_store.RingStore | None = None
+        filename: str | None = None
+        try:
+            if resume_from is not None:
+                # A save cut off partway is redone from the start
+                if (partial := checkpoint.state.get("saving_to")) and os.path.exists(partial):
+                    os.remove(partial)
+                if rehome:
+                    self.rehome(checkpoint)
+            rings = self.capture_rings(rings_per_cloud, sweep_mode, 
+                                       spill_dir=filepath, checkpoint=checkpoint)
+            set_pixel(LQ1_ADDR, PX_GREEN)
+
+            num_rings, num_points = len(rings), rings.num_points
+            if save:
+                filename = self.save_rings(rings, filepath, trim, nonfat_pct, convert,
+                                           checkpoint)
+                set_pixel(LQ2_ADDR, PX_GREEN)
+                set_pixel(LQ3_ADDR, PX_GREEN)
+            if checkpoint is not None:
+                checkpoint.delete()
+        except Exception as e:
+            if checkpoint is not None and filename is None and checkpoint.record_failure(repr(e)):
+                print(f"[ERR] scan.py: Scan failed {ring_store.MAX_SCAN_FAILURES} times, "
+                      f"giving up on it. ({checkpoint.path})")
+            raise
+        finally:
+            if rings is not None:
+                rings.close(delete=checkpoint is None or filename is not None)
+            self.is_scanning = False
+            self.report_progress("idle")
         
         duration_s: float = time.time() - start_time_s
+        self.metrics.incr("scans")
+        self.metrics.add_time("scan", duration_s)
+        self.last_scan_metrics = {
+            "cloud":           os.path.basename(filename) if filename else None,
+            "resumed":         resume_from is not None,
+            "sweep_mode":      sweep_mode or self.sweep_mode,    # The checkpoint's if resumed
+            "rings":           num_rings,
+            "points":          num_points,
+            "points_per_ring": round(num_points / num_rings, 1) if num_rings else None,
+            "duration_s":      round(duration_s, 3),
+            **self.metrics_summary(since=metrics_before)
+        }
+        if filename is not None:
+            write_metrics_file(filename, self.last_scan_metrics)
         duration_s = round(duration_s, 2)
 
         print(f"[RUN] scan.py: Scan completed in {duration_s} seconds.")
-        return None
+        return filename
+
+
+def write_metrics_file(cloud_filename: str, metrics: dict) -> str:
+    """
+    Saves a scan's metrics next to its cloud, e.g. cloud_19690420_080085.txt
+    gets cloud_19690420_080085.metrics.
+
+    Args:
+        cloud_filename (str): The saved cloud.
+        metrics (dict): The scan's metrics, as in Scanner.last_scan_metrics.
+    Returns:
+        filename (str): The metrics sidecar file.
+    """
+
+    filename: str = os.path.splitext(cloud_filename)[0] + METRICS_EXT
+    with open(filename, 'w') as file:
+        json.dump(metrics, file, indent=2)
+    return filename
+
+
+def save_partial_cloud(checkpoint_path: str) -> str:
+    """
+    Saves whatever an interrupted scan captured, without the scanner hardware,
+    converted to Cartesian and next to the checkpoint. The checkpoint is kept,
+    so the scan can still be resumed.
+
+    Args:
+        checkpoint_path (str): The interrupted scan's checkpoint.
+    Returns:
+        filename (str): The saved partial cloud, e.g. 
+            './path/to/cloud_partial_19690420_080085.txt'.
+    """
+
+    checkpoint = ring_store.ScanCheckpoint.load(checkpoint_path)
+    rings = ring_store.RingStore.reopen(checkpoint.state["rings_file"])
+    filename: str = file_utils.get_timestamped_filename(
+        save_path=os.path.dirname(checkpoint_path) or '.',
+        prefix='cloud_partial', ext='.txt')
+
+    try:
+        for chunk in rings.iter_chunks():
+            file_utils.write_point_array_to_file(filename, math_utils.sph_to_cart_np(chunk))
+    finally:
+        rings.close(delete=False)
+
+    print(f"[RUN] scan.py: Saved {len(rings)} of {len(checkpoint.state['plan'])} "
+          f"planned rings to {filename}.")
+    return filename
 
 
 def test_scan() -> None:
@@ -0,0 +1,383 @@
+'''
+Scan job service for AEGIS senior design.
+Runs 3D scans on a background worker so callers (the controller, the
+autopilot) submit a scan and get a job handle back immediately.
+
+Queued scans are taken in priority order (manual before autopilot before
+deferred), oldest first within a priority. A request identical to one already
+waiting is coalesced into it rather than queued twice.
+'''
+
+from collections import deque
+from contextlib import contextmanager
+from heapq import heappop, heappush
+from itertools import count
+from threading import Condition, Event, Lock, Thread
+from typing import Callable, Iterator
+import os
+import time
+
+import numpy as np
+
+from lidar import scan
+
+# Lower runs first
+SCAN_PRIORITIES: dict[str, int] = {"manual": 0, "autopilot": 1, "deferred": 2}
+PREVIEW_RINGS = 50          # Resolution of the cheap scan taken before a full one
+WAIT_HISTORY = 32           # Finished jobs remembered for the average wait time
+
+
+class ScanJob:
+    """
+    A handle to a submitted scan.
+
+    Attributes:
+        id (int): The job's number, unique per service.
+        filepath (str): The folder the scan will be saved to.
+        rings_per_cloud (int): The resolution of the scan, locked when the scan
+            was submitted.
+        source (str): Who asked for the scan ("manual" or "autopilot").
+        priority (int): Where the job sits in the queue, lower runs first.
+        kind (str): "full", or "preview" for the cheap scan taken first.
+        preview (ScanJob | None): The preview queued ahead of this scan, if any.
+        coalesced (int): How many later identical requests were merged in.
+        meta (dict): Extra information recorded with the scan (e.g. pose).
+        scan_kwargs (dict): Arguments passed through to Scanner.scan().
+        stage (str): "queued", a Scanner stage ("capturing", "trimming",
+            "converting", "saving"), "done", or "failed".
+        progress_pct (float): Percentage of rings captured.
+        filename (str | None): The saved cloud, once done.
+        error (str | None): Why the scan failed, if it did.
+        submitted_s (float): When the job was submitted (epoch seconds).
+        started_s (float | None): When the scan started.
+        finished_s (float | None): When the scan finished or failed.
+    """
+
+    def __init__(self, job_id: int, filepath: str, rings_per_cloud: int,
+                 meta: dict | None = None, scan_kwargs: dict | None = None,
+                 source: str = "manual", kind: str = "full") -> None:
+        self.id: int = job_id
+        self.filepath: str = filepath
+        self.rings_per_cloud: int = rings_per_cloud
+        self.source: str = source
+        self.priority: int = SCAN_PRIORITIES[source]
+        self.kind: str = kind
+        self.preview: ScanJob | None = None
+        self.coalesced: int = 0
+        self.meta: dict = meta or {}
+        self.scan_kwargs: dict = scan_kwargs or {}
+        self.stage: str = "queued"
+        self.progress_pct: float = 0.0
+        self.filename: str | None = None
+        self.error: str | None = None
+        self.submitted_s: float = time.time()
+        self.started_s: float | None = None
+        self.finished_s: float | None = None
+        self._done = Event()
+        self._order: int = 0    # Tiebreak within a priority, set when queued
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def wait_s(self) -> float:
+        '''
+        Seconds spent queued, so far if the scan hasn't started yet.
+        '''
+        return (self.started_s or time.time()) - self.submitted_s
+
+    def matches(self, filepath: str, rings_per_cloud: int, scan_kwargs: dict) -> bool:
+        '''
+        Whether a new request would produce the same scan as this queued one.
+        '''
+        return (self.stage == "queued" and self.kind == "full"
+                and self.filepath == filepath
+                and self.rings_per_cloud == rings_per_cloud
+                and self.scan_kwargs == scan_kwargs)
+
+    def wait(self, timeout: float | None = None) -> str | None:
+        """
+        Blocks until the scan finishes.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait. Forever if None.
+        Returns:
+            filename (str | None): The saved cloud, or None if the scan failed
+                or the wait timed out.
+        """
+
+        self._done.wait(timeout)
+        return self.filename
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            job (dict): A JSON-serializable summary, as recorded in the trip's
+                'scans' list.
+        """
+
+        return {
+            "id": self.id,
+            "file": os.path.basename(self.filename) if self.filename else None,
+            "kind": self.kind,
+            "source": self.source,
+            "rings": self.rings_per_cloud,
+            "stage": self.stage,
+            "progress_pct": self.progress_pct,
+            "coalesced": self.coalesced,
+            "error": self.error,
+            "submitted_s": round(self.submitted_s, 3),
+            "started_s": round(self.started_s, 3) if self.started_s else None,
+            "finished_s": round(self.finished_s, 3) if self.finished_s else None,
+            "wait_s": round(self.wait_s, 3),
+            **self.meta
+        }
+
+
+class ScanService:
+    """
+    Runs submitted scans one at a time on a single worker thread. The worker
+    holds hardware_lock for every scan; anything else that needs the motor or
+    LiDAR must go through exclusive(), so nothing ever drives them at once.
+
+    Attributes:
+        scanner (Scanner): The scanner that takes every scan.
+        on_complete (Callable[[ScanJob], None] | None): Called on the worker
+            thread when a job finishes, whether it succeeded or failed.
+        on_progress (Callable[[ScanJob], None] | None): Called on the worker
+            thread whenever the running job's stage or progress changes (once
+            per ring while capturing). Keep it short.
+        on_ring (Callable[[ScanJob, int, np.ndarray], None] | None): Called on
+            the worker thread with the running job and the index and points
+            of every ring it captures (see Scanner.on_ring). Keep it short.
+        get_meta (Callable[[], dict] | None): Called on submission for extra
+            information to record with every scan (e.g. the rover's pose).
+        preview_first (bool): If True, every full scan above PREVIEW_RINGS is
+            preceded by a PREVIEW_RINGS scan at the requested priority, and
+            the full scan itself is deferred behind all other requests.
+        hardware_lock (Lock): Held by whoever is driving the motor and LiDAR.
+        current (ScanJob | None): The job being scanned, if any.
+        wait_history_s (deque[float]): Queue wait times of recent jobs.
+    """
+
+    def __init__(self, scanner: scan.Scanner,
+                 on_complete: Callable[[ScanJob], None] | None = None,
+                 get_meta: Callable[[], dict] | None = None,
+                 preview_first: bool = False) -> None:
+        self.scanner: scan.Scanner = scanner
+        self.on_complete: Callable[[ScanJob], None] | None = on_complete
+        self.on_progress: Callable[[ScanJob], None] | None = None
+        self.on_ring: Callable[[ScanJob, int, np.ndarray], None] | None = None
+        self.get_meta: Callable[[], dict] | None = get_meta
+        self.preview_first: bool = preview_first
+        self.hardware_lock = Lock()
+        self.current: ScanJob | None = None
+        self.wait_history_s: deque[float] = deque(maxlen=WAIT_HISTORY)
+        self._ids = count(1)
+        self._order = count()
+        self._heap: list[tuple[float, int, ScanJob | None]] = []
+        self._queued: list[ScanJob] = []
+        self._cond = Condition()
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    @property
+    def busy(self) -> bool:
+        '''
+        Whether a scan is running or waiting to run.
+        '''
+        with self._cond:
+            return self.current is not None or len(self._queued) > 0
+
+    def queued(self) -> list[ScanJob]:
+        '''
+        The jobs waiting to run, in the order they will run.
+        '''
+        with self._cond:
+            return sorted(self._queued, key=lambda job: (job.priority, job._order))
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            stats (dict): Queue length, the longest current wait, and the
+                average wait of recently started jobs, in seconds.
+        """
+
+        queued: list[ScanJob] = self.queued()
+        history: list[float] = list(self.wait_history_s)
+        return {
+            "queue_len": len(queued),
+            "queue_wait_s": round(max((job.wait_s for job in queued), default=0.0), 2),
+            "avg_wait_s": round(sum(history) / len(history), 2) if history else 0.0
+        }
+
+    def submit(self, filepath: str = '.', source: str = "manual",
+               rings_per_cloud: int | None = None, preview: bool | None = None,
+               meta: dict | None = None, **scan_kwargs) -> ScanJob:
+        """
+        Queues a scan and returns immediately. If an identical scan is already
+        waiting, returns that job instead (raising its priority if needed; a
+        job still waiting on its preview runs right behind it).
+
+        Args:
+            filepath (str): Where to save the scan. Defaults to '.'.
+            source (str): "manual" or "autopilot". Defaults to "manual".
+            rings_per_cloud (int | None): The scan's resolution. Defaults to
+                the scanner's resolution right now; later changes to the
+                scanner don't affect queued jobs.
+            preview (bool | None): Whether to take a preview scan first.
+                Defaults to preview_first.
+            meta (dict | None): Extra information recorded with the scan.
+            **scan_kwargs: Passed through to Scanner.scan() (e.g. trim).
+        Returns:
+            job (ScanJob): The handle of the requested scan.
+        Raises:
+            ValueError: If the source or resolution is invalid.
+        """
+
+        if source not in SCAN_PRIORITIES or source == "deferred":
+            raise ValueError(f"[ERR] scan_jobs.py: Invalid scan source! ('{source}')")
+
+        rings: int = rings_per_cloud or self.scanner.rings_per_cloud
+        self.scanner.check_rings_per_cloud(rings)
+        if self.get_meta is not None:
+            meta = {**self.get_meta(), **(meta or {})}
+        if preview is None:
+            preview = self.preview_first
+
+        with self._cond:
+            for job in self._queued:
+                if job.matches(filepath, rings, scan_kwargs):
+                    job.coalesced += 1
+                    priority: int = SCAN_PRIORITIES[source]
+                    if job.preview is not None and job.preview in self._queued:
+                        # Raise the preview, and keep the full scan after it
+                        if priority < job.preview.priority:
+                            job.source = job.preview.source = source
+                            self._push(job.preview, priority)
+                            self._push(job, priority)
+                    elif priority < job.priority:
+                        job.source = source
+                        self._push(job, priority)
+                    print(f"[RUN] scan_jobs.py: Coalesced request into scan #{job.id}.")
+                    return job
+
+            job = ScanJob(next(self._ids), filepath, rings, meta, scan_kwargs, source)
+
+            if preview and rings > PREVIEW_RINGS:
+                job.preview = ScanJob(next(self._ids), filepath, PREVIEW_RINGS,
+                                      meta, scan_kwargs, source, kind="preview")
+                self._push(job.preview, job.priority)
+                self._push(job, SCAN_PRIORITIES["deferred"])
+            else:
+                self._push(job, job.priority)
+
+        print(f"[RUN] scan_jobs.py: Queued {source} scan #{job.id} "
+              f"({rings} rings{', preview first' if job.preview else ''}).")
+        return job
+
+    def _push(self, job: ScanJob, priority: int) -> None:
+        '''
+        Adds (or re-adds at a new priority) a job to the heap. Must hold _cond.
+        Entries older than their job's latest push are skipped later.
+        '''
+        job.priority = priority
+        job._order = next(self._order)
+        if job not in self._queued:
+            self._queued.append(job)
+        heappush(self._heap, (priority, job._order, job))
+        self._cond.notify()
+
+    def _pop(self) -> ScanJob | None:
+        '''
+        Blocks until the next job (or the stop sentinel, None) is available.
+        '''
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                _, order, job = heappop(self._heap)
+                if job is None:
+                    return None
+                if job in self._queued and order == job._order:
+                    self._queued.remove(job)
+                    self.current = job
+                    return job
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        '''
+        Holds the motor and LiDAR for use outside of a scan job, waiting for
+        any scan in progress to finish first.
+        '''
+        with self.hardware_lock:
+            yield
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops the worker after the scan in progress (and any already queued)
+        finishes. A scan can't be interrupted partway.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait for the worker.
+        """
+
+        with self._cond:
+            heappush(self._heap, (float("inf"), next(self._order), None))
+            self._cond.notify()
+        self._worker.join(timeout)
+
+    def _run(self) -> None:
+        '''
+        Worker loop. Takes jobs in priority order until it gets None.
+        '''
+
+        while (job := self._pop()) is not None:
+            job.started_s = time.time()
+            self.wait_history_s.append(job.wait_s)
+
+            def track(stage: str, pct: float) -> None:
+                if stage != "idle":
+                    job.stage = stage
+                job.progress_pct = pct
+                if self.on_progress is not None:
+                    try:
+                        self.on_progress(job)
+                    except Exception as e:
+                        print(f"[ERR] scan_jobs.py: Progress callback failed! ({e})")
+
+            def ring_captured(index: int, ring: np.ndarray) -> None:
+                if self.on_ring is not None:
+                    try:
+                        self.on_ring(job, index, ring)
+                    except Exception as e:
+                        print(f"[ERR] scan_jobs.py: Ring callback failed! ({e})")
+
+            try:
+                with self.hardware_lock:
+                    self.scanner.on_progress = track
+                    self.scanner.on_ring = ring_captured
+                    job.filename = self.scanner.scan(
+                        filepath=job.filepath,
+                        rings_per_cloud=job.rings_per_cloud,
+                        meta={"submitted_s": round(job.submitted_s, 3), **job.meta},
+                        **job.scan_kwargs)
+                job.stage = "done"
+            except Exception as e:
+                job.stage = "failed"
+                job.error = repr(e)
+                print(f"[ERR] scan_jobs.py: Scan #{job.id} failed! ({e})")
+            finally:
+                self.scanner.on_progress = None
+                self.scanner.on_ring = None
+                job.finished_s = time.time()
+                with self._cond:
+                    self.current = None
+                job._done.set()
+
+            if self.on_complete is not None:
+                try:
+                    self.on_complete(job)
+                except Exception as e:
+                    print(f"[ERR] scan_jobs.py: Could not record scan #{job.id}! ({e})")
@@ -0,0 +1,320 @@
+# LiDAR Benchmark
+# Times each stage of the scan pipeline on synthetic STL27L data, and the
+# end-to-end scan against a simulated serial port and motor, at several cloud
+# sizes. Reports throughput (points/s) and peak memory (tracemalloc) per stage
+# and compares them against a stored baseline, so regressions show up.
+#
+#   python lidar_benchmark.py                     # Compare against the baseline
+#   python lidar_benchmark.py --save-baseline     # Record a new baseline
+#   python lidar_benchmark.py --rings 50 400      # Smaller clouds only
+#
+# Baselines are machine-specific, so the reference baseline is recorded on the
+# rover's Raspberry Pi 5 and kept next to this script as
+# lidar_benchmark_baseline.json. To create or refresh it, run the benchmark on
+# the Pi with --save-baseline and commit the file. Until one is committed, or
+# to compare on another machine, record a local baseline there first (or pass
+# --baseline). Exits with status 1 if any stage regressed.
+#
+# Runs anywhere: the LiDAR port and motor are simulated, and without the Pi's
+# board and neopixel modules the status LEDs are skipped.
+
+import os
+os.environ.setdefault("GPIOZERO_PIN_FACTORY", "mock")  # Never drive real pins
+
+import argparse
+import json
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+from lidar import scan
+from utils import file_utils
+from utils import math_utils
+from utils import serial_utils
+
+RING_SIZES = (50, 400, 1600)
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "lidar_benchmark_baseline.json")
+REGRESSION_PCT = 20     # Slower or bigger than the baseline by more than this
+REPEATS = 3             # Timed runs per stage, the fastest is kept
+SEED = 1969
+
+PACKETS_PER_RING = 245
+POINTS_PER_PACKET = 12
+PACKET_SIZE = 47
+
+
+def make_packets(num_packets: int, rng: np.random.Generator) -> np.ndarray:
+    '''
+    Generates valid STL27L packets (with CRCs) for consecutive rings at 10 Hz,
+    returned as a (num_packets, 47) uint8 array.
+    '''
+
+    packets = np.zeros((num_packets, PACKET_SIZE), dtype=np.uint8)
+    index = np.arange(num_packets) % PACKETS_PER_RING
+    start_angle = (index * 36000 // PACKETS_PER_RING).astype(np.uint16)     # 0.01 deg
+    end_angle = ((start_angle + 36000 * 11 // (PACKETS_PER_RING * 12)) % 36000).astype(np.uint16)
+    dist_mm = rng.integers(200, 12000, (num_packets, POINTS_PER_PACKET), dtype=np.uint16)
+    dist_mm[rng.random(dist_mm.shape) < 0.05] = 0                          # No return
+    intensity = rng.integers(0, 256, (num_packets, POINTS_PER_PACKET), dtype=np.uint8)
+
+    packets[:, 0] = 0x54                            # Start byte
+    packets[:, 1] = 0x2C                            # VerLen
+    packets[:, 2:4] = np.array([3600], dtype='<u2').view(np.uint8)  # deg / s
+    packets[:, 4:6] = start_angle.astype('<u2').view(np.uint8).reshape(-1, 2)
+    samples = packets[:, 6:42].reshape(-1, POINTS_PER_PACKET, 3)
+    samples[:, :, 0:2] = dist_mm.astype('<u2').view(np.uint8).reshape(-1, POINTS_PER_PACKET, 2)
+    samples[:, :, 2] = intensity
+    packets[:, 42:44] = end_angle.astype('<u2').view(np.uint8).reshape(-1, 2)
+    packets[:, 44:46] = (np.arange(num_packets) * 100 // PACKETS_PER_RING % 30000
+                         ).astype('<u2').view(np.uint8).reshape(-1, 2)      # ms
+
+    table = np.array(serial_utils.CRC_TABLE, dtype=np.uint8)
+    crc = np.zeros(num_packets, dtype=np.uint8)
+    for i in range(PACKET_SIZE - 1):
+        crc = table[crc ^ packets[:, i]]
+    packets[:, PACKET_SIZE - 1] = crc
+    return packets
+
+
+class SimulatedSerial:
+    """
+    Stands in for the LiDAR's pyserial port, replaying a buffer of packets in
+    a loop as fast as they are read.
+
+    Attributes:
+        data (bytes): The packet stream that is replayed.
+        offset (int): The next byte to be read.
+        is_open (bool): Whether open() has been called.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data: bytes = data
+        self.offset: int = 0
+        self.is_open: bool = False
+
+    def open(self) -> None:
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def read(self, size: int) -> bytes:
+        if self.offset + size > len(self.data):
+            self.offset = 0
+        chunk: bytes = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def read_until(self, expected: bytes) -> bytes:
+        return b''
+
+
+def measure(stage: Callable[[], object], repeats: int, memory: bool) -> tuple[float, float | None]:
+    """
+    Times a stage and measures its peak memory.
+
+    Args:
+        stage (Callable[[], object]): Runs the stage once.
+        repeats (int): Timed runs, the fastest is kept.
+        memory (bool): Whether to run the stage once more under tracemalloc.
+    Returns:
+        out (tuple[float, float | None]): The fastest run in seconds and the
+            peak memory allocated in MB (None if not measured).
+    """
+
+    best_s: float = float('inf')
+    for _ in range(repeats):
+        start_s: float = time.perf_counter()
+        stage()
+        best_s = min(best_s, time.perf_counter() - start_s)
+
+    peak_mb: float | None = None
+    if memory:
+        tracemalloc.start()
+        stage()
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    return best_s, peak_mb
+
+
+def run_benchmarks(ring_sizes: tuple[int, ...], repeats: int, memory: bool) -> dict:
+    """
+    Benchmarks every stage at every cloud size.
+
+    Args:
+        ring_sizes (tuple[int, ...]): Rings per cloud to benchmark.
+        repeats (int): Timed runs per stage.
+        memory (bool): Whether to measure peak memory.
+    Returns:
+        results (dict): '<stage>@<rings>' -> points, seconds, points_per_s,
+            and peak_mb.
+    """
+
+    rng = np.random.default_rng(SEED)
+    temp_dir: str = tempfile.mkdtemp(prefix="lidar_benchmark_")
+
+    scanner = scan.Scanner(motor_backend="mock")
+    scanner.lidar.packet_delay_s = 0
+    scanner.checkpointing = True
+
+    results: dict = {}
+    try:
+        for rings in ring_sizes:
+            num_packets: int = rings * PACKETS_PER_RING
+            raw: np.ndarray = make_packets(num_packets, rng)
+            packets: list[bytes] = [row.tobytes() for row in raw]
+            num_points: int = num_packets * POINTS_PER_PACKET
+
+            decoded: np.ndarray = scanner.lidar.decode_packets(packets)
+            motor_angles = np.repeat(np.linspace(0, 180, rings, endpoint=False),
+                                     PACKETS_PER_RING * POINTS_PER_PACKET)
+            sph_array: np.ndarray = np.insert(decoded, 2, motor_angles, axis=1).astype(np.float32)
+            sph_cloud: list[list[float]] = sph_array.tolist()
+            cart_array: np.ndarray = math_utils.sph_to_cart_np(sph_array)
+            cart_cloud: list[list[float]] = cart_array.tolist()
+            out_file: str = os.path.join(temp_dir, "cloud.txt")
+
+            def write_list() -> None:
+                if os.path.exists(out_file):
+                    os.remove(out_file)
+                file_utils.write_points_to_file(out_file, cart_cloud)
+
+            def write_array() -> None:
+                if os.path.exists(out_file):
+                    os.remove(out_file)
+                file_utils.write_point_array_to_file(out_file, cart_array)
+
+            def capture() -> None:
+                scanner.lidar.serial = SimulatedSerial(raw[:PACKETS_PER_RING * 8].tobytes())
+                scanner.lidar.open_serial()
+                for _ in range(rings):
+                    scanner.lidar.capture_ring_array()
+                scanner.lidar.close_serial()
+
+            def end_to_end() -> None:
+                scanner.lidar.serial = SimulatedSerial(raw[:PACKETS_PER_RING * 8].tobytes())
+                scan_dir: str = tempfile.mkdtemp(dir=temp_dir)
+                scanner.scan(filepath=scan_dir, rings_per_cloud=rings, sweep_mode="forward")
+                shutil.rmtree(scan_dir)
+
+            stages: dict[str, Callable[[], object]] = {
+                "validate_crc":         lambda: [scanner.lidar.validate_crc(p) for p in packets],
+                "process_packet":       lambda: [scanner.lidar.process_packet(p, motor_angle=90.0)
+                                                 for p in packets],
+                "decode_packets":       lambda: scanner.lidar.decode_packets(packets),
+                "capture_ring_array":   capture,
+                "sph_to_cart_array":    lambda: math_utils.sph_to_cart_array(sph_cloud),
+                "sph_to_cart_np":       lambda: math_utils.sph_to_cart_np(sph_array),
+                "trim":                 lambda: sph_array[rng.random(len(sph_array)) < 0.2],
+                "write_points_to_file": write_list,
+                "write_point_array_to_file": write_array,
+                "scan":                 end_to_end,
+            }
+
+            for name, stage in stages.items():
+                # The slow list stages run once, they take seconds per cloud
+                seconds, peak_mb = measure(stage, repeats if rings < 1600 else 1, memory)
+                results[f"{name}@{rings}"] = {
+                    "points": num_points,
+                    "seconds": round(seconds, 6),
+                    "points_per_s": round(num_points / seconds),
+                    "peak_mb": round(peak_mb, 2) if peak_mb is not None else None
+                }
+                print(f"[RUN] lidar_benchmark.py: {name:26} {rings:5} rings "
+                      f"{num_points / seconds:14,.0f} points/s " +
+                      (f"{peak_mb:9.1f} MB" if peak_mb is not None else ""))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold_pct: float) -> list[str]:
+    """
+    Compares results against a baseline and prints the change per stage.
+
+    Args:
+        results (dict): As from run_benchmarks().
+        baseline (dict): A saved baseline's results.
+        threshold_pct (float): How much worse a stage may get before it is
+            reported as a regression.
+    Returns:
+        regressions (list[str]): A description of each regression.
+    """
+
+    regressions: list[str] = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base: dict = baseline[key]
+
+        speed_pct: float = (result["points_per_s"] / base["points_per_s"] - 1) * 100
+        line: str = f"{key:34} {speed_pct:+7.1f}% points/s"
+        if speed_pct < -threshold_pct:
+            regressions.append(f"{key} throughput {speed_pct:+.1f}%")
+
+        if result["peak_mb"] is not None and base.get("peak_mb"):
+            memory_pct: float = (result["peak_mb"] / base["peak_mb"] - 1) * 100
+            line += f" {memory_pct:+7.1f}% peak memory"
+            if memory_pct > threshold_pct:
+                regressions.append(f"{key} peak memory {memory_pct:+.1f}%")
+
+        print(f"[RUN] lidar_benchmark.py: {line}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the LiDAR scan pipeline.")
+    parser.add_argument("--rings", type=int, nargs='+', default=list(RING_SIZES),
+                        help="Rings per cloud to benchmark")
+    parser.add_argument("--repeats", type=int, default=REPEATS,
+                        help="Timed runs per stage, the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip peak memory measurements (faster)")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="Baseline file to compare against or save")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Save these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_PCT,
+                        help="Percent change that counts as a regression")
+    args = parser.parse_args()
+
+    results: dict = run_benchmarks(tuple(args.rings), args.repeats, not args.no_memory)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({"machine": platform.node(), "python": platform.python_version(),
+                       "created_s": round(time.time()), "results": results}, file, indent=2)
+        print(f"[RUN] lidar_benchmark.py: Saved baseline to {args.baseline}.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[RUN] lidar_benchmark.py: No baseline at {args.baseline}, "
+              "run with --save-baseline on the reference machine (the rover's "
+              "Pi) to record one.")
+        return 0
+
+    with open(args.baseline, 'r') as file:
+        baseline: dict = json.load(file)
+    if baseline.get("machine") != platform.node():
+        print(f"[RUN] lidar_benchmark.py: Baseline was recorded on "
+              f"{baseline.get('machine')}, comparisons may not be meaningful.")
+
+    regressions: list[str] = compare(results, baseline["results"], args.threshold)
+    for regression in regressions:
+        print(f"[ERR] lidar_benchmark.py: Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,7 @@
 # LiDAR Testbench
 # This file will run a configurable number of scans and aggregate the data captured.
+# Alternating sweeps capture in both directions, so back-to-back scans skip the
+# quarter turns to and from rest between them.
 
 import os
 
@@ -10,10 +12,14 @@ os.makedirs(dir, exist_ok=True)
 
 RINGS = 1600
 ITERS = 5
+SWEEP_MODE = "alternating"
 
 UUT = scan.Scanner()
 UUT.set_rings_per_cloud(RINGS)
 
-for i in range(ITERS):
-    print(f"SCAN {i+1}:")
-    UUT.scan(filepath=dir)
+try:
+    for i in range(ITERS):
+        print(f"SCAN {i+1}:")
+        UUT.scan(filepath=dir, sweep_mode=SWEEP_MODE)
+finally:
+    UUT.rest()
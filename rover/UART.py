@@ -3,26 +3,47 @@
 # Designed for Arduino MEGA 2560 rev3 and R.Pi 5
 # Uses RP1 chip's uart2 on GPIO4/5 (pins 7/29 (TX/RX))
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from serial import Serial
-from threading import Thread
+from typing import Callable
+import asyncio
+import json
 import os
 import time
 
-from utils import serial_utils      # UGV_BAUDRATE
-from utils import file_utils        # make_telemetry_JSON(), update_telemetry_JSON(), TRIPS_FOLDER
+from utils import serial_utils      # UGV_BAUDRATE, AsyncSerial
+from utils import file_utils        # make_telemetry_JSON(), update_telemetry_JSON(), find_trip_json()
+from utils import telemetry_utils   # TelemetrySnapshot
+from utils import latency_utils     # ControlLatencyTracker
+from utils import octree_utils      # build_tiles()
+from utils import preview_utils     # make_thumbnail(), write_trip_summary()
+from utils import ring_feed_utils   # RingFeed
 from utils.led_utils import *       # map_ultrasonic_to_pixel()
 from utils import pin_utils as pins
 from rover import controller
 from rover import camera            # ugv_cam
 from lidar import scan
-
-INPUT_BUFFER_SECONDS = 0.1
+from lidar import scan_jobs         # ScanService
+from lidar import obstacles         # ObstacleStream
+from lidar import ring_store        # find_checkpoints(), ScanCheckpoint
+
+COMMAND_TICK_SECONDS = 0.05         # Arduino consumes one command per 50 ms
+MOVING_KEEPALIVE_SECONDS = 0.1      # Arduino stops motors after 150 ms of silence
+IDLE_HEARTBEAT_SECONDS = 1.0
+IDLE_COMMAND = b'\x00'              # MOVE at zero speed
 STICK_MOVE_THRESHOLD = 0.05         # Fixes stick drift
 
 LLM_DRIVE_ENABLED = False # If True, disables manual control for LLM autopilot
+LIDAR_DRIVE_MODE = True   # If True, streams LiDAR obstacle rings between scans
+RESUME_INTERRUPTED_SCANS = True # If True, finishes scans cut off by a shutdown
+BUILD_SCAN_TILES = True   # If True, builds viewer LOD tiles after each scan
+PRECOMPRESS_ARTIFACTS = True    # If True, gzips finished clouds and trip JSONs for the viewer
 
-tripping: bool = False
 scanner = scan.Scanner()
+scans = scan_jobs.ScanService(scanner)  # Only path to the scanner's hardware
+obstacle_stream = obstacles.ObstacleStream(scans)
+latency = latency_utils.ControlLatencyTracker()
 
 def get_cpu_util() -> float:
     """
@@ -98,32 +119,76 @@ def read_data(serial_conn : Serial) -> bytes | None:
     else:
         raise RuntimeError("Attempted to read from closed serial port!")
     
-def listen_to_UGV(serial_conn: Serial, trip_json : str, dump_folder: str, controller_thread : Thread) -> None:
+def log_failure(what: str) -> Callable[[Future | asyncio.Future], None]:
     """
-    Captures telemetry data from the Arduino and writes it to the trip's 
-    telemetry JSON file. If the data is malformed, skips the frame.
+    Makes a done callback that prints a background task's exception, which
+    would otherwise be lost with its future (e.g. a full disk silently
+    stopping the trip JSON from being written).
 
     Args:
-        serial_conn (Serial): The serial connection between the Arduino and the
+        what (str): What failed, e.g. "Couldn't write telemetry".
+    Returns:
+        callback (Callable[[Future], None]): The done callback.
+    """
+
+    def check(future: Future | asyncio.Future) -> None:
+        if not future.cancelled() and (e := future.exception()) is not None:
+            print(f"[ERR] UART.py: {what}! ({e!r})")
+    return check
+
+async def listen_to_UGV(ugv: serial_utils.AsyncSerial, trip_json : str, dump_folder: str,
+                        snapshot: telemetry_utils.TelemetrySnapshot,
+                        metrics: telemetry_utils.TelemetrySnapshot,
+                        persist_pool: ThreadPoolExecutor) -> None:
+    """
+    Captures telemetry data from the Arduino, publishes it as the latest 
+    telemetry snapshot, and writes it to the trip's telemetry JSON file. If the
+    data is malformed, skips the frame. Runs until cancelled.
+
+    Parsing (which shells out for Raspberry Pi stats) runs on a worker thread
+    and the JSON write is queued on the single-threaded persist_pool, so the 
+    event loop is never blocked and frames are written in order.
+
+    Args:
+        ugv (AsyncSerial): The serial connection between the Arduino and the
             Raspberry Pi.
-        start_time (str): The timestamp representing the start of the current 
-            trip.
+        trip_json (str): The path to the trip's telemetry JSON file.
         dump_folder (str): The path to the telemetry JSON file's folder.
+        snapshot (TelemetrySnapshot): The latest telemetry snapshot, updated 
+            every frame.
+        metrics (TelemetrySnapshot): The scanner's full metrics, also updated
+            every frame. Records only carry their metrics_compact().
+        persist_pool (ThreadPoolExecutor): The executor that writes frames to
+            the telemetry JSON.
     """
 
-    while controller_thread.is_alive():
+    loop = asyncio.get_running_loop()
+
+    while True:
 
         set_pixel(ARD_ADDR, PX_WHITE) # MIGHT BE TOO QUICK TO OBSERVE
 
-        ugv_data: bytes = serial_conn.read_until(expected=b'\n')
+        ugv_data: bytes = await ugv.readline()
+
+        # Command echoes from the Mega (see command_acks_enabled in config.h)
+        if ugv_data.startswith(b"ACK="):
+            try:
+                latency.record_ack(int(ugv_data[4:]), time.time())
+            except ValueError:
+                print("[ERR] UART.py: INVALID ARDUINO ACK\n")
+            continue
 
         try:
-            tel_dict = process_telemetry(ugv_data)
+            tel_dict = await asyncio.to_thread(process_telemetry, ugv_data)
+            snapshot.publish(tel_dict)
+            metrics.publish(scanner.metrics_summary())
 
-            filename: str = file_utils.update_telemetry_JSON(
+            loop.run_in_executor(persist_pool, partial(
+                file_utils.update_telemetry_JSON,
                 filepath=dump_folder, filename=trip_json, telemetry=tel_dict)
+            ).add_done_callback(log_failure("Couldn't write telemetry"))
 
-        except RuntimeError:
+        except (RuntimeError, ValueError):
             print("[ERR] UART.py: INVALID ARDUINO TELEMETRY (BADLEN)\n")
         
         set_pixel(ARD_ADDR, PX_OFF) # MIGHT BE TOO QUICK TO OBSERVE
@@ -265,16 +330,21 @@ def process_telemetry(data: bytes) -> dict:
         },
         "lidar": {
             "scanning":      scanner.is_scanning,
+            "stage":         scanner.stage,
             "scan_pct":      scanner.scan_pct,
             "trimming":      scanner.is_trimming,
             "converting":    scanner.is_converting,
             "saving":        scanner.is_saving,
-            "motor_pos_deg": scanner.motor.curr_angle
+            "motor_pos_deg": scanner.motor.curr_angle,
+            **scans.stats(),
+            "obstacles":     obstacle_stream.summary(),
+            "metrics":       scanner.metrics_compact()
         },
         "camera": {
             "connected": False,
             "recording": False,
         },
+        "control": latency.summary(),
         "motors": {
             "front_left": {
                 "voltage_v": mot_lf_v, "current_a": mot_lf_a, "rpm": mot_lf_r
@@ -326,134 +396,184 @@ def process_telemetry(data: bytes) -> dict:
     
     return telemetry
 
-def control_UGV(serial_conn : Serial, dump_folder: str, tripping: bool) -> None:
+def resolve_drive_command(states: dict[str, int|float]) -> bytes:
     """
-    Enables the UGV to be piloted by a controller, such as an XBOX controller.
-    Reads controller input states from a background listener thread. Includes 
-    measures to prevent the overflowing of the Arduino command buffer.
+    Picks the single drive command implied by the controller state. Inputs 
+    that would previously have produced conflicting commands in the same tick 
+    (both triggers, both bumpers, or START held while turning) resolve to 
+    holding zero speed.
 
     Args:
-        serial_conn (Serial): The serial connection between the Arduino and the
-            Raspberry Pi.
+        states (dict[str, int|float]): The controller input states.
+    Returns:
+        command (bytes): The one-byte command to hold until the state changes.
+    """
+
+    fwd, rev = states['BTN_RZ'], states['BTN_Z']
+    left, right = states['BTN_TL'], states['BTN_TR']
+
+    # RIGHT TRIGGER: move forward
+    if fwd and not rev and not left and not right:
+        return generate_command(op = "MOVE", spd = fwd)             # type: ignore
+    # LEFT TRIGGER: move backward
+    if rev and not fwd and not left and not right:
+        return generate_command(op = "MOVE", spd = rev * -1)        # type: ignore
+    # LEFT BUMPER + RIGHT TRIGGER: spin turn left
+    # RIGHT BUMPER + RIGHT TRIGGER: spin turn right
+    if fwd and not rev and (left != right) and not states['BTN_START']:
+        return generate_command(op = "TURN", 
+            turn_dir = "LEFT" if left else "RIGHT", spd = fwd)      # type: ignore
+    
+    # Hold zero speed
+    return IDLE_COMMAND
+
+def get_pressed_combos(states: dict[str, int|float]) -> set[str]:
     """
-    listener_thread = Thread(target=controller.listen, daemon=True)
-    listener_thread.start()
-    time_since_last_command = time.time()
-
-    while tripping:
-        current_time: float = time.time()
-
-        if (current_time - time_since_last_command) > INPUT_BUFFER_SECONDS:
-
-            # Hold zero speed
-            if (not controller.input_states['BTN_RZ']
-            and not controller.input_states['BTN_Z']):
-                #print("[RUN] UART.py: Holding zero speed.")
-                serial_conn.write(
-                    generate_command(
-                        op = "MOVE",
-                        spd = 0.0
-                    )   # type: ignore
-                )
+    Returns the START button combos currently held on the controller.
+
+    Args:
+        states (dict[str, int|float]): The controller input states.
+    Returns:
+        combos (set[str]): Any of "SCAN", "RES_UP", "RES_DOWN", and "END".
+    """
+
+    combos: set[str] = set()
+    if not states['BTN_START']:
+        return combos
+    
+    if states['BTN_Y']:      combos.add("SCAN")         # START + Y
+    if states['BTN_TR']:     combos.add("RES_UP")       # START + RIGHT BUMPER
+    if states['BTN_TL']:     combos.add("RES_DOWN")     # START + LEFT BUMPER
+    if states['BTN_SELECT']: combos.add("END")          # START + SELECT
+    return combos
+
+def handle_combo(combo: str, dump_folder: str, trip_over: asyncio.Event) -> None:
+    """
+    Performs the action of a START button combo. Called once per press.
+
+    Args:
+        combo (str): The combo that was just pressed.
+        dump_folder (str): The path to the trip folder, where scans are saved.
+        trip_over (asyncio.Event): Set by START + SELECT to end the trip.
+    """
+
+    # START + Y: take LiDAR scan (queued ahead of autopilot scans)
+    if combo == "SCAN":
+        scans.submit(dump_folder, source="manual")
+
+    # START + RIGHT BUMPER: increase scan resolution
+    if combo == "RES_UP":
+        if (scanner.rings_per_cloud < 1600):
+            scanner.set_rings_per_cloud(
+                num_rings=scanner.rings_per_cloud * 2)
+            print(f"[RUN] UART.py: Increased scan resolution to "
+                  f"{scanner.rings_per_cloud} rings.")
             
-            # RIGHT TRIGGER: move forward
-            if (controller.input_states['BTN_RZ'] 
-            and not controller.input_states['BTN_Z']
-            and not controller.input_states['BTN_TL']
-            and not controller.input_states['BTN_TR']):
-                serial_conn.write(
-                    generate_command(
-                        op = "MOVE", 
-                        spd = controller.input_states['BTN_RZ']
-                    )   # type: ignore
-                )
-            # LEFT TRIGGER: move backward
-            if (controller.input_states['BTN_Z'] 
-            and not controller.input_states['BTN_RZ'] 
-            and not controller.input_states['BTN_TL']
-            and not controller.input_states['BTN_TR']):
-                serial_conn.write(
-                    generate_command(
-                        op = "MOVE", 
-                        spd = controller.input_states['BTN_Z'] * -1
-                    )   # type: ignore
-                )
-            # LEFT BUMPER + RIGHT TRIGGER: spin turn left
-            if (controller.input_states['BTN_TL']
-            and controller.input_states['BTN_RZ']
-            and not controller.input_states['BTN_START']):
-                serial_conn.write(
-                    generate_command(
-                        op = "TURN", turn_dir = "LEFT",
-                        spd = controller.input_states['BTN_RZ']
-                    )   # type: ignore
-                )
-            # RIGHT BUMPER + RIGHT TRIGGER: spin turn right
-            if (controller.input_states['BTN_TR']
-            and controller.input_states['BTN_RZ']
-            and not controller.input_states['BTN_START']):
-                serial_conn.write(
-                    generate_command(
-                        op = "TURN", turn_dir = "RIGHT",
-                        spd = controller.input_states['BTN_RZ']
-                    )   # type: ignore
-                )
+    # START + LEFT BUMPER: decrease scan resolution
+    if combo == "RES_DOWN":
+        if (scanner.rings_per_cloud > 50):
+            scanner.set_rings_per_cloud(
+                num_rings=int(scanner.rings_per_cloud / 2))
+            print(f"[RUN] UART.py: Decreased scan resolution to "
+                  f"{scanner.rings_per_cloud} rings.")
+            
+    # START + SELECT: end trip
+    if combo == "END":
+        print("[RUN] UART.py: Trip terminated.")
+        trip_over.set() # Breaks out of control loop, shuts down runtime
+
+    # if ugv_cam is not None:
+    #     # START + A: start recording
+    #     if (controller.input_states['BTN_START'] 
+    #     and controller.input_states['BTN_A'] 
+    #     and not ugv_cam.recording):
+    #         video_filename = ugv_cam.my_start_recording()
+    #         #sleep(0.01)
+    #         #print(f"UART.py: Recording video to '{video_filename}'...")
+
+    #     # START + B: stop recording
+    #     if (controller.input_states['BTN_START'] 
+    #     and controller.input_states['BTN_B'] 
+    #     and ugv_cam.recording):
+    #         #ugv_cam.my_stop_recording()
+    #         #sleep(0.01)
+    #         print(f"UART.py: Recording saved to '{video_filename}'.")   # type: ignore
                 
-            # if ugv_cam is not None:
-            #     # START + A: start recording
-            #     if (controller.input_states['BTN_START'] 
-            #     and controller.input_states['BTN_A'] 
-            #     and not ugv_cam.recording):
-            #         video_filename = ugv_cam.my_start_recording()
-            #         #sleep(0.01)
-            #         #print(f"UART.py: Recording video to '{video_filename}'...")
-
-            #     # START + B: stop recording
-            #     if (controller.input_states['BTN_START'] 
-            #     and controller.input_states['BTN_B'] 
-            #     and ugv_cam.recording):
-            #         #ugv_cam.my_stop_recording()
-            #         #sleep(0.01)
-            #         print(f"UART.py: Recording saved to '{video_filename}'.")   # type: ignore
-                    
-            # else:
-            #     if ((controller.input_states['BTN_START']
-            #          and controller.input_states['BTN_A']) 
-            #     or  (controller.input_states['BTN_START']
-            #          and controller.input_states['BTN_B'])):
-            #         print("[RUN] UART.py: No camera connected!")
-
-            # START + Y: take LiDAR scan
-            if (controller.input_states['BTN_START']
-            and controller.input_states['BTN_Y']):
-                scanner.scan(filepath=dump_folder)
-
-            # START + RIGHT BUMPER: increase scan resolution
-            if (controller.input_states['BTN_START'] 
-            and controller.input_states['BTN_TR']):
-                if (scanner.rings_per_cloud < 1600):
-                    scanner.set_rings_per_cloud(
-                        num_rings=scanner.rings_per_cloud * 2)
-                    print(f"[RUN] UART.py: Increased scan resolution to "
-                          f"{scanner.rings_per_cloud} rings.")
-                    
-            # START + LEFT BUMPER: decrease scan resolution
-            if (controller.input_states['BTN_START']
-            and controller.input_states['BTN_TL']):
-                if (scanner.rings_per_cloud > 50):
-                    scanner.set_rings_per_cloud(
-                        num_rings=int(scanner.rings_per_cloud / 2))
-                    print(f"[RUN] UART.py: Decreased scan resolution to "
-                          f"{scanner.rings_per_cloud} rings.")
-                    
-            # START + SELECT: end trip
-            if (controller.input_states['BTN_START']
-            and controller.input_states['BTN_SELECT']
-            and tripping):
-                print("[RUN] UART.py: Trip terminated.")
-                tripping = False # Breaks out of control loop
-
-            time_since_last_command: float = current_time
+    # else:
+    #     if ((controller.input_states['BTN_START']
+    #          and controller.input_states['BTN_A']) 
+    #     or  (controller.input_states['BTN_START']
+    #          and controller.input_states['BTN_B'])):
+    #         print("[RUN] UART.py: No camera connected!")
+
+
+async def control_UGV(ugv: serial_utils.AsyncSerial, dump_folder: str,
+                      trip_over: asyncio.Event) -> None:
+    """
+    Enables the UGV to be piloted by a controller, such as an XBOX controller.
+    Sleeps until the controller listener task reports a state change, then 
+    writes a command only if the encoded byte differs from the last one sent.
+
+    Writes are spaced at least COMMAND_TICK_SECONDS apart (the rate at which 
+    the Arduino consumes commands), so at most one command is sent per tick. 
+    With no state changes, a moving command is repeated every 
+    MOVING_KEEPALIVE_SECONDS to satisfy the Arduino's stop-on-silence timeout, 
+    and the idle command is repeated every IDLE_HEARTBEAT_SECONDS.
+
+    Args:
+        ugv (AsyncSerial): The serial connection between the Arduino and the
+            Raspberry Pi.
+        dump_folder (str): The path to the trip folder, where scans are saved.
+        trip_over (asyncio.Event): Set by START + SELECT to end the trip.
+    """
+
+    last_command: bytes | None = None
+    last_write_s: float = 0.0
+    last_write_wall_s: float = 0.0
+    held_combos: set[str] = set()
+    timeout_s: float = 0.0
+
+    while not trip_over.is_set():
+        try:
+            await asyncio.wait_for(controller.input_changed.wait(), timeout_s)
+        except asyncio.TimeoutError:
+            pass
+        controller.input_changed.clear()
+
+        # Combos fire once on press, not on every wake while held
+        combos: set[str] = get_pressed_combos(controller.input_states)
+        for combo in combos - held_combos:
+            handle_combo(combo, dump_folder, trip_over)
+        held_combos = combos
+
+        command: bytes = resolve_drive_command(controller.input_states)
+        command_s: float = time.time()
+        since_write_s: float = time.monotonic() - last_write_s
+
+        if command != last_command or since_write_s >= keepalive_period(command):
+            if since_write_s < COMMAND_TICK_SECONDS:
+                await asyncio.sleep(COMMAND_TICK_SECONDS - since_write_s)
+                command = resolve_drive_command(controller.input_states)
+            await ugv.write(command)
+
+            # Only changes caused by a new controller input are traced to it
+            input_s, state_s = controller.last_input_times
+            if command == last_command or state_s <= last_write_wall_s:
+                input_s, state_s = None, None
+            last_write_wall_s = time.time()
+            latency.record_write(command, command_s, last_write_wall_s, input_s, state_s)
+
+            last_command = command
+            last_write_s = time.monotonic()
+
+        timeout_s = max(0.0, keepalive_period(last_command) # type: ignore
+                        - (time.monotonic() - last_write_s))
+
+def keepalive_period(command: bytes) -> float:
+    '''
+    How long a command may go without being resent.
+    '''
+    return IDLE_HEARTBEAT_SECONDS if command == IDLE_COMMAND else MOVING_KEEPALIVE_SECONDS
     
 def generate_command(op : str, **kwargs) -> bytes | None:
     """
@@ -496,18 +616,33 @@ def generate_command(op : str, **kwargs) -> bytes | None:
     except OverflowError:
         print("[ERR] UART.py: Invalid command generated!")
 
-def give_controls_to_autopilot(serial_conn : Serial, trip_json : str, dump_folder : str, tripping: bool) -> None:
+def get_scan_pose(snapshot: telemetry_utils.TelemetrySnapshot) -> dict:
+    """
+    Captures where the rover is when a scan is requested, from the latest 
+    telemetry frame, so the scan can be placed on a trip map later.
+
+    Args:
+        snapshot (TelemetrySnapshot): The latest telemetry snapshot.
+    Returns:
+        pose (dict): The IMU orientation in degrees (empty if no telemetry yet).
+    """
+
+    if (telemetry := snapshot.read()[1]) is None:
+        return {}
+    imu: dict = telemetry["imu"]
+    return {"pose": {"roll_deg": imu["roll_deg"], "pitch_deg": imu["pitch_deg"],
+                     "yaw_deg": imu["yaw_deg"]}}
+
+async def give_controls_to_autopilot(ugv: serial_utils.AsyncSerial, snapshot: telemetry_utils.TelemetrySnapshot, 
+                                     dump_folder : str) -> None:
     
     print("[INI] UART.py: LLM Autopilot Enabled.")
     from rover.autopilot import Autopilot
     spartan = Autopilot()
-    while tripping:
-        telemetry = file_utils.get_latest_telemetry(
-            filepath=dump_folder,
-            filename=trip_json
-        )
+    while True:
+        _, telemetry = snapshot.read()     # Freshest frame, no file parsing
         if telemetry is not None:
-            actions = spartan.decide_actions(telemetry)
+            actions = await asyncio.to_thread(spartan.decide_actions, telemetry)
             for action in actions:
                 if spartan.validate_action(action):
                     if action.function.name == "move_rover": # type: ignore
@@ -515,7 +650,7 @@ def give_controls_to_autopilot(serial_conn : Serial, trip_json : str, dump_folde
                         speed = args.get("speed", 0.0)
                         op = args.get("op", "")
                         if op == "MOVE":
-                            serial_conn.write(
+                            await ugv.write(
                                 generate_command(
                                     op = "MOVE", 
                                     spd = speed
@@ -523,7 +658,7 @@ def give_controls_to_autopilot(serial_conn : Serial, trip_json : str, dump_folde
                             )
                         elif op == "TURN":
                             turn_dir = args.get("turn_dir", "LEFT")
-                            serial_conn.write(
+                            await ugv.write(
                                 generate_command(
                                     op = "TURN", 
                                     turn_dir = turn_dir,
@@ -531,19 +666,24 @@ def give_controls_to_autopilot(serial_conn : Serial, trip_json : str, dump_folde
                                 )   # type: ignore
                             )
                     elif action.function.name == "scan_environment": # type: ignore
-                        scanner.scan(filepath=dump_folder)
+                        scans.submit(dump_folder, source="autopilot")
                     
-        time.sleep(3)  # Wait before next decision cycle
+        await asyncio.sleep(3)  # Wait before next decision cycle
 
-def run_comms() -> None:
+async def run_trip() -> None:
     """
     Establishes bidirectional UART communication between the Arduino and
     Raspberry Pi. Records the beginning of the trip, creates a trip folder,
-    and spawns and joins two threads: one for the controls and one for the 
-    telemetry retrieval.
+    and runs every part of the trip as a task on one event loop: the 
+    controller listener, the controls, the telemetry retrieval, the scan 
+    supervisor, and (optionally) the autopilot.
+
+    When the trip ends, every task is cancelled and awaited, pending telemetry
+    writes are flushed, and the serial port and telemetry snapshot are closed,
+    in that order. A scan already in progress can't be interrupted, so it is
+    allowed to finish (and be recorded) before the trip JSON is closed out.
     """
-    
-    tripping = True
+
     trip_start_timestamp: str = file_utils.get_current_timestamp()
     trip_folder: str = file_utils.make_folder(
         file_utils.TRIPS_FOLDER, trip_start_timestamp)
@@ -552,39 +692,114 @@ def run_comms() -> None:
     trip_json: str = file_utils.make_telemetry_JSON(filepath=trip_folder)
     print(f"[INI] UART.py: Created trip telemetry JSON at {trip_json}.")
 
-    serial_conn: Serial = open_serial_connection()
-
+    ugv = serial_utils.AsyncSerial(open_serial_connection())
+    snapshot = telemetry_utils.TelemetrySnapshot(create=True)
+    scan_progress = telemetry_utils.TelemetrySnapshot(     # Written by the scan worker
+        name=telemetry_utils.SCAN_PROGRESS_NAME,
+        size=telemetry_utils.SCAN_PROGRESS_SIZE, create=True)
+    ring_feed = ring_feed_utils.RingFeed()     # Live scan preview for the viewer
+    obstacles_snapshot = telemetry_utils.TelemetrySnapshot(    # Written by the obstacle stream
+        name=telemetry_utils.OBSTACLES_NAME,
+        size=telemetry_utils.OBSTACLES_SIZE, create=True)
+    metrics_snapshot = telemetry_utils.TelemetrySnapshot(      # Written by the telemetry task
+        name=telemetry_utils.METRICS_NAME,
+        size=telemetry_utils.METRICS_SIZE, create=True)
+    persist_pool = ThreadPoolExecutor(max_workers=1)    # Keeps writes in order
+    tiles_pool = ThreadPoolExecutor(max_workers=1)      # Off the scan thread
+    trip_over = asyncio.Event()
+    def prepare_scan_files(cloud_filename: str) -> None:
+        if BUILD_SCAN_TILES:
+            octree_utils.build_tiles(cloud_filename)
+        preview_utils.make_thumbnail(cloud_filename)
+        if PRECOMPRESS_ARTIFACTS:
+            file_utils.precompress(cloud_filename)
+
+    def record_scan(job: scan_jobs.ScanJob) -> None:
+        scan_progress.publish(job.to_dict())
+        if job.filename is not None:
+            tiles_pool.submit(prepare_scan_files, job.filename).add_done_callback(
+                log_failure("Couldn't prepare scan files"))
+        # Resumed scans of past trips go in their own trip's JSON
+        job_json: str | None = trip_json if job.filepath == trip_folder \
+            else file_utils.find_trip_json(job.filepath)
+        persist_pool.submit(file_utils.update_telemetry_JSON, 
+            filepath=job.filepath, filename=job_json or '', scan=job.to_dict()
+        ).add_done_callback(log_failure("Couldn't record scan"))
+
+    scans.on_complete = record_scan
+    scans.on_progress = lambda job: scan_progress.publish(job.to_dict())
+    scans.on_ring = lambda job, index, ring: ring_feed.publish(job.id, index, ring)
+    scans.get_meta = lambda: get_scan_pose(snapshot)
+    obstacle_stream.on_histogram = obstacles_snapshot.publish
+
+    # Newest first, its checkpoint knows where the motor was left. Recorded
+    # with the pose from when it was requested, not the rover's pose now
+    if RESUME_INTERRUPTED_SCANS:
+        checkpoints: list[str] = ring_store.find_checkpoints(file_utils.TRIPS_FOLDER)
+        for i, path in enumerate(reversed(checkpoints)):
+            try:
+                state: dict = ring_store.ScanCheckpoint.load(path).state
+                scans.submit(os.path.dirname(path), rings_per_cloud=state["rings_per_cloud"],
+                             preview=False, meta={"pose": None, **state.get("meta", {})},
+                             resume_from=path, rehome=(i == 0))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[ERR] UART.py: Couldn't resume scan {path}! ({e})")
+    if LIDAR_DRIVE_MODE:
+        obstacle_stream.start()
+
+    tasks: list[asyncio.Task] = [
+        asyncio.create_task(controller.listen_async()),
+        asyncio.create_task(control_UGV(
+            ugv, trip_folder, trip_over)),
+        asyncio.create_task(listen_to_UGV(
+            ugv, trip_json, trip_folder, snapshot, metrics_snapshot, persist_pool)),
+    ]
     if LLM_DRIVE_ENABLED:
-        autopilot_thread = Thread(target=give_controls_to_autopilot,
-                                    args=[
-                                        serial_conn,
-                                        trip_json,
-                                        trip_folder,
-                                        tripping
-                                    ],
-            daemon=True
-        )
-        autopilot_thread.start()
-
-    controller_thread = Thread(target=control_UGV,
-                                args=[
-                                    serial_conn,
-                                    trip_folder,
-                                    tripping
-                                ],
-        daemon=True
-    )
+        tasks.append(asyncio.create_task(give_controls_to_autopilot(
+            ugv, snapshot, trip_folder)))
 
-    telemetry_thread = Thread(target=listen_to_UGV, 
-                                args=[
-                                    serial_conn, 
-                                    trip_json, 
-                                    trip_folder, 
-                                    controller_thread
-                                ]
-    )
+    # Any task dying unexpectedly also ends the trip
+    for task in tasks:
+        task.add_done_callback(lambda t: t.cancelled() or trip_over.set())
 
-    controller_thread.start()   # Background thread, exit signals tel exit
+    try:
+        await trip_over.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[ERR] UART.py: Task failed! ({result!r})")
+
+        await asyncio.to_thread(obstacle_stream.stop)
+        await asyncio.to_thread(scans.stop)
+        persist_pool.submit(file_utils.update_telemetry_JSON, filepath=trip_folder,
+                            filename=trip_json, latency=latency.summary()
+                            ).add_done_callback(log_failure("Couldn't record latency"))
+        persist_pool.shutdown(wait=True)
+        try:
+            preview_utils.write_trip_summary(trip_json)
+        except (OSError, ValueError) as e:
+            print(f"[ERR] UART.py: Couldn't summarize trip! ({e})")
+        if PRECOMPRESS_ARTIFACTS:
+            try:
+                file_utils.precompress(trip_json)
+            except OSError as e:
+                print(f"[ERR] UART.py: Couldn't compress trip JSON! ({e})")
+        tiles_pool.shutdown(wait=False, cancel_futures=True)    # Viewer builds missing tiles
+        ugv.close()
+        snapshot.close()
+        scan_progress.close()
+        ring_feed.close()
+        obstacles_snapshot.close()
+        metrics_snapshot.close()
+        print("[EXIT] UART.py: Trip runtime shut down.")
 
-    telemetry_thread.start()
-    telemetry_thread.join()
+def run_comms() -> None:
+    """
+    Runs a trip on a fresh event loop. Returns once the trip has ended and
+    shut down.
+    """
+    
+    asyncio.run(run_trip())
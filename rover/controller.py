@@ -11,8 +11,8 @@
 # See EOF for specific controller characteristics
 
 import asyncio
+import time
 from evdev import InputDevice, list_devices
-from time import sleep
 
 USE_XBOX = False
 USE_BITDO = True
@@ -65,24 +65,39 @@ def normalize_input(dev_name: str, input: str, value: int) -> float:
         return round(value * TRIG_NORMALIZER*BITDO_MULT, 3)
     return value
 
+# Set whenever a value in input_states changes. Consumers on the same event loop
+# await it instead of polling input_states, and clear it once they've looked.
+input_changed = asyncio.Event()
+
+# (kernel event timestamp, input_states update time) of the latest change, both
+# in time.time() seconds. Used to trace control latency.
+last_input_times: tuple[float, float] = (0.0, 0.0)
+
 # Asynchronous approach
 async def listener(dev, print_updates) -> None:
+    global last_input_times
 
     async for event in dev.async_read_loop(): 
         if event.code in INPUT_CODES:
             event_name: str = INPUT_CODES[event.code]
-            input_states[event_name] = normalize_input(dev.name, event_name, event.value)
+            value = normalize_input(dev.name, event_name, event.value)
+            if input_states[event_name] == value:
+                continue
+            input_states[event_name] = value
+            last_input_times = (event.timestamp(), time.time())
+            input_changed.set()
 
             if print_updates: 
                 print(input_states)
             
         #print(dev.path, evdev.categorize(event), sep=': ') # Debug print
 
-def listen(print_updates=0) -> None:
+async def listen_async(print_updates=0) -> None:
     '''
-    Attempts to connect to a controller infinitely. Upon connection, runs the asynchronous
+    Attempts to connect to a controller infinitely. Upon connection, awaits the asynchronous
     listener function, which updates the controller input_state dict. Upon disconnection,
-    an OSError is caught and the loop waits 5 seconds before trying to connect again.
+    an OSError is caught and the loop waits 1 second before trying to connect again.
+    Meant to run as a task on the rover's event loop; cancel the task to stop listening.
     '''
     first_error = False
     while True:
@@ -98,7 +113,7 @@ def listen(print_updates=0) -> None:
             device = InputDevice(event_path)
 
             print(f"[RUN] controller.py: {device_name} connected!")
-            asyncio.run(listener(device, print_updates))
+            await listener(device, print_updates)
             first_error = False  # Reset error flag on successful connection
         
         except OSError:
@@ -106,8 +121,13 @@ def listen(print_updates=0) -> None:
                 print(f"[ERR] controller.py: Controller not connected, searching every second...")
                 first_error = True
         
-        finally:
-            sleep(1)
+        await asyncio.sleep(1)
+
+def listen(print_updates=0) -> None:
+    '''
+    Blocking entry point for standalone use. Runs listen_async on its own event loop.
+    '''
+    asyncio.run(listen_async(print_updates))
 
 
 if __name__ == '__main__':
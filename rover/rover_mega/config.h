@@ -21,6 +21,7 @@ constexpr bool env_sensors_attached = true;  // SHTC3 + LTR-329
 constexpr bool imu_attached         = true;  // BNO-085
 constexpr bool ultrasonics_attached = true;  // HC-SR04
 constexpr bool headlights_attached  = true;  // KC LED Headlights
+constexpr bool command_acks_enabled = false; // Echo commands as "ACK=<byte>"
 
 // Serial Parameters
 constexpr uint32_t mega_baudrate = 460800;     // Baud of serial
@@ -81,6 +81,12 @@ void uart_do_command()
     default: break;
   }
 
+  // Lets the Raspberry Pi time the command round trip
+  if (command_acks_enabled)
+  {
+    Serial1.print("ACK=");
+    Serial1.println(cmd);
+  }
 }
 
 /*
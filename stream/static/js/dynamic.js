@@ -1,9 +1,14 @@
 // Trips Page Tools
 // Created: 7/30/2025
 
-const tripsFolder = '/static/trips';
 const maxCloudSize = 250000;
 let tripName, tripTelemetry, scanNames, videoNames;
+let tripSummaries = {}, scanInfo = {};
+let liveTrip = null;
+const maxLivePoints = 20000;
+const mapFetchAttempts = 3;     // Tries for a map whose points match its index
+// Rings of the rover's running (or last) scan, as they were captured
+const liveScan = { job: null, x: [], y: [], z: [], i: [] };
 const months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", 
                 "Oct", "Nov", "Dec"];
 
@@ -29,6 +34,13 @@ const traceLabels = {
     ".camera.connected":                "Camera Connected",
     ".camera.recording":                "Camera Recording",
 
+    ".control.input_to_write_ms.p50":   "Input to Serial Write p50 [ms]",
+    ".control.input_to_write_ms.p95":   "Input to Serial Write p95 [ms]",
+    ".control.input_to_write_ms.p99":   "Input to Serial Write p99 [ms]",
+    ".control.input_to_ack_ms.p50":     "Input to Arduino ACK p50 [ms]",
+    ".control.input_to_ack_ms.p95":     "Input to Arduino ACK p95 [ms]",
+    ".control.input_to_ack_ms.p99":     "Input to Arduino ACK p99 [ms]",
+
     ".motors.front_left.voltage_v":     "Front Left Motor Voltage [V]",
     ".motors.front_left.current_a":     "Front Left Motor Current [A]",
     ".motors.front_left.rpm":           "Front Left Motor Speed [RPM]",
@@ -112,6 +124,14 @@ const telPlotsMap = {
         ".camera.connected",
         ".camera.recording",
     ],
+    "Control Latency": [
+        ".control.input_to_write_ms.p50",
+        ".control.input_to_write_ms.p95",
+        ".control.input_to_write_ms.p99",
+        ".control.input_to_ack_ms.p50",
+        ".control.input_to_ack_ms.p95",
+        ".control.input_to_ack_ms.p99",
+    ],
     "Motor Voltages": [
         ".motors.front_left.voltage_v",
         ".motors.mid_left.voltage_v",
@@ -156,59 +176,82 @@ const telPlotsMap = {
  * Gets file or folder information from the Flask server on the Raspberry Pi. 
  * 
  * @description If the category is 'Trips', gets the trip folders. If the 
- * category is 'Graph', gets the telemetry object from JSON. If the category is 
+ * category is 'Graph', gets a summary of the trip's telemetry (its record 
+ * count); plots fetch their own downsampled fields. If the category is 
  * 'Video' or 'LiDAR', gets all filenames of found videos or scans respectively.
  * 
  * @param {string} tripFolder - The folder of the currently selected trip.
  * @param {string} category - Menu type ("Trips", "Video", "LiDAR", or "Graph").
- * @returns Either telemetry object, filenames string array, or null on error.
+ * @returns Either telemetry summary, filenames string array, or null on error.
  */
 async function queryFilenames(tripFolder, category) {
     try {   // Try to get object containing files in folder from Flask route
+        // Telemetry is summarized (and repaired if truncated) by the backend
+        if (category == "Graph") {
+            const telResponse = await fetch(
+                `/telemetry/${encodeURIComponent(tripFolder)}`);
+            if (!telResponse.ok) {console.warn('No telemetry found!'); return;}
+            return await telResponse.json();
+        }
+
         const fileResponse = await fetch( '/queryFilenames?' + 
             `trip=${encodeURIComponent(tripFolder)}` +
             `&cat=${encodeURIComponent(category)}`
         );
         if (!fileResponse.ok) {console.warn("Couldn't fetch files!"); return;}
-        const filenames = await fileResponse.json();
 
-        // Sort by length, then alphabetically
-        filenames.sort((a, b) => {  
-            if (a.length !== b.length) {
-                return a.length - b.length;
-            } else return a.localeCompare(b);
-        });
+        // Already sorted by length, then alphabetically, by the trip catalog
+        return await fileResponse.json();
 
-        // If you're querying for telemetry, just return the telemetry directly
-        if (category == "Graph") {
-            const path = `${tripsFolder}/${tripFolder}/${filenames[0]}`;
-            const telResponse = await fetch(path);
-            if (!telResponse.ok) {console.warn('No telemetry found!'); return;}
-            let telStr = await telResponse.text();
-
-            try {   // Try to parse JSON as is
-                return JSON.parse(telStr);
-            } catch {
-                try {   // Try to clean malformed JSON
-                    // Usually due to file write interruption on R.Pi shutdown
-                    // Should eventually be cleaned at write time, but trickier
-                    while (telStr.length > 0) {
-                        let idx = telStr.lastIndexOf("}") + 1;  // where to trim to
-                        telStr = telStr.slice(0, idx) + "]}";   // trim and cap
-                        try {
-                            telData = JSON.parse(telStr);
-                        } catch {
-                            telStr = telStr.slice(0, -3);
-                        }
-                        return telData;
-                    }
-                } catch { throw new Error("Could not repair malformed JSON!"); }
-            }
-        } 
+    } catch (error) { console.warn('Data not fetched!' , error); return; }
+}
 
-        return filenames;
+/**
+ * Abbreviates a count, e.g. 1234567 as "1.2M".
+ *
+ * @param {number} n - The count.
+ * @returns {string} The abbreviated count.
+ */
+function formatCount(n) {
+    if (n >= 1e6) return (n / 1e6).toFixed(1) + "M";
+    if (n >= 1e3) return (n / 1e3).toFixed(1) + "k";
+    return String(n);
+}
 
-    } catch (error) { console.warn('Data not fetched!' , error); return; }
+/**
+ * Describes a trip from its precomputed summary, for the trip selector.
+ *
+ * @param {object} [summary] - The trip's summary from /catalog, if any.
+ * @returns {string} e.g. " - 12 min, 340 m, 3 scans, battery 81-97%", or ""
+ *     when the trip hasn't been summarized.
+ */
+function describeTrip(summary) {
+    if (!summary) return "";
+    const parts = [`${Math.round(summary.duration_s / 60)} min`,
+                   `${Math.round(summary.distance_m)} m`,
+                   `${summary.scans} scan${summary.scans == 1 ? "" : "s"}`];
+    const battery = summary.battery.capacity_pct;
+    if (battery.min !== null) 
+        parts.push(`battery ${Math.round(battery.min)}-${Math.round(battery.max)}%`);
+    return " - " + parts.join(", ");
+}
+
+/**
+ * Fetches precomputed metadata from the trip catalog.
+ *
+ * @param {string} tripFolder - A trip, or '' for every trip.
+ * @returns {object} Each scan's metadata by file name for a trip, or each
+ *     trip's summary by name for every trip. Null on error.
+ */
+async function fetchCatalog(tripFolder) {
+    try {
+        const result = await fetch(tripFolder ?
+            `/catalog/${encodeURIComponent(tripFolder)}` : '/catalog');
+        if (!result.ok) throw new Error(`Error from server: ${result.status}`);
+        const catalog = await result.json();
+        if (tripFolder) return catalog.files.scans;
+        return Object.fromEntries(catalog.map(trip => [trip.trip, trip.summary]));
+    } catch (err) { console.warn("Catalog not fetched!", err); return null; }
 }
 
 /**
@@ -238,9 +281,11 @@ function populateSelector(category, selectorId, options) {
                     const mi = tripName.substring(11,13);
                     const s  = tripName.substring(13,15);
                     const tripLabel = (mo+" "+d+", "+y+" "+h+":"+mi+":"+s);
-                    selector.appendChild(new Option(tripLabel, tripName));
+                    selector.appendChild(new Option(
+                        tripLabel + describeTrip(tripSummaries[tripName]), tripName));
                 // Otherwise just use it as is
-                } else selector.appendChild(new Option(tripName));
+                } else selector.appendChild(new Option(
+                    tripName + describeTrip(tripSummaries[tripName]), tripName));
             });
         } else selector.appendChild(new Option("Error Loading Trips"));
         break;
@@ -254,13 +299,23 @@ function populateSelector(category, selectorId, options) {
     case "LiDAR":
         if (Array.isArray(options) && options.length > 0) {
             options.forEach(label => {
-                selector.appendChild(new Option(label));
+                const points = scanInfo[label] && scanInfo[label].points;
+                selector.appendChild(new Option(points ?
+                    `${label} (${formatCount(points)} pts)` : label, label));
             });
         } else selector.appendChild(new Option("No Scans to Display"));
         break;
+    case "Live Scan":
+        selector.appendChild(new Option("Rover's Current Scan"));
+        break;
+    case "Trip Map":
+        if (Array.isArray(options) && options.length > 0) {
+            selector.appendChild(new Option(`All ${options.length} Scans`));
+        } else selector.appendChild(new Option("No Scans to Display"));
+        break;
     case "Graph":
         // Populates graph selector with premade plot options from telPlotsMap
-        if (tripTelemetry && Object.keys(tripTelemetry).length > 0) {
+        if (tripTelemetry && tripTelemetry.records > 0) {
             Object.keys(telPlotsMap).forEach(label => {
                 selector.appendChild(new Option(label));
             });
@@ -302,7 +357,7 @@ async function makeVideoPlot(plotId, videoName) {
     if (!videoNames.includes(videoName)) return;
 
     const video = Object.assign(document.createElement("video"), {
-        src: `${tripsFolder}/${tripName}/${videoName}`,
+        src: `/trips/${encodeURIComponent(tripName)}/files/${encodeURIComponent(videoName)}`,
         controls: true, muted: true, autoplay: true,
         style: {
             width: "100%", height: "100%",
@@ -313,12 +368,84 @@ async function makeVideoPlot(plotId, videoName) {
     document.getElementById(plotId).append(video);
 }
 
+/**
+ * Fetches points sent as packed little-endian float32 arrays (every x, then 
+ * every y, z, and intensity) and views them as typed arrays, no parsing.
+ * 
+ * @param {string} url - A /cloud or /tiles route.
+ * @returns {{x: Float32Array, y: Float32Array, z: Float32Array, 
+ *            i: Float32Array}} The points.
+ */
+async function fetchPoints(url) {
+    const result = await fetch(url);
+    if (!result.ok) throw new Error(`Error from server: ${result.status}`);
+    const buffer = await result.arrayBuffer();
+
+    const n = buffer.byteLength / (4 * Float32Array.BYTES_PER_ELEMENT);
+    return {
+        x: new Float32Array(buffer, 0, n),
+        y: new Float32Array(buffer, 4 * n, n),
+        z: new Float32Array(buffer, 8 * n, n),
+        i: new Float32Array(buffer, 12 * n, n),
+    };
+}
+
+/**
+ * Picks which level-of-detail tiles to show from a camera position.
+ * 
+ * @description Starting from the root, repeatedly adds the child tile that 
+ * looks biggest from the camera (its size over its distance, in Plotly's 
+ * normalized scene coordinates) until the next one would exceed maxCloudSize.
+ * 
+ * @param {object} index - The scan's tile index from /tiles.
+ * @param {object} eye - The Plotly scene camera eye.
+ * @param {object} aspect - The Plotly scene aspect ratio.
+ * @returns {string[]} Node IDs to show, parents before children.
+ */
+function pickTiles(index, eye, aspect) {
+    const ranges = [0, 1, 2].map(k => 
+        Math.max(index.bbox_max[k] - index.bbox_min[k], 1e-6));
+    const scale = [aspect.x, aspect.y, aspect.z];
+
+    // Visible size of a node, from its ID (one octant digit per level)
+    const priority = node => {
+        let min = [...index.cube_min], size = index.cube_size;
+        for (const digit of node.slice(1)) {
+            size /= 2;
+            for (let k = 0; k < 3; k++) min[k] += ((Number(digit) >> k) & 1) * size;
+        }
+        // Data range maps to [-aspect/2, aspect/2] in scene coordinates
+        const center = min.map((v, k) => 
+            ((v + size/2 - index.bbox_min[k]) / ranges[k] - 0.5) * scale[k]);
+        const dist = Math.hypot(eye.x - center[0], eye.y - center[1], eye.z - center[2]);
+        return (size / Math.max(...ranges)) / Math.max(dist, 1e-3);
+    };
+    const children = node => [...Array(8).keys()].map(d => node + d)
+        .filter(child => child in index.nodes);
+
+    const chosen = ['r'];
+    let total = index.nodes.r;
+    let frontier = children('r').map(node => [node, priority(node)]);
+    while (frontier.length > 0) {
+        frontier.sort((a, b) => b[1] - a[1]);
+        const [node] = frontier.shift();
+        if (total + index.nodes[node] > maxCloudSize) break;
+        chosen.push(node);
+        total += index.nodes[node];
+        frontier.push(...children(node).map(child => [child, priority(child)]));
+    }
+    return chosen;
+}
+
 /**
  * Creates and inserts a LiDAR scan into a plot.
  * 
- * @description Fetches, unzips, downsamples, and builds a cloud, then 
- * configures visualizer parameters and generates a Plotly plot. Additionally 
- * displays the time it took to do this in the web console in milliseconds.
+ * @description Loads the scan's level-of-detail tiles coarsest first, then 
+ * refines them whenever the camera moves, showing up to maxCloudSize points 
+ * with the most detail near the camera. Scans without tiles are fetched 
+ * whole, downsampled on the server. Points arrive as packed float32 arrays 
+ * and are viewed as typed arrays without any parsing. Additionally displays
+ * the time it took to show the scan in the web console in milliseconds.
  * 
  * @param {string} plotId - ID of the div that will display the scan.
  * @param {string} scanName - File name of the scan to display.
@@ -326,47 +453,38 @@ async function makeVideoPlot(plotId, videoName) {
  */
 async function makeScanPlot(plotId, scanName) {
     const start = performance.now();
+    const scanUrl = `${encodeURIComponent(tripName)}/${encodeURIComponent(scanName)}`;
+    const plot = document.getElementById(plotId);
+    plot.dataset.scan = scanName;   // Later refinements check it's still shown
 
-    try {   // Try to get scan from Flask backend
-        const result = await fetch(`${tripsFolder}/${tripName}/${scanName}`);
-        if (!result.ok) throw new Error(`Error from server: ${result.status}`);
-        var scanData = await result.text();
+    // Show the scan's thumbnail until the points arrive
+    const thumbnail = Object.assign(document.createElement("img"), {
+        src: `/thumbnail/${scanUrl}`,
+        style: "width: 100%; height: 100%; object-fit: contain; background: black"
+    });
+    thumbnail.onerror = () => thumbnail.remove();
+    plot.replaceChildren(thumbnail);
+
+    let index = null, points;
+    try {   // Try to get the scan's tiles, otherwise the whole scan
+        const result = await fetch(`/tiles/${scanUrl}/index`);
+        if (result.ok) index = await result.json();
+        points = index ? await fetchPoints(`/tiles/${scanUrl}/r`)
+            : await fetchPoints(`/cloud/${scanUrl}?points=${maxCloudSize}`);
     } catch (err) { console.error("Fetch error: ", err); return; }
-    let cloud = scanData.split('\n');
-
-    // Downsample large clouds to some target size (in number of points)
-    if (cloud.length > maxCloudSize) {
-        cloud = cloud.filter(() => Math.random() < maxCloudSize/cloud.length);
-    }
-
-    const xVals = [], yVals = [], zVals = [], iVals = [];
-    for (let i = 0; i < cloud.length; i++) {
-        const pt = cloud[i];
-        if (!pt) continue;
-        const ptArr = pt.split(' ');
-        xVals.push(ptArr[0]);
-        yVals.push(ptArr[1]);
-        zVals.push(ptArr[2]);
-        iVals.push(ptArr[3]);
-    }
-
-    // Using Float32Arrays should provide optimization for WebGL --> Plotly
-    const x = new Float32Array(xVals);
-    const y = new Float32Array(yVals);
-    const z = new Float32Array(zVals);
-    const i = new Float32Array(iVals);
 
     const trace = {
         type: 'scatter3d',
         mode: 'markers',
-        x, y, z,
-        marker: { size: 1, color: i, colorscale: 'Jet', showscale: false },
+        x: points.x, y: points.y, z: points.z,
+        marker: { size: 1, color: points.i, colorscale: 'Jet', showscale: false },
         hoverinfo: 'none',
     };
 
     const layout = {
         paper_bgcolor: "black",
         margin: { l: 0, r: 0, t: 0, b: 0 },
+        uirevision: scanName,   // Keep the camera when tiles are swapped in
         scene: {
             aspectratio: { x: 1, y: 1, z: 0.4},
             camera: {
@@ -379,20 +497,91 @@ async function makeScanPlot(plotId, scanName) {
             zaxis: {visible:false}
         }
     };
+    // Fixed ranges, so tiles don't rescale the scene as they load
+    if (index) {
+        ['xaxis', 'yaxis', 'zaxis'].forEach((axis, k) => 
+            layout.scene[axis].range = [index.bbox_min[k], index.bbox_max[k]]);
+    }
 
-    Plotly.newPlot(plotId, [trace], layout, {responsive: true});
+    if (plot.dataset.scan !== scanName) return;     // Another scan was picked
+    thumbnail.remove();
+    await Plotly.newPlot(plotId, [trace], layout, {responsive: true});
     addFullscreenButton(plotId);
 
     const end = performance.now();
     const elapsed = Math.round(end-start);
     console.log(`Displayed ${scanName} in ${elapsed} ms`);
+    if (!index) return;
+
+    // Progressive refinement: swap in the best tiles for each camera position
+    const tiles = new Map([['r', points]]);
+    let refineTimer = null, generation = 0;
+    const refine = async () => {
+        const gen = ++generation;
+        const camera = plot.layout.scene.camera;
+        const eye = camera.eye ?? { x: 1.25, y: 1.25, z: 1.25 };
+        const chosen = pickTiles(index, eye, plot.layout.scene.aspectratio);
+        try {
+            await Promise.all(chosen.filter(node => !tiles.has(node)).map(async node =>
+                tiles.set(node, await fetchPoints(`/tiles/${scanUrl}/${node}`))));
+        } catch (err) { console.warn("Tile fetch error: ", err); }
+        if (gen !== generation || plot.dataset.scan !== scanName) return;
+
+        // Keeps only the chosen tiles in memory, concatenated into one trace
+        const shown = chosen.filter(node => tiles.has(node));
+        for (const node of [...tiles.keys()]) {
+            if (!shown.includes(node)) tiles.delete(node);
+        }
+        const total = shown.reduce((sum, node) => sum + tiles.get(node).x.length, 0);
+        const merged = { x: new Float32Array(total), y: new Float32Array(total),
+                         z: new Float32Array(total), i: new Float32Array(total) };
+        let offset = 0;
+        for (const node of shown) {
+            const tile = tiles.get(node);
+            for (const key of ['x', 'y', 'z', 'i']) merged[key].set(tile[key], offset);
+            offset += tile.x.length;
+        }
+        Plotly.restyle(plot, { x: [merged.x], y: [merged.y], z: [merged.z],
+                               'marker.color': [merged.i] }, [0]);
+        console.log(`Showing ${total} of ${index.points} points of ${scanName} ` +
+                    `(${shown.length} tiles)`);
+    };
+
+    plot.on('plotly_relayout', event => {
+        if (!Object.keys(event).some(key => key.startsWith('scene.camera'))) return;
+        clearTimeout(refineTimer);
+        refineTimer = setTimeout(refine, 250);  // Wait for the camera to settle
+    });
+    refine();
+}
+
+/**
+ * Fetches downsampled telemetry fields of the current trip from the backend.
+ * 
+ * @param {string[]} fields - Dotted field paths, e.g. ".rpi.temp_c".
+ * @param {number} maxPoints - Most points per field.
+ * @param {number[]} [window] - Start and end time in seconds, or the whole
+ *     trip if omitted.
+ * @returns {object} Each field's "t" and "y" column arrays, or null on error.
+ */
+async function fetchTelemetry(fields, maxPoints, window) {
+    let url = `/telemetry/${encodeURIComponent(tripName)}?` +
+        `fields=${encodeURIComponent(fields.join(','))}&max_points=${maxPoints}`;
+    if (window) url += `&start=${Math.floor(window[0])}&end=${Math.ceil(window[1])}`;
+    try {
+        const result = await fetch(url);
+        if (!result.ok) throw new Error(`Error from server: ${result.status}`);
+        return (await result.json()).fields;
+    } catch (err) { console.warn("Telemetry not fetched!", err); return null; }
 }
 
 /**
  * Creates and inserts a telemetry graph into a plot. 
  * 
  * @description Gets all grouped traces associated with the plot name in the 
- * telPlotsMap object and builds them, then generates Plotly plot for them.
+ * telPlotsMap object, downsampled by the backend to about one point per 
+ * pixel, and generates a Plotly plot for them. Zooming in fetches the zoomed
+ * window again at full detail, so plots cost the same however long the trip.
  * 
  * @param {string} plotId - ID of the div that will display the plot.
  * @param {string} telPlotName - Name of the plot from the telPlotsMap
@@ -401,24 +590,15 @@ async function makeScanPlot(plotId, scanName) {
 async function makeTelemetryPlot(plotId, telPlotName) {
     if (!tripTelemetry) return;
 
-    // Helper function that validates JSON string as number
-    const toNum = val => {
-        if (val == null) return null;
-        const n = Number(val);      // Strings, undefined become NaN
-        return Number.isFinite(n) ? n : null;
-    };
-
-    // Helper function: fucking wizardry, don't ask me, ask GPT
-    const getAtPath = (obj, dotPath) =>
-        dotPath.replace(/^\./, '').split('.').reduce((o, k) => o[k], obj);
-
-    // X [time] should be same for all traces, so just make it once
-    let x = Array.from({length: tripTelemetry.telemetry.length}, (_, i) => i);
+    const plot = document.getElementById(plotId);
+    const fields = telPlotsMap[telPlotName];
+    const maxPoints = Math.max(200, plot.clientWidth);
+    const columns = await fetchTelemetry(fields, maxPoints);
+    if (!columns) return;
     
     const traces = [];
-    telPlotsMap[telPlotName].forEach(field => {
-        // Builds array of values to plot from telemetry object
-        const y = tripTelemetry.telemetry.map(r => toNum(getAtPath(r, field)));
+    fields.forEach(field => {
+        const x = columns[field].t, y = columns[field].y;
 
         let trace = {
             x, y,
@@ -466,13 +646,258 @@ async function makeTelemetryPlot(plotId, telPlotName) {
         }
     };
 
-    Plotly.newPlot(plotId, traces, layout, {responsive: true});
+    await Plotly.newPlot(plotId, traces, layout, {responsive: true});
     addFullscreenButton(plotId);
+    plot.telemetryFields = fields;  // Lets live records be appended
+
+    // Refetch just the visible window when zooming, or everything on reset
+    plot.on('plotly_relayout', async event => {
+        let window;
+        if ('xaxis.range[0]' in event) {
+            window = [event['xaxis.range[0]'], event['xaxis.range[1]']];
+        } else if ('xaxis.range' in event) {
+            window = event['xaxis.range'];
+        } else if (!event['xaxis.autorange']) return;
+
+        const zoomed = await fetchTelemetry(fields, maxPoints, window);
+        if (!zoomed) return;
+        Plotly.restyle(plot, {
+            x: fields.map(field => zoomed[field].t),
+            y: fields.map(field => zoomed[field].y),
+        });
+    });
+}
+
+/**
+ * Looks up a dotted field path (e.g. ".rpi.temp_c") in a record, as the 
+ * server's get_field() does for /telemetry/<trip>.
+ *
+ * @param {object} record - A telemetry record.
+ * @param {string} path - The field path, with or without its leading dot.
+ * @returns {number|null} The value (booleans as 0 or 1), or null if missing
+ * or not a number.
+ */
+function fieldValue(record, path) {
+    let value = record;
+    for (const key of path.replace(/^\./, '').split('.')) {
+        if (value === null || typeof value !== 'object') return null;
+        value = value[key];
+    }
+    if (typeof value === 'boolean') return Number(value);
+    return typeof value === 'number' ? value : null;
+}
+
+/**
+ * Shows all of the trip's scans in one scene, each placed where it was taken.
+ *
+ * @description Fetches the trip's merged map: every scan rotated by the 
+ * rover's IMU yaw and moved to its dead reckoned (or registered) position,
+ * voxel-downsampled on the server to maxCloudSize points in total. Each scan
+ * is its own trace, so scans can be hidden from the legend, and the rover's
+ * estimated path is drawn through them.
+ *
+ * @param {string} plotId - ID of the div that will display the map.
+ * @returns {void}
+ */
+async function makeMapPlot(plotId) {
+    const start = performance.now();
+    const mapUrl = `/map/${encodeURIComponent(tripName)}`;
+    let index, points;
+    try {
+        // The points must come from the same map as the index; a 409 means
+        // it was rebuilt in between, so start over with the new index
+        for (let attempt = 1; !points; attempt++) {
+            const result = await fetch(`${mapUrl}?points=${maxCloudSize}`);
+            if (!result.ok) throw new Error(`Error from server: ${result.status}`);
+            index = await result.json();
+            try {
+                points = await fetchPoints(`${mapUrl}/points?points=${maxCloudSize}` +
+                                           `&etag=${encodeURIComponent(index.etag)}`);
+            } catch (err) {
+                if (attempt >= mapFetchAttempts || !err.message.endsWith('409')) throw err;
+            }
+        }
+    } catch (err) { console.error("Fetch error: ", err); return; }
+
+    const traces = [];
+    let offset = 0;
+    index.scans.forEach(scan => {
+        const end = offset + scan.points;
+        traces.push({
+            type: 'scatter3d',
+            mode: 'markers',
+            name: `${scan.file} (${scan.pose.source})`,
+            x: points.x.subarray(offset, end),
+            y: points.y.subarray(offset, end),
+            z: points.z.subarray(offset, end),
+            marker: { size: 1 },
+            hoverinfo: 'name',
+        });
+        offset = end;
+    });
+    traces.push({
+        type: 'scatter3d',
+        mode: 'lines',
+        name: "Rover Path (estimated)",
+        x: index.track.map(p => p[0]),
+        y: index.track.map(p => p[1]),
+        z: index.track.map(() => 0),
+        line: { color: 'white', width: 4 },
+    });
+
+    const layout = {
+        paper_bgcolor: "black",
+        font: {color: 'white'},
+        margin: { l: 0, r: 0, t: 0, b: 0 },
+        showlegend: true,
+        legend: { x: 0, y: 1, font: {size: 10} },
+        scene: {
+            aspectmode: 'data',
+            camera: { up: { x: 0, y: 0, z: 1 } },
+            xaxis: {visible:false},
+            yaxis: {visible:false},
+            zaxis: {visible:false}
+        }
+    };
+
+    await Plotly.newPlot(plotId, traces, layout, {responsive: true});
+    addFullscreenButton(plotId);
+    console.log(`Displayed map of ${index.scans.length} scans ` +
+                `(${index.points} points) in ${Math.round(performance.now()-start)} ms`);
+}
+
+/**
+ * Unpacks one ring from the live scan feed: base64 encoded, packed 
+ * little-endian float32 arrays, every x, then every y, z, and intensity.
+ *
+ * @param {object} ring - A ring from a /live "rings" event.
+ * @returns {{x: Float32Array, y: Float32Array, z: Float32Array,
+ *     i: Float32Array}} The ring's points.
+ */
+function decodeRing(ring) {
+    const bytes = Uint8Array.from(atob(ring.data), c => c.charCodeAt(0));
+    const values = new Float32Array(bytes.buffer);
+    const n = ring.points;
+    return { x: values.subarray(0, n), y: values.subarray(n, 2*n),
+             z: values.subarray(2*n, 3*n), i: values.subarray(3*n, 4*n) };
+}
+
+/**
+ * Shows the rover's current scan, growing ring by ring while it's captured.
+ *
+ * @description Plots the rings received so far from the /live stream; the
+ * stream's listener appends each new ring, or starts over when a new scan 
+ * begins. Lets operators spot coverage problems without waiting for the file.
+ *
+ * @param {string} plotId - ID of the div that will display the scan.
+ * @returns {void}
+ */
+async function makeLiveScanPlot(plotId) {
+    const plot = document.getElementById(plotId);
+    const trace = {
+        type: 'scatter3d',
+        mode: 'markers',
+        // Copies, since Plotly extends its traces' arrays in place
+        x: liveScan.x.slice(), y: liveScan.y.slice(), z: liveScan.z.slice(),
+        marker: { size: 1, color: liveScan.i.slice(), colorscale: 'Jet', showscale: false },
+        hoverinfo: 'none',
+    };
+    const layout = {
+        paper_bgcolor: "black",
+        margin: { l: 0, r: 0, t: 0, b: 0 },
+        uirevision: 'live',     // Keep the camera as rings are added
+        scene: {
+            aspectmode: 'data',
+            camera: { up: { x: 0, y: 0, z: 1 } },
+            xaxis: {visible:false},
+            yaxis: {visible:false},
+            zaxis: {visible:false}
+        }
+    };
+
+    await Plotly.newPlot(plotId, [trace], layout, {responsive: true});
+    addFullscreenButton(plotId);
+    plot.liveScan = true;
+}
+
+/**
+ * Subscribes to the rover's live telemetry and scan progress.
+ *
+ * @description Opens a Server-Sent Events stream from /live. While the rover
+ * is running, every new telemetry record is appended to each open graph of
+ * the live trip, so they grow without refetching the trip, and the progress
+ * of a running scan is shown next to the trip selector.
+ *
+ * @returns {void}
+ */
+function followLiveTrip() {
+    const status = document.getElementById("live_status");
+    const source = new EventSource('/live');
+
+    source.addEventListener('trip', event => {
+        const trip = JSON.parse(event.data);
+        liveTrip = trip.live ? trip.trip : null;
+        status.textContent = trip.live ? "Live" : "";
+    });
+
+    source.addEventListener('telemetry', event => {
+        if (!liveTrip || tripName !== liveTrip || !tripTelemetry) return;
+        // seq goes up by 2 per record, so it also gives the record's index
+        const t = Number(event.lastEventId) / 2 - 1;
+        const record = JSON.parse(event.data);
+        tripTelemetry.records = Math.max(tripTelemetry.records, t + 1);
+
+        for (let i = 0; i < 3; i++) {
+            const plot = document.getElementById(`plot${i+1}`);
+            const fields = plot.telemetryFields;
+            if (!fields || !plot.data || !plot.data.length) continue;
+            const shown = plot.data[0].x;
+            if (shown.length && shown[shown.length - 1] >= t) continue;
+            Plotly.extendTraces(plot, {
+                x: fields.map(() => [t]),
+                y: fields.map(field => [fieldValue(record, field)]),
+            }, fields.map((_, k) => k), maxLivePoints);
+        }
+    });
+
+    source.addEventListener('rings', event => {
+        const feed = JSON.parse(event.data);
+        if (feed.reset) {
+            liveScan.job = feed.job;
+            ['x', 'y', 'z', 'i'].forEach(k => liveScan[k] = []);
+        }
+        const added = { x: [], y: [], z: [], i: [] };
+        feed.rings.forEach(ring => {
+            const points = decodeRing(ring);
+            ['x', 'y', 'z', 'i'].forEach(k => added[k].push(...points[k]));
+        });
+        ['x', 'y', 'z', 'i'].forEach(k => liveScan[k].push(...added[k]));
+
+        for (let i = 0; i < 3; i++) {
+            const plot = document.getElementById(`plot${i+1}`);
+            if (!plot.liveScan || !plot.data) continue;
+            if (feed.reset) {
+                Plotly.restyle(plot, { x: [liveScan.x.slice()], y: [liveScan.y.slice()],
+                    z: [liveScan.z.slice()], 'marker.color': [liveScan.i.slice()] });
+            } else if (added.x.length) {
+                Plotly.extendTraces(plot, { x: [added.x], y: [added.y], z: [added.z],
+                                            'marker.color': [added.i] }, [0], maxCloudSize);
+            }
+        }
+    });
+
+    source.addEventListener('scan', event => {
+        const job = JSON.parse(event.data);
+        const running = !["queued", "done", "failed"].includes(job.stage);
+        status.textContent = (liveTrip ? "Live" : "") + (running ?
+            ` | Scan ${job.stage} ${Math.round(job.progress_pct)}%` : "");
+    });
 }
 
 document.addEventListener("DOMContentLoaded", async function() {
     // Get trip folders, aggregate relevant HTML elements for each plot section
     let tripNames = await queryFilenames('', "Trips");
+    tripSummaries = await fetchCatalog('') ?? {};
     const tripSelector = document.getElementById("trip_select");
     const plotTypeSelectors = [], plotDataSelectors = [];
     for (let i = 0; i < 3; i++) {
@@ -487,6 +912,7 @@ document.addEventListener("DOMContentLoaded", async function() {
         videoNames =    await queryFilenames(tripName, "Video");
         scanNames =     await queryFilenames(tripName, "LiDAR");
         tripTelemetry = await queryFilenames(tripName, "Graph");
+        scanInfo =      await fetchCatalog(tripName) ?? {};
 
         // Resets plots on trip change
         for (let i = 0; i < 3; i++) {
@@ -509,6 +935,7 @@ document.addEventListener("DOMContentLoaded", async function() {
             if (typeSelector.value == "Video") choices = videoNames;
             if (typeSelector.value == "LiDAR") choices = scanNames;
             if (typeSelector.value == "Graph") choices = undefined;
+            if (typeSelector.value == "Trip Map") choices = scanNames;
             populateSelector(typeSelector.value, `plot${i+1}_data`, choices);
 
             dataSelector.dispatchEvent(new Event("change"));
@@ -516,7 +943,11 @@ document.addEventListener("DOMContentLoaded", async function() {
 
         // When users select new data to plot, refresh plot with new data
         dataSelector.addEventListener("change", function() {
-            document.getElementById(`plot${i+1}`).replaceChildren();
+            const plot = document.getElementById(`plot${i+1}`);
+            Plotly.purge(plot);     // Also stops live updates to the old plot
+            delete plot.telemetryFields;
+            delete plot.liveScan;
+            plot.replaceChildren();
             switch (typeSelector.value) {
             case "LiDAR":
                 if (dataSelector.value != "No Scans to Display") 
@@ -530,6 +961,13 @@ document.addEventListener("DOMContentLoaded", async function() {
                 if (dataSelector.value != "No Data to Display")
                     makeTelemetryPlot(`plot${i+1}`, dataSelector.value);
                 break;
+            case "Live Scan":
+                makeLiveScanPlot(`plot${i+1}`);
+                break;
+            case "Trip Map":
+                if (dataSelector.value != "No Scans to Display")
+                    makeMapPlot(`plot${i+1}`);
+                break;
             }
         });
     }
@@ -537,4 +975,5 @@ document.addEventListener("DOMContentLoaded", async function() {
     // Runs after DOMContentLoaded and loads in the first trip by default
     populateSelector("Trips", "trip_select", tripNames);
     tripSelector.dispatchEvent(new Event("change"));
+    followLiveTrip();
 });
\ No newline at end of file
@@ -1,15 +1,251 @@
 # Unified web viewer backend
 # AEGIS Senior Design, Created on 6/9/25
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, abort, render_template, jsonify, request, send_file, send_from_directory
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from werkzeug.utils import safe_join
 import os   # listdir(), endswith(), path.join(), path.isdir(), path.isfile()
 from os.path import join, isdir, isfile
+import hashlib
+import json
+import mimetypes
+import re
+import sys
+import time
+
+import numpy as np
+
+# Run as a script (python stream/web_viewer.py), the repository root isn't on
+# the path, so utils can't be imported
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import file_utils    # read_cloud_file(), find_trip_json()
+from utils import math_utils    # lttb_indices(), minmax_indices()
+from utils import telemetry_utils   # TelemetrySnapshot
+from utils import octree_utils  # build_tiles(), tiles_folder()
+from utils import catalog_utils # TripCatalog
+from utils import preview_utils # make_thumbnail()
+from utils import ring_feed_utils   # RingFeedCollector
+from utils import map_utils     # merge_scans()
+from lidar import ring_store    # CHECKPOINT_EXT
 
 app = Flask(__name__) # Creates Flask app instance
 
 # Directory to be monitored for new trip folders
 # Sets absolute directory path because python is stupid
 trips_folder = join(app.static_folder, 'trips')     # type: ignore
+catalog = catalog_utils.TripCatalog(trips_folder)   # Trips and file metadata
+ring_collector = ring_feed_utils.RingFeedCollector()    # Rings of the running scan
+
+CLOUD_FIELDS = 4                # x, y, z, intensity
+DEFAULT_CLOUD_POINTS = 250000   # Points sent when the frontend doesn't ask
+CLOUD_CACHE_SIZE = 2            # Parsed clouds kept in memory (~16 B/point)
+tiles_lock = Lock()             # One tile or thumbnail build at a time
+records_lock = Lock()           # One record log backfill at a time
+DEFAULT_PLOT_POINTS = 1000      # Telemetry points per field when not asked
+MAX_PLOT_POINTS = 20000
+JSON_REPAIR_ATTEMPTS = 50       # Records trimmed off a truncated trip JSON
+MAX_TAIL_RECORDS = 1000         # Most records sent per tail request
+ARTIFACT_SETTLE_S = 60          # Unmodified this long, a trip file is finished
+ARTIFACT_MAX_AGE_S = 31536000   # Cache lifetime of finished trip files
+COMPRESSIBLE_EXTS = ('.txt', '.json', '.records', '.metrics')
+compress_lock = Lock()          # One on-demand precompression at a time
+DEFAULT_MAP_POINTS = 250000     # Points in a merged trip map when not asked
+MAX_MAP_POINTS = 2000000
+MAP_CACHE_SIZE = 2              # Merged maps kept in memory
+MAP_REBUILD_S = 10              # Shortest time between rebuilds of a map
+maps: OrderedDict = OrderedDict()   # (trip, points) -> etag, body, index, built
+maps_lock = Lock()              # One map build at a time
+LIVE_POLL_S = 0.05              # How often live streams check for new records
+LIVE_RETRY_S = 2.0              # How often to look for the rover when it's off
+LIVE_KEEPALIVE_S = 15.0         # Comment sent to idle streams to keep them open
+
+# HELPERS ----------------------------------------------------------------------
+
+@lru_cache(maxsize=CLOUD_CACHE_SIZE)
+def load_cloud(path: str, mtime_ns: int) -> np.ndarray:
+    """
+    Parses a saved .txt cloud into an (N, 4) float32 array of x, y, z and 
+    intensity. Cached by modification time, so a rewritten cloud is reparsed.
+    """
+    return file_utils.read_cloud_file(path, CLOUD_FIELDS)
+
+def decimate(cloud: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Uniformly samples up to max_points points, keeping their order. Seeded, so
+    the same request always gets the same points.
+    """
+    if len(cloud) <= max_points:
+        return cloud
+    rng = np.random.default_rng(0)
+    keep = np.sort(rng.choice(len(cloud), size=max_points, replace=False))
+    return cloud[keep]
+
+def load_map(trip_path: str, max_points: int,
+             etag: str | None = None) -> tuple[str, bytes, dict] | None:
+    """
+    Merges a trip's scans into one map (see map_utils), packed like /cloud,
+    and tags it with a hash of its map_signature(). Cached, and rebuilt when
+    the signature changes, but at most every MAP_REBUILD_S while a trip is
+    live. Given an etag, returns the cached map with it as is, or None if
+    it has been replaced, so a map's index and points always match.
+    """
+    key = (trip_path, max_points)
+    with maps_lock:
+        cached = maps.get(key)
+        if etag is not None and (cached is None or cached[0] != etag):
+            return None
+        if cached is not None and (etag is not None or
+                                   time.monotonic() - cached[3] < MAP_REBUILD_S):
+            maps.move_to_end(key)
+            return cached[:3]
+
+        signature = map_signature(trip_path)
+        tag = hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+        if cached is None or cached[0] != tag:
+            points, index = map_utils.merge_scans(
+                trip_path, file_utils.find_trip_json(trip_path), max_points)
+            cached = (tag, np.ascontiguousarray(points.T, dtype='<f4').tobytes(), index)
+        maps[key] = (*cached[:3], time.monotonic())
+        maps.move_to_end(key)
+        while len(maps) > MAP_CACHE_SIZE:
+            maps.popitem(last=False)
+        return cached[:3]
+
+def map_signature(trip_path: str) -> tuple:
+    '''
+    Everything a trip's map is built from: its clouds' and tiles' modification
+    times and the trip JSON's scan entries. Not the telemetry, which changes
+    every second on a live trip, so odometry poses refresh with new scans.
+    '''
+    files = tuple(sorted((entry.name, entry.stat().st_mtime_ns)
+                         for entry in os.scandir(trip_path)
+                         if entry.name.endswith(('.txt', octree_utils.TILES_EXT))))
+    trip_json = file_utils.find_trip_json(trip_path)
+    try:
+        scans = json.dumps(load_trip_json(trip_json, os.stat(trip_json).st_mtime_ns)
+                           .get("scans", []), sort_keys=True) if trip_json else None
+    except (OSError, ValueError):
+        scans = None
+    return files, scans
+
+@lru_cache(maxsize=2)
+def load_trip_json(path: str, mtime_ns: int) -> dict:
+    """
+    Parses a trip JSON, cached by modification time. A file cut off mid-write
+    (e.g. by a shutdown) is repaired by dropping the partial last record.
+    """
+    with open(path, 'r') as file:
+        text = file.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    end = len(text)
+    for _ in range(JSON_REPAIR_ATTEMPTS):
+        end = text.rfind('}', 0, end)
+        if end < 0:
+            break
+        try:
+            return json.loads(text[:end + 1] + ']}')
+        except json.JSONDecodeError:
+            continue
+    raise ValueError(f"Could not repair malformed JSON! ({path})")
+
+def get_field(records: list[dict], path: str) -> np.ndarray:
+    """
+    Collects a dotted field path (e.g. '.rpi.temp_c') from every record as 
+    floats. Missing or non-numeric values are NaN, booleans are 0 or 1.
+    """
+    keys = path.lstrip('.').split('.')
+    values = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        value = record
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)):
+            values[i] = value
+    return values
+
+def file_etag(stat: os.stat_result, *extra) -> str:
+    '''
+    A strong ETag from a file's mtime and size (plus anything else the
+    response depends on). Trip files are only ever appended to or replaced,
+    which always moves the mtime.
+    '''
+    return '-'.join(f"{v:x}" if isinstance(v, int) else str(v)
+                    for v in (stat.st_mtime_ns, stat.st_size, *extra))
+
+def is_finished(path: str, stat: os.stat_result) -> bool:
+    '''
+    Whether a trip file is done being written: it hasn't been touched for
+    ARTIFACT_SETTLE_S, and no scan is in progress in its trip folder. Any
+    trip can get new files, since interrupted scans are resumed into the
+    trip they were started in.
+    '''
+    if time.time() - stat.st_mtime <= ARTIFACT_SETTLE_S:
+        return False
+    return not any(name.endswith(ring_store.CHECKPOINT_EXT)
+                   for name in os.listdir(os.path.dirname(path)))
+
+def compressed_copy(path: str, stat: os.stat_result) -> str | None:
+    '''
+    The current gzipped copy of a finished text file, made now if the rover
+    didn't (e.g. for older trips), or None for other files.
+    '''
+    if not path.endswith(COMPRESSIBLE_EXTS):
+        return None
+    compressed = path + file_utils.GZIP_EXT
+    current = lambda: isfile(compressed) and \
+        os.stat(compressed).st_mtime_ns == stat.st_mtime_ns
+    if current():
+        return compressed
+    if not is_finished(path, stat):
+        return None
+    with compress_lock:
+        if not current():
+            try:
+                file_utils.precompress(path)
+            except OSError as e:
+                print(f"[ERR] web_viewer.py: Couldn't compress {path}! ({e})")
+                return None
+    return compressed
+
+def send_file_mimetype(name: str) -> str:
+    '''
+    The mimetype of a trip file, as send_file() would guess it.
+    '''
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+def attach_snapshot(name: str) -> telemetry_utils.TelemetrySnapshot | None:
+    '''
+    Attaches to a shared memory snapshot, or None if the rover isn't running.
+    '''
+    try:
+        return telemetry_utils.TelemetrySnapshot(name=name)
+    except FileNotFoundError:
+        return None
+
+def sse_event(event: str, data: dict | str, event_id: int | None = None) -> str:
+    '''
+    Formats one Server-Sent Event.
+    '''
+    lines = f"event: {event}\n"
+    if event_id is not None:
+        lines += f"id: {event_id}\n"
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return lines + f"data: {payload}\n\n"
+
+def latest_trip() -> str | None:
+    '''
+    The newest trip folder, which is the one a running rover writes to.
+    '''
+    trips = sorted(f for f in os.listdir(trips_folder) if isdir(join(trips_folder, f)))
+    return trips[-1] if trips else None
 
 # ROUTES -----------------------------------------------------------------------
 
@@ -30,27 +266,419 @@ def get_all_filenames():
     """
     Retrieves all files belonging to a specific category (LiDAR txts, video 
     MP4s, or telemetry JSONs) and sends them to the frontend as a JSON object.
-    Can also retrieve all trip folder names from trips folder.
+    Can also retrieve all trip folder names from trips folder. Names come from
+    the trip catalog, sorted by length and then alphabetically.
     """
     trip = request.args.get('trip','')
     category = request.args.get('cat','')
 
     try:
-        names = []
+        catalog.refresh()
         if category == 'Trips':
-            for f in os.listdir(trips_folder):
-                if isdir(join(trips_folder, f)):
-                    names.append(f)
+            names = catalog_utils.sort_names(catalog.trips)
         else:
-            ext = {"Video":".mp4", "LiDAR":".txt", "Graph":".json"}[category]
-            for f in os.listdir(join(trips_folder, trip)):
-                if isfile(join(trips_folder, trip, f)) and f.endswith(ext):
-                    names.append(f)
+            kind = {"Video":"videos", "LiDAR":"scans", "Graph":"telemetry"}[category]
+            names = catalog.filenames(trip, kind)
 
         return jsonify(names)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/catalog')
+@app.route('/catalog/<trip>')
+def get_catalog(trip: str | None = None):
+    """
+    Sends trip summaries from the trip catalog: size, duration, and scan and
+    video counts. With a trip, also every file's metadata (size, and point
+    count, bounding box and rings of scans, durations of videos, records of
+    telemetry). Query arguments for the trip list:
+
+        has             Only trips with 'scans', 'videos' or 'telemetry'
+        min_duration    Only trips at least this many seconds long
+    """
+    catalog.refresh()
+    if trip is not None:
+        summary = catalog.trip_summary(trip, files=True)
+        if summary is None:
+            abort(404)
+        return jsonify(summary)
+
+    has = request.args.get('has')
+    if has is not None and has not in catalog_utils.CATEGORIES.values():
+        abort(400)
+    return jsonify(catalog.list_trips(
+        has=has, min_duration_s=request.args.get('min_duration', 0, type=float)))
+
+@app.route('/cloud/<trip>/<scan>')
+def get_cloud(trip: str, scan: str):
+    """
+    Sends a scan as packed little-endian float32 arrays, one after another: 
+    every x, then every y, z, and intensity. Decimated on the server to at 
+    most the 'points' query argument, so the frontend can load it straight
+    into typed arrays. The X-Point-Count and X-Total-Points headers give the
+    number of points sent and in the whole scan.
+    """
+    path = safe_join(trips_folder, trip, scan)
+    if path is None or not scan.endswith('.txt') or not isfile(path):
+        abort(404)
+    max_points = max(request.args.get('points', DEFAULT_CLOUD_POINTS, type=int), 0)
+
+    # Revalidating a cloud already sent skips parsing it entirely
+    stat = os.stat(path)
+    etag = file_etag(stat, max_points)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    cloud = load_cloud(path, stat.st_mtime_ns)
+    sent = decimate(cloud, max_points)
+
+    body = np.ascontiguousarray(sent.T, dtype='<f4').tobytes()
+    response = Response(body, mimetype='application/octet-stream')
+    response.headers['X-Point-Count'] = str(len(sent))
+    response.headers['X-Total-Points'] = str(len(cloud))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/tiles/<trip>/<scan>/<node>')
+def get_tile(trip: str, scan: str, node: str):
+    """
+    Sends one level-of-detail tile of a scan, in the same format as 
+    /cloud, or the scan's tile index if node is 'index'. Builds the tiles 
+    first if the rover didn't (e.g. for older scans).
+    """
+    path = safe_join(trips_folder, trip, scan)
+    if path is None or not scan.endswith('.txt') or not isfile(path):
+        abort(404)
+    if node != 'index' and not re.fullmatch(r'r[0-7]*', node):
+        abort(404)
+
+    if not octree_utils.tiles_are_current(path):
+        with tiles_lock:
+            octree_utils.build_tiles(path)
+
+    folder = octree_utils.tiles_folder(path)
+    if node == 'index':
+        return send_from_directory(folder, 'index.json', max_age=0)
+    if not isfile(join(folder, f"{node}.bin")):
+        abort(404)
+    return send_from_directory(folder, f"{node}.bin", mimetype='application/octet-stream')
+
+@app.route('/telemetry/<trip>')
+def get_trip_telemetry(trip: str):
+    """
+    Sends downsampled telemetry columns, so plots cost the same however long
+    the trip was. Query arguments:
+
+        fields      Dotted field paths, comma separated or repeated 
+                    (e.g. .rpi.temp_c,.imu.yaw_deg)
+        start, end  Time window in seconds from the start of the trip
+        max_points  Points per field (default DEFAULT_PLOT_POINTS)
+        method      'lttb' (default) or 'minmax'
+
+    Time is the record index, one record per second. Missing values are 
+    dropped. With no fields, only the trip's record count is sent.
+    """
+    trip_path = safe_join(trips_folder, trip)
+    if trip_path is None or not isdir(trip_path):
+        abort(404)
+    trip_json = file_utils.find_trip_json(trip_path)
+    if trip_json is None:
+        abort(404)
+
+    fields = [f for arg in request.args.getlist('fields') for f in arg.split(',') if f]
+    max_points = min(request.args.get('max_points', DEFAULT_PLOT_POINTS, type=int), 
+                     MAX_PLOT_POINTS)
+    method = request.args.get('method', 'lttb')
+    if method not in ('lttb', 'minmax'):
+        return jsonify({"error": f"Unknown method '{method}'"}), 400
+
+    try:
+        records = load_trip_json(trip_json, os.stat(trip_json).st_mtime_ns)["telemetry"]
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": str(e)}), 500
+
+    start = max(request.args.get('start', 0, type=int), 0)
+    end = min(request.args.get('end', len(records), type=int), len(records))
+    window = records[start:end]
+    t = np.arange(start, start + len(window))
+
+    columns = {}
+    for field in fields:
+        y = get_field(window, field)
+        valid = ~np.isnan(y)
+        t_valid, y_valid = t[valid], y[valid]
+        if method == 'lttb':
+            keep = math_utils.lttb_indices(t_valid, y_valid, max_points)
+        else:
+            keep = math_utils.minmax_indices(y_valid, max_points)
+        columns[field] = {"t": t_valid[keep].tolist(), "y": y_valid[keep].tolist()}
+
+    return jsonify({"trip": trip, "records": len(records), "start": start,
+                    "end": max(end, start), "method": method, "fields": columns})
+
+@app.route('/thumbnail/<trip>/<scan>')
+def get_thumbnail(trip: str, scan: str):
+    """
+    Sends a scan's top-down thumbnail PNG, made first if the rover didn't
+    (e.g. for older scans), with the same caching as other trip files.
+    """
+    path = safe_join(trips_folder, trip, scan)
+    if path is None or not scan.endswith('.txt') or not isfile(path):
+        abort(404)
+    if not isfile(preview_utils.thumbnail_filename(path)):
+        with tiles_lock:
+            preview_utils.make_thumbnail(path)
+    return get_trip_file(trip, os.path.basename(preview_utils.thumbnail_filename(path)))
+
+@app.route('/map/<trip>')
+@app.route('/map/<trip>/<part>')
+def get_trip_map(trip: str, part: str = 'index'):
+    """
+    Sends all of a trip's scans merged into one map, each placed by its pose
+    and voxel-downsampled to at most the 'points' query argument in total.
+
+        /map/<trip>          The index: each scan's file, pose and point
+                             count, the voxel size, the odometry track and
+                             the map's etag
+        /map/<trip>/points   The points, in the same format as /cloud and
+                             grouped by scan in the index's order. Needs the
+                             index's 'etag' query argument, and is a 409 once
+                             that map has been rebuilt (fetch the index again)
+    """
+    trip_path = safe_join(trips_folder, trip)
+    if trip_path is None or not isdir(trip_path) or part not in ('index', 'points'):
+        abort(404)
+    max_points = min(max(request.args.get('points', DEFAULT_MAP_POINTS, type=int), 1),
+                     MAX_MAP_POINTS)
+
+    if part == 'index':
+        etag, _, index = load_map(trip_path, max_points)     # type: ignore
+        return jsonify({"trip": trip, "etag": etag, **index})
+
+    etag = request.args.get('etag')
+    if not etag:
+        abort(400)
+    cached = load_map(trip_path, max_points, etag)
+    if cached is None:
+        abort(409)
+    _, body, index = cached
+    response = Response(body, mimetype='application/octet-stream')
+    response.headers['X-Point-Count'] = str(index["points"])
+    response.headers['ETag'] = f'"{etag}"'
+    return response
+
+@app.route('/trips/<trip>/files/<name>')
+def get_trip_file(trip: str, name: str):
+    """
+    Sends a file from a trip folder (cloud, video, trip JSON, sidecar) with
+    a strong ETag and byte-range support, so videos can seek and unchanged
+    files revalidate with a 304. Finished files are cached as immutable;
+    files the rover may still be writing must be revalidated. Finished text
+    files are sent gzipped to clients that accept it, from a copy compressed
+    once (by the rover at save time, or here on first request).
+    """
+    path = safe_join(trips_folder, trip, name)
+    if path is None or not isfile(path) or name.endswith(file_utils.GZIP_EXT):
+        abort(404)
+    stat = os.stat(path)
+    finished = is_finished(path, stat)
+
+    compressed = None
+    if 'gzip' in request.accept_encodings:
+        compressed = compressed_copy(path, stat)
+
+    if compressed is not None:
+        # A different representation, so a different ETag
+        response = send_file(compressed, mimetype=send_file_mimetype(name),
+                             etag=file_etag(stat, 'gz'), conditional=True)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(path, etag=file_etag(stat), conditional=True)
+    response.vary.add('Accept-Encoding')
+
+    if finished:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ARTIFACT_MAX_AGE_S
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    return response
+
+@app.route('/trips/<trip>/telemetry')
+def get_telemetry_tail(trip: str):
+    """
+    Sends the telemetry records after the first `since`, read from the trip's
+    record log rather than the trip JSON, so polling an in-progress trip
+    costs O(new records). Query arguments:
+
+        since   Records the client already has (default 0)
+        limit   Most records to send (default and max MAX_TAIL_RECORDS)
+
+    The response has the trip's record count, so clients poll with
+    since=<next> until next == records. Trips recorded before record logs
+    existed are indexed on first request (409 if one is still running).
+    """
+    trip_path = safe_join(trips_folder, trip)
+    if trip_path is None or not isdir(trip_path):
+        abort(404)
+    trip_json = file_utils.find_trip_json(trip_path)
+    if trip_json is None:
+        abort(404)
+
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', MAX_TAIL_RECORDS, type=int), 1),
+                MAX_TAIL_RECORDS)
+
+    log = file_utils.records_filename(trip_json)
+    if not isfile(log + file_utils.RECORDS_INDEX_EXT):
+        # The rover makes its log when a trip starts, so a live trip without
+        # one was started by older code; backfilling it would lose records
+        if trip == latest_trip() and isfile(f"/dev/shm/{telemetry_utils.SNAPSHOT_NAME}"):
+            abort(409)
+        with records_lock:
+            if not isfile(log + file_utils.RECORDS_INDEX_EXT):
+                try:
+                    file_utils.index_telemetry_records(trip_json)
+                except (OSError, ValueError) as e:
+                    print(f"[ERR] web_viewer.py: Couldn't index {trip_json}! ({e})")
+                    abort(500)
+
+    count, records = file_utils.read_telemetry_records(trip_json, since, limit)
+    return jsonify({
+        "trip": trip,
+        "records": count,
+        "since": min(since, count),
+        "next": min(since, count) + len(records),
+        "telemetry": records
+    })
+
+def read_snapshot_or_abort(name: str) -> tuple[int, dict]:
+    '''
+    Reads a shared memory snapshot once, or aborts with 404 if the rover isn't
+    running or hasn't published to it yet.
+    '''
+    snapshot = attach_snapshot(name)
+    if snapshot is None:
+        abort(404)
+    try:
+        seq, data = snapshot.read()
+    except TimeoutError:
+        abort(503)
+    finally:
+        snapshot.close()
+    if data is None:
+        abort(404)
+    return seq, data
+
+@app.route('/obstacles')
+def get_obstacles():
+    """
+    The drive mode obstacle stream's latest histogram (see
+    ObstacleStream.histogram_summary()), read from the shared memory snapshot
+    the UART process publishes. Telemetry records only carry its nearest
+    return.
+    """
+    seq, obstacles = read_snapshot_or_abort(telemetry_utils.OBSTACLES_NAME)
+    return jsonify({"seq": seq, **obstacles})
+
+@app.route('/metrics')
+def get_scanner_metrics():
+    """
+    The scanner's, LiDAR's and motor's counters and stage timers since the
+    rover started (see Scanner.metrics_summary()), as of the latest telemetry
+    record. Each saved scan's own metrics are in its .metrics sidecar.
+    """
+    seq, metrics = read_snapshot_or_abort(telemetry_utils.METRICS_NAME)
+    return jsonify({"seq": seq, "metrics": metrics})
+
+@app.route('/live')
+def stream_live_telemetry():
+    """
+    Streams the running trip as Server-Sent Events, read from the shared
+    memory snapshots the UART process publishes (no trip JSON is read):
+
+        trip        {"trip", "live"} on connect and whenever the rover starts
+                    or stops
+        telemetry   Each new telemetry record, with its sequence number as id
+        scan        The running scan job (see ScanJob.to_dict()) whenever its
+                    stage or progress changes
+        rings       {"job", "reset", "rings"}: the running scan's newly
+                    captured rings (see ring_feed_utils), or with reset, all
+                    of a new scan's rings so far
+
+    Only the newest record is sent, so a slow client skips records instead of
+    falling behind. Rings are never skipped.
+    """
+    ring_collector.start()
+
+    def generate():
+        telemetry = scan = None
+        telemetry_seq = scan_seq = 0
+        ring_job, ring_count = None, 0
+        live = None
+        last_sent_s = time.monotonic()
+        try:
+            while True:
+                if telemetry is None:
+                    telemetry = attach_snapshot(telemetry_utils.SNAPSHOT_NAME)
+                if scan is None:
+                    scan = attach_snapshot(telemetry_utils.SCAN_PROGRESS_NAME)
+                if live != (telemetry is not None):
+                    live = telemetry is not None
+                    yield sse_event('trip', {"trip": latest_trip(), "live": live})
+                    last_sent_s = time.monotonic()
+                if telemetry is None:
+                    time.sleep(LIVE_RETRY_S)
+                    continue
+
+                try:
+                    if telemetry.seq != telemetry_seq:
+                        telemetry_seq, record = telemetry.read()
+                        if record is not None:
+                            yield sse_event('telemetry', record, telemetry_seq)
+                            last_sent_s = time.monotonic()
+                    if scan is not None and scan.seq != scan_seq:
+                        scan_seq, job = scan.read()
+                        if job is not None:
+                            yield sse_event('scan', job, scan_seq)
+                            last_sent_s = time.monotonic()
+                except TimeoutError:
+                    pass
+
+                job_id, rings = ring_collector.since(ring_job, ring_count)
+                if job_id != ring_job or rings:
+                    reset = job_id != ring_job
+                    ring_job = job_id
+                    ring_count = len(rings) if reset else ring_count + len(rings)
+                    yield sse_event('rings', {"job": job_id, "reset": reset, "rings": rings})
+                    last_sent_s = time.monotonic()
+
+                # A restarted rover makes a new block, so reattach if it's gone
+                if not isfile(f"/dev/shm/{telemetry_utils.SNAPSHOT_NAME}"):
+                    telemetry.close()
+                    telemetry, telemetry_seq = None, 0
+                    if scan is not None:
+                        scan.close()
+                        scan, scan_seq = None, 0
+                    continue
+
+                if time.monotonic() - last_sent_s > LIVE_KEEPALIVE_S:
+                    yield ": keepalive\n\n"
+                    last_sent_s = time.monotonic()
+                time.sleep(LIVE_POLL_S)
+        finally:
+            for snapshot in (telemetry, scan):
+                if snapshot is not None:
+                    snapshot.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 
 if __name__ == "__main__":
     os.makedirs(trips_folder, exist_ok=True)
@@ -0,0 +1,312 @@
+# Catalog Utilities
+# Created 10/19/2026
+
+'''
+An in-memory catalog of the trips folder, so the web viewer can list and
+filter trips and their files without walking the SD card on every request.
+
+Adding or removing a file changes its folder's mtime, so a refresh only
+stats the trips folder and each trip folder, and relists a trip only when its
+mtime moved. File metadata is cached by mtime and size (and the mtimes of its
+sidecars) and only read again when one of those changes. Files can also grow
+without their folder changing (telemetry, during a trip), so the newest trip's
+files are always re-stat'ed.
+
+Metadata comes from what the rover already writes next to each file, never
+from parsing a whole cloud or video:
+
+    scans       Points and bounding box from the scan's tiles index, rings,
+                points and duration from its .metrics sidecar, and whether
+                it has a thumbnail
+    videos      Duration from the MP4 'mvhd' header
+    telemetry   Record count from the record log index (one record per
+                second, so also the duration), and the trip summary
+'''
+
+from threading import Lock
+import json
+import os
+import struct
+import time
+
+from utils import file_utils    # records_filename(), RECORDS_INDEX_EXT, RECORD_OFFSET
+from utils import octree_utils  # tiles_folder()
+from utils import preview_utils # thumbnail_filename(), summary_filename()
+
+CATEGORIES = {".txt": "scans", ".mp4": "videos", ".json": "telemetry"}
+
+
+def sort_names(names) -> list[str]:
+    '''
+    Sorts by length, then alphabetically, as the viewer lists files.
+    '''
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def read_json(filename: str) -> dict | None:
+    try:
+        with open(filename, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def mp4_duration_s(filename: str) -> float | None:
+    """
+    Reads an MP4's duration from its movie header, seeking over every other
+    box, so only a few dozen bytes are read.
+
+    Args:
+        filename (str): The video.
+    Returns:
+        duration_s (float | None): The duration, or None if not found.
+    """
+
+    def boxes(file, start: int, end: int):
+        offset = start
+        while offset + 8 <= end:
+            file.seek(offset)
+            size, kind = struct.unpack('>I4s', file.read(8))
+            header = 8
+            if size == 1:
+                size, header = struct.unpack('>Q', file.read(8))[0], 16
+            elif size == 0:
+                size = end - offset
+            if size < header:
+                return
+            yield kind, offset + header, offset + size
+            offset += size
+
+    try:
+        with open(filename, 'rb') as file:
+            end = os.fstat(file.fileno()).st_size
+            for kind, start, stop in boxes(file, 0, end):
+                if kind != b'moov':
+                    continue
+                for kind, start, stop in boxes(file, start, stop):
+                    if kind != b'mvhd':
+                        continue
+                    file.seek(start)
+                    version = file.read(4)[0]
+                    if version == 1:
+                        _, _, timescale, duration = struct.unpack('>QQIQ', file.read(28))
+                    else:
+                        _, _, timescale, duration = struct.unpack('>IIII', file.read(16))
+                    return round(duration / timescale, 3) if timescale else None
+    except (OSError, struct.error, IndexError):
+        pass
+    return None
+
+
+def sidecar_mtime_ns(filename: str) -> int | None:
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+def metadata_key(filename: str, category: str, stat: os.stat_result) -> tuple:
+    '''
+    What a file's cached metadata depends on.
+    '''
+    key: tuple = (stat.st_mtime_ns, stat.st_size)
+    if category == "scans":
+        key += (sidecar_mtime_ns(os.path.splitext(filename)[0] + '.metrics'),
+                sidecar_mtime_ns(os.path.join(octree_utils.tiles_folder(filename), 'index.json')),
+                sidecar_mtime_ns(preview_utils.thumbnail_filename(filename)))
+    elif category == "telemetry":
+        key += (sidecar_mtime_ns(file_utils.records_filename(filename) +
+                                 file_utils.RECORDS_INDEX_EXT),
+                sidecar_mtime_ns(preview_utils.summary_filename(filename)))
+    return key
+
+
+def scan_metadata(filename: str) -> dict:
+    '''
+    Point count, bounding box, rings and duration of a saved cloud.
+    '''
+    meta: dict = {"points": None, "bbox_min": None, "bbox_max": None,
+                  "rings": None, "duration_s": None,
+                  "thumbnail": os.path.isfile(preview_utils.thumbnail_filename(filename))}
+
+    metrics = read_json(os.path.splitext(filename)[0] + '.metrics')
+    if metrics:
+        meta.update(points=metrics.get("points"), rings=metrics.get("rings"),
+                    duration_s=metrics.get("duration_s"))
+
+    if octree_utils.tiles_are_current(filename):
+        index = read_json(os.path.join(octree_utils.tiles_folder(filename), 'index.json'))
+        if index:
+            meta.update(points=index.get("points"), bbox_min=index.get("bbox_min"),
+                        bbox_max=index.get("bbox_max"))
+    return meta
+
+
+def telemetry_metadata(filename: str) -> dict:
+    '''
+    Record count (and so duration) of a trip JSON, from its record log, and
+    its trip summary if it has one.
+    '''
+    index: str = file_utils.records_filename(filename) + file_utils.RECORDS_INDEX_EXT
+    summary = read_json(preview_utils.summary_filename(filename))
+    try:
+        records = os.path.getsize(index) // file_utils.RECORD_OFFSET.itemsize
+    except OSError:
+        records = summary.get("records") if summary else None
+    return {"records": records, "duration_s": records, "summary": summary}
+
+
+class TripCatalog:
+    """
+    Trips, their scans, videos and telemetry files, and each file's metadata.
+
+    Attributes:
+        folder (str): The trips folder.
+        trips (dict[str, dict]): Per trip: its folder's mtime, and each file's
+            metadata and the key it was read at.
+    """
+
+    def __init__(self, folder: str = file_utils.TRIPS_FOLDER) -> None:
+        self.folder: str = folder
+        self.trips: dict[str, dict] = {}
+        self._folder_mtime_ns: int | None = None
+        self._lock = Lock()
+
+    def refresh(self) -> None:
+        '''
+        Brings the catalog up to date with the trips folder.
+        '''
+        with self._lock:
+            try:
+                mtime_ns: int = os.stat(self.folder).st_mtime_ns
+            except FileNotFoundError:
+                self.trips.clear()
+                return
+
+            if mtime_ns != self._folder_mtime_ns:
+                self._folder_mtime_ns = mtime_ns
+                names: set[str] = {entry.name for entry in os.scandir(self.folder)
+                                   if entry.is_dir()}
+                for name in set(self.trips) - names:
+                    del self.trips[name]
+                for name in names - set(self.trips):
+                    self.trips[name] = {"mtime_ns": None, "files": {}, "keys": {}}
+
+            newest = max(self.trips) if self.trips else None
+            for name, trip in self.trips.items():
+                self._refresh_trip(name, trip, restat=(name == newest))
+
+    def _refresh_trip(self, name: str, trip: dict, restat: bool) -> None:
+        path: str = os.path.join(self.folder, name)
+        try:
+            mtime_ns: int = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            trip["files"] = {}
+            return
+        if mtime_ns == trip["mtime_ns"] and not restat:
+            return
+        trip["mtime_ns"] = mtime_ns
+
+        files: dict[str, dict] = {}
+        keys: dict[str, tuple] = {}
+        for entry in os.scandir(path):
+            category = CATEGORIES.get(os.path.splitext(entry.name)[1])
+            if category is None or not entry.is_file():
+                continue
+            stat = entry.stat()
+            keys[entry.name] = metadata_key(entry.path, category, stat)
+            if trip["keys"].get(entry.name) == keys[entry.name]:
+                files[entry.name] = trip["files"][entry.name]
+            else:
+                files[entry.name] = self._read_metadata(entry.path, category, stat)
+        trip["files"], trip["keys"] = files, keys
+
+    def _read_metadata(self, filename: str, category: str, stat: os.stat_result) -> dict:
+        meta: dict = {"category": category, "size": stat.st_size,
+                      "modified": round(stat.st_mtime, 3)}
+        if category == "scans":
+            meta.update(scan_metadata(filename))
+        elif category == "videos":
+            meta["duration_s"] = mp4_duration_s(filename)
+        else:
+            meta.update(telemetry_metadata(filename))
+        return meta
+
+    def filenames(self, trip: str, category: str) -> list[str]:
+        """
+        Args:
+            trip (str): The trip folder's name.
+            category (str): "scans", "videos" or "telemetry".
+        Returns:
+            names (list[str]): The trip's files in that category, sorted as
+                the viewer lists them. Empty for an unknown trip.
+        """
+        files = self.trips.get(trip, {}).get("files", {})
+        return sort_names(name for name, meta in files.items()
+                          if meta["category"] == category)
+
+    def trip_summary(self, trip: str, files: bool = False) -> dict | None:
+        """
+        Args:
+            trip (str): The trip folder's name.
+            files (bool): Whether to include every file's metadata.
+        Returns:
+            summary (dict | None): File counts, total size, duration, scan
+                points and the trip summary (see preview_utils), or None for
+                an unknown trip.
+        """
+
+        if trip not in self.trips:
+            return None
+        entries: dict[str, dict] = self.trips[trip]["files"]
+        by_category = {category: self.filenames(trip, category)
+                       for category in CATEGORIES.values()}
+
+        telemetry = by_category["telemetry"]
+        duration_s = entries[telemetry[0]]["duration_s"] if telemetry else None
+        summary: dict = {
+            "trip": trip,
+            "size": sum(meta["size"] for meta in entries.values()),
+            "duration_s": duration_s,
+            "scans": len(by_category["scans"]),
+            "videos": len(by_category["videos"]),
+            "scan_points": sum(entries[name]["points"] or 0
+                               for name in by_category["scans"]),
+            "summary": entries[telemetry[0]]["summary"] if telemetry else None,
+        }
+        if files:
+            summary["files"] = {category: {name: entries[name] for name in names}
+                                for category, names in by_category.items()}
+        return summary
+
+    def list_trips(self, has: str | None = None, min_duration_s: float = 0) -> list[dict]:
+        """
+        Args:
+            has (str | None): Only trips with at least one file in this
+                category ("scans", "videos" or "telemetry").
+            min_duration_s (float): Only trips at least this long.
+        Returns:
+            trips (list[dict]): Each matching trip's trip_summary(), oldest
+                first.
+        """
+
+        out: list[dict] = []
+        for trip in sorted(self.trips):
+            summary = self.trip_summary(trip)
+            if summary is None:
+                continue
+            if has and not self.filenames(trip, has):
+                continue
+            if min_duration_s and (summary["duration_s"] or 0) < min_duration_s:
+                continue
+            out.append(summary)
+        return out
+
+
+if __name__ == "__main__":
+    catalog = TripCatalog()
+    start_time_s: float = time.time()
+    catalog.refresh()
+    print(f"[RUN] catalog_utils.py: Cataloged {len(catalog.trips)} trips in "
+          f"{round((time.time() - start_time_s) * 1000, 1)} ms.")
+    print(json.dumps(catalog.list_trips(), indent=2))
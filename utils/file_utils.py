@@ -4,9 +4,16 @@
 from datetime import datetime
 import os
 import json
+import gzip
+import shutil
 from filelock import FileLock
+import numpy as np
 
 TRIPS_FOLDER = "./stream/static/trips"
+RECORDS_EXT = '.records'    # Telemetry records, one JSON object per line
+RECORDS_INDEX_EXT = '.idx'  # End offset of each record line, as uint64 LE
+RECORD_OFFSET = np.dtype('<u8')
+GZIP_EXT = '.gz'            # Precompressed copies of text artifacts, for the viewer
 
 def make_folder(path: str, name: str) -> str:
     '''
@@ -92,6 +99,49 @@ def write_points_to_file(filename: str, points: list[list[float]]) -> None:
         for point in points:
             file.write(f"{' '.join([str(val) for val in point])}\n")
 
+def write_point_array_to_file(filename: str, points: np.ndarray) -> int:
+    '''
+    Appends an array of points to a file in the same format as 
+    write_points_to_file(), a row at a time.
+
+    Args:
+        filename (str): The filename to write to.
+        points (np.ndarray): The (N, dims) points to be written.
+    Returns:
+        bytes_written (int): The number of bytes appended.
+    '''
+
+    text: str = '\n'.join(' '.join(str(val) for val in point) 
+                          for point in points.tolist())
+    with open(filename, 'a') as file:
+        if text:
+            file.write(text + '\n')
+    return len(text) + 1 if text else 0
+
+def read_cloud_file(filename: str, fields: int = 4) -> np.ndarray:
+    '''
+    Reads a cloud written by write_points_to_file() or 
+    write_point_array_to_file() back into an array.
+
+    Args:
+        filename (str): The cloud to read.
+        fields (int): Columns in the returned array. Missing columns (e.g. 
+            intensity) are zero and extra ones are dropped. Defaults to 4.
+    Returns:
+        points (np.ndarray): An (N, fields) float32 array.
+    '''
+
+    with open(filename, 'r') as file:
+        file_fields: int = len(file.readline().split())
+        file.seek(0)
+        values = np.fromstring(file.read(), dtype=np.float32, sep=' ')
+
+    points = np.zeros((len(values) // max(file_fields, 1), fields), dtype=np.float32)
+    if file_fields:
+        values = values[:len(points) * file_fields].reshape(-1, file_fields)
+        points[:, :min(fields, file_fields)] = values[:, :fields]
+    return points
+
 def make_telemetry_JSON(filepath = '') -> str:
 
     timestamp: str = get_current_timestamp()
@@ -129,6 +179,12 @@ def make_telemetry_JSON(filepath = '') -> str:
     # Make JSON file
     with open(file=filename, mode='w') as tel_json:
         json.dump(obj=telemetry, fp=tel_json, indent=4)
+
+    # The record log exists from the start, so the viewer never backfills
+    # (and overwrites) the log of a trip that is still being recorded
+    log: str = records_filename(filename)
+    for name in (log, log + RECORDS_INDEX_EXT):
+        open(name, 'ab').close()
     
     print(f"[RUN] file_utils.py: Created trip JSON at {filename}.")
     return filename
@@ -156,6 +212,9 @@ def update_telemetry_JSON(filepath = 'badwords', filename = 'badwords', **kwargs
         if key == "telemetry":
             telemetry["telemetry"].append(value)
             telemetry["duration_s"] += 1
+            append_telemetry_record(filename, value)
+        if key == "latency":
+            telemetry["latency"] = value
 
     # Export the dict to the json file
     with open(filename, 'w') as f:
@@ -184,4 +243,185 @@ def get_latest_telemetry(filepath: str, filename: str) -> dict:
                 raise ValueError("[ERR] file_utils.py: No telemetry data found in JSON!")
             latest_telemetry = telemetry_data["telemetry"][-1]
 
-    return latest_telemetry
\ No newline at end of file
+    return latest_telemetry
+
+def find_trip_json(filepath: str) -> str | None:
+    '''
+    Returns a trip folder's telemetry JSON (the shortest, then first, .json
+    name, as the viewer picks it), or None if it has none.
+    '''
+    names = sorted((f for f in os.listdir(filepath)
+                    if f.endswith('.json') and os.path.isfile(os.path.join(filepath, f))),
+                   key=lambda f: (len(f), f))
+    return os.path.join(filepath, names[0]) if names else None
+
+def records_filename(filename: str) -> str:
+    return os.path.splitext(filename)[0] + RECORDS_EXT
+
+def append_telemetry_record(filename: str, record: dict) -> int:
+    """
+    Appends a telemetry record to the trip's record log, which lets readers
+    fetch new records without parsing the whole trip JSON. The record line is
+    written before its offset, so readers never see an index entry for a
+    record that isn't fully on disk, and the log is repaired first (see
+    repair_record_log()) in case the previous append was cut off. Only 
+    update_telemetry_JSON() (the single telemetry writer) should call this.
+
+    Args:
+        filename (str): The trip JSON, e.g. '.../tel_19690420_080085.json'.
+        record (dict): The telemetry record.
+    Returns:
+        count (int): Records in the log, including this one.
+    """
+
+    log: str = records_filename(filename)
+    repair_record_log(log)
+    with open(log, 'ab') as log_file:
+        log_file.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        end: int = log_file.tell()
+    with open(log + RECORDS_INDEX_EXT, 'ab') as index_file:
+        index_file.write(np.array([end], dtype=RECORD_OFFSET).tobytes())
+        return index_file.tell() // RECORD_OFFSET.itemsize
+
+def repair_record_log(log: str) -> int:
+    """
+    Makes a record log and its index agree again after a crash between (or
+    during) their writes: a torn index entry and entries past the end of the
+    log are dropped, then anything in the log after the last indexed record
+    is truncated. Only reads the index's last entry when they already agree.
+
+    Args:
+        log (str): The record log, e.g. '.../tel_19690420_080085.records'.
+    Returns:
+        count (int): Records in the repaired log.
+    """
+
+    log_size: int = os.path.getsize(log) if os.path.exists(log) else 0
+    with open(log + RECORDS_INDEX_EXT, 'a+b') as index_file:
+        size: int = os.fstat(index_file.fileno()).st_size
+        count: int = size // RECORD_OFFSET.itemsize
+        end: int = 0
+        if count:
+            index_file.seek((count - 1) * RECORD_OFFSET.itemsize)
+            end = int(np.frombuffer(index_file.read(RECORD_OFFSET.itemsize), dtype=RECORD_OFFSET)[0])
+        if end > log_size:
+            index_file.seek(0)
+            ends = np.frombuffer(index_file.read(count * RECORD_OFFSET.itemsize), dtype=RECORD_OFFSET)
+            count = int(np.searchsorted(ends, log_size, side='right'))
+            end = int(ends[count - 1]) if count else 0
+        if size != count * RECORD_OFFSET.itemsize:
+            index_file.truncate(count * RECORD_OFFSET.itemsize)
+    if log_size != end:
+        with open(log, 'ab') as log_file:
+            log_file.truncate(end)
+        print(f"[ERR] file_utils.py: Repaired record log {log} ({count} records).")
+    return count
+
+def index_telemetry_records(filename: str) -> str:
+    """
+    Builds the record log of a trip recorded before logs existed, from its
+    trip JSON. Both files are written aside and swapped in, log first. Never
+    run this on a trip that is still being recorded, since records appended
+    meanwhile would be lost.
+
+    Args:
+        filename (str): The trip JSON.
+    Returns:
+        log (str): The record log's filename.
+    """
+
+    with open(filename, 'r') as file:
+        records: list[dict] = json.load(file).get("telemetry", [])
+
+    log: str = records_filename(filename)
+    lines: list[bytes] = [json.dumps(r, separators=(',', ':')).encode() + b'\n'
+                          for r in records]
+    ends = np.cumsum([len(line) for line in lines], dtype=np.int64)
+    with open(log + '.tmp', 'wb') as log_file:
+        log_file.write(b''.join(lines))
+    with open(log + RECORDS_INDEX_EXT + '.tmp', 'wb') as index_file:
+        index_file.write(ends.astype(RECORD_OFFSET).tobytes())
+    os.replace(log + '.tmp', log)
+    os.replace(log + RECORDS_INDEX_EXT + '.tmp', log + RECORDS_INDEX_EXT)
+
+    print(f"[RUN] file_utils.py: Indexed {len(records)} records of {filename}.")
+    return log
+
+def read_telemetry_records(filename: str, since: int = 0,
+                           limit: int | None = None) -> tuple[int, list[dict]]:
+    """
+    Reads the records after the first `since` from a trip's record log. Only
+    the new records' bytes are read, so polling costs O(new records) however
+    long the trip, and it's safe while the rover is still appending.
+
+    Records are split at the index's offsets, and the log is validated against
+    it: offsets past the end of the log aren't counted, and a record that
+    doesn't parse (e.g. after a power loss) ends the log.
+
+    Args:
+        filename (str): The trip JSON.
+        since (int): Records the caller already has. Defaults to 0.
+        limit (int | None): The most records to return. Defaults to all.
+    Returns:
+        out (tuple[int, list[dict]]): The number of records in the log, and
+            records since..since+limit.
+    Raises:
+        FileNotFoundError: If the trip has no record log.
+    """
+
+    log: str = records_filename(filename)
+    with open(log + RECORDS_INDEX_EXT, 'rb') as index_file:
+        # A torn trailing entry (mid-append) is not counted yet
+        count: int = os.fstat(index_file.fileno()).st_size // RECORD_OFFSET.itemsize
+        since = min(max(since, 0), count)
+        stop: int = count if limit is None else min(count, since + max(limit, 0))
+        if stop <= since:
+            return count, []
+
+        first: int = since - 1 if since else 0
+        index_file.seek(first * RECORD_OFFSET.itemsize)
+        ends = np.frombuffer(
+            index_file.read((stop - first) * RECORD_OFFSET.itemsize), dtype=RECORD_OFFSET)
+
+    # The log is written before the index, so only a crash leaves it shorter
+    log_size: int = os.path.getsize(log)
+    if ends[-1] > log_size:
+        count = first + int(np.searchsorted(ends, log_size, side='right'))
+        ends = ends[:count - first]
+        if count <= since:
+            return count, []
+
+    start: int = int(ends[0]) if since else 0
+    with open(log, 'rb') as log_file:
+        log_file.seek(start)
+        data: bytes = log_file.read(int(ends[-1]) - start)
+
+    records: list[dict] = []
+    previous: int = start
+    for end in ends[1:] if since else ends:
+        try:
+            records.append(json.loads(data[previous - start:int(end) - start]))
+        except ValueError:
+            return since + len(records), records
+        previous = int(end)
+    return count, records
+
+def precompress(filename: str) -> str:
+    """
+    Saves a gzipped copy of a finished text file (cloud or trip JSON) next to
+    it, so the web viewer can send it compressed without compressing on every
+    request. The copy gets the original's mtime, which marks it as current.
+
+    Args:
+        filename (str): The file, e.g. '.../cloud_19690420_080085.txt'.
+    Returns:
+        filename (str): The copy, e.g. '.../cloud_19690420_080085.txt.gz'.
+    """
+
+    compressed: str = filename + GZIP_EXT
+    with open(filename, 'rb') as src, \
+            gzip.GzipFile(compressed + '.tmp', 'wb', compresslevel=6, mtime=0) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    shutil.copystat(filename, compressed + '.tmp')
+    os.replace(compressed + '.tmp', compressed)
+    return compressed
@@ -0,0 +1,131 @@
+# Latency Utilities
+# Created 10/19/2026
+
+'''
+Measures how long it takes a controller input to reach the wheels. Each drive
+command is traced through these stages, all timestamped with time.time() so
+they can be compared against evdev's kernel event timestamps:
+
+    input    The evdev event's kernel timestamp
+    state    controller.input_states updated by the listener task
+    command  The command byte resolved by the control task
+    write    serial write returned
+    ack      The Mega echoed the byte back after acting on it (optional,
+             enable command_acks_enabled in rover_mega/config.h)
+
+Each span between stages feeds a rolling histogram whose percentiles are
+reported in the telemetry 'control' block and saved to the trip JSON when the
+trip ends.
+'''
+
+from collections import deque
+
+LATENCY_WINDOW = 256        # Samples kept per span
+ACK_WINDOW = 32             # Writes remembered while waiting for their ACK
+
+class RollingHistogram:
+    """
+    Keeps the most recent samples of a latency and reports its percentiles.
+
+    Attributes:
+        samples (deque[float]): The most recent samples in milliseconds.
+        count (int): The total number of samples ever added.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.samples: deque[float] = deque(maxlen=window)
+        self.count: int = 0
+
+    def add(self, ms: float) -> None:
+        self.samples.append(ms)
+        self.count += 1
+
+    def percentiles(self) -> dict[str, float | int | None]:
+        """
+        Returns:
+            stats (dict): p50, p95, p99 and max of the window in milliseconds
+                (None if empty), and the total sample count.
+        """
+
+        if not self.samples:
+            return {"p50": None, "p95": None, "p99": None, "max": None,
+                    "count": self.count}
+
+        ordered: list[float] = sorted(self.samples)
+        pick = lambda pct: round(ordered[min(len(ordered) - 1,
+                                             int(pct / 100 * len(ordered)))], 3)
+        return {"p50": pick(50), "p95": pick(95), "p99": pick(99),
+                "max": round(ordered[-1], 3), "count": self.count}
+
+
+class ControlLatencyTracker:
+    """
+    Collects per-stage latencies of drive commands.
+
+    Attributes:
+        spans (dict[str, RollingHistogram]): One histogram per measured span.
+        pending_acks (deque): (byte, write_s, input_s) of written commands
+            that haven't been acknowledged yet, oldest first.
+    """
+
+    span_names: tuple[str, ...] = (
+        "input_to_state", "state_to_command", "command_to_write",
+        "input_to_write", "write_to_ack", "input_to_ack"
+    )
+
+    def __init__(self) -> None:
+        self.spans: dict[str, RollingHistogram] = {
+            name: RollingHistogram() for name in self.span_names}
+        self.pending_acks: deque[tuple[int, float, float | None]] = deque(
+            maxlen=ACK_WINDOW)
+
+    def record_write(self, command: bytes, command_s: float, write_s: float,
+                     input_s: float | None = None,
+                     state_s: float | None = None) -> None:
+        """
+        Records a command that was written to the Arduino. Input stages are
+        only given for commands caused by a controller change, not for
+        keepalives.
+
+        Args:
+            command (bytes): The one-byte command that was written.
+            command_s (float): When the command was resolved.
+            write_s (float): When the serial write returned.
+            input_s (float | None): Kernel timestamp of the triggering event.
+            state_s (float | None): When the listener updated input_states.
+        """
+
+        self.spans["command_to_write"].add((write_s - command_s) * 1000)
+        if input_s is not None and state_s is not None:
+            self.spans["input_to_state"].add((state_s - input_s) * 1000)
+            self.spans["state_to_command"].add((command_s - state_s) * 1000)
+            self.spans["input_to_write"].add((write_s - input_s) * 1000)
+
+        self.pending_acks.append((command[0], write_s, input_s))
+
+    def record_ack(self, command_byte: int, ack_s: float) -> None:
+        """
+        Matches an ACK from the Arduino to the oldest unacknowledged write of
+        the same byte. Older writes skipped over are assumed lost.
+
+        Args:
+            command_byte (int): The command byte the Arduino echoed.
+            ack_s (float): When the ACK line was received.
+        """
+
+        while self.pending_acks:
+            byte, write_s, input_s = self.pending_acks.popleft()
+            if byte != command_byte:
+                continue
+            self.spans["write_to_ack"].add((ack_s - write_s) * 1000)
+            if input_s is not None:
+                self.spans["input_to_ack"].add((ack_s - input_s) * 1000)
+            return
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Returns:
+            summary (dict): Percentiles of every span, keyed '<span>_ms'.
+        """
+        return {f"{name}_ms": hist.percentiles()
+                for name, hist in self.spans.items()}
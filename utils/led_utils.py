@@ -22,14 +22,18 @@ Maybe splice under boards?
 
 '''
 
-import neopixel
-from time import sleep
+try:
+    import neopixel     # Only on the rover; without it the LEDs are skipped
+except ImportError:
+    neopixel = None
+from threading import Lock, Thread
 from time import sleep
 
 from . import pin_utils as pins
 
 PX_COUNT = 16
 BRIGHTNESS = 0.2
+DISPLAY_TICK_S = 0.05   # The strip is pushed at most once per tick (20 Hz)
 
 #             RRGGBB
 PX_OFF    = 0x000000
@@ -75,46 +79,110 @@ BAT_ADDR = 3
 
 pixels = None
 
+# Frame buffer. Callers only write the desired color of each pixel into frame;
+# the flush thread diffs it against what was last pushed (shown) and writes the
+# changed pixels to the strip in a single show() per display tick.
+frame: list[int] = [PX_OFF] * PX_COUNT
+shown: list[int | None] = [None] * PX_COUNT     # None forces the first write
+frame_lock = Lock()
+init_lock = Lock()      # Telemetry and scan threads can both be first
+flush_thread: Thread | None = None
+
 def init_on_first_use() -> None:
-    global pixels
-    if pixels is None:
-        pixels = neopixel.NeoPixel(
-            pins.LED_CTL_PIN,
-            PX_COUNT,
-            brightness=BRIGHTNESS,
-            auto_write=True     # Immediately update pixel state when written
-        )
+    global pixels, flush_thread
+    if pixels is not None and flush_thread is not None:
+        return
+    if neopixel is None or pins.LED_CTL_PIN is None:
+        return      # No status board, set_pixel() only updates frame
+    with init_lock:
+        if pixels is None:
+            pixels = neopixel.NeoPixel(
+                pins.LED_CTL_PIN,
+                PX_COUNT,
+                brightness=BRIGHTNESS,
+                auto_write=False    # Strip is only updated by flush_pixels()
+            )
+        if flush_thread is None:
+            flush_thread = Thread(target=run_flush_loop, daemon=True)
+            flush_thread.start()
 
 def set_pixel(addr : int, color) -> None:
+    """
+    Records the desired color of a pixel. Nothing is written to the strip here;
+    the flush thread picks the change up on its next display tick, and writing
+    the color a pixel already has costs nothing.
+
+    Args:
+        addr (int): The address of the pixel [0, PX_COUNT).
+        color (int): The 0xRRGGBB color of the pixel.
+    Raises:
+        ValueError: If the pixel address is out of range.
+    """
     if addr < 0 or addr > PX_COUNT - 1:
         raise ValueError("Invalid pixel index!")
     
     init_on_first_use()
-    pixels[addr] = color
-
-def pulse_board(color, pulses, pulse_duration_s) -> None:
-    steps = 100
-    pixels.fill(color)
-    for _ in range (0, pulses):
-        for i in range(0, steps):
-            if i < steps/2:
-                pixels.brightness = i / steps/2 * BRIGHTNESS
-            else:
-                pixels.brightness = (steps - i) / steps/2 * BRIGHTNESS
-            sleep(pulse_duration_s / steps)
-    pixels.fill(PX_OFF)
+    frame[addr] = color
+
+def flush_pixels() -> int:
+    """
+    Writes every pixel whose desired color differs from the last color pushed
+    to the strip, then pushes the strip once. Does nothing if no pixel changed.
+
+    Returns:
+        changed (int): The number of pixels that were rewritten.
+    """
+    with frame_lock:
+        changed: list[int] = [
+            addr for addr in range(0, PX_COUNT) if frame[addr] != shown[addr]]
+        if not changed:
+            return 0
+
+        for addr in changed:
+            color: int = frame[addr]
+            pixels[addr] = color        # type: ignore
+            shown[addr] = color
+        pixels.show()                   # type: ignore
+
+    return len(changed)
+
+def run_flush_loop() -> None:
+    """
+    Background loop that flushes the frame buffer once per display tick.
+    """
+    while True:
+        sleep(DISPLAY_TICK_S)
+        try:
+            flush_pixels()
+        except Exception as e:
+            print(f"[ERR] led_utils.py: Could not update status LEDs! ({e})")
 
 def pulse_board(color, pulses, pulse_duration_s) -> None:
+    """
+    Pulses the whole board a single color. Holds the frame lock for the
+    duration so the flush thread can't interleave writes with the pulse, then
+    leaves every pixel off.
+    """
     steps = 100
-    pixels.fill(color)
-    for _ in range (0, pulses):
-        for i in range(0, steps):
-            if i < steps/2:
-                pixels.brightness = i / steps/2 * BRIGHTNESS
-            else:
-                pixels.brightness = (steps - i) / steps/2 * BRIGHTNESS
-            sleep(pulse_duration_s / steps)
-    pixels.fill(PX_OFF)
+    init_on_first_use()
+    if pixels is None:
+        return
+    with frame_lock:
+        pixels.fill(color)
+        for _ in range (0, pulses):
+            for i in range(0, steps):
+                if i < steps/2:
+                    pixels.brightness = i / steps/2 * BRIGHTNESS
+                else:
+                    pixels.brightness = (steps - i) / steps/2 * BRIGHTNESS
+                pixels.show()
+                sleep(pulse_duration_s / steps)
+        pixels.fill(PX_OFF)
+        pixels.brightness = BRIGHTNESS
+        pixels.show()
+        for addr in range(0, PX_COUNT):
+            frame[addr] = PX_OFF
+            shown[addr] = PX_OFF
 
 def map_ultrasonic_to_pixel(addr, dist_cm):
     if dist_cm > 100:
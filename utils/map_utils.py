@@ -0,0 +1,250 @@
+# Map Utilities
+# Created 10/19/2026
+
+'''
+Merges a trip's scans into one map, each placed by the rover's pose when it
+was taken.
+
+A scan's pose comes from its entry in the trip JSON's 'scans' list:
+
+    registered  "pose" has x_m and y_m (and optionally z_m), e.g. from
+                registering the scan against the others
+    odometry    Otherwise the position is dead reckoned from telemetry (one
+                record per second, forward speed from both sides' signed
+                wheel RPMs, heading from IMU yaw) up to when the scan was
+                requested
+    none        Scans without an entry (e.g. older trips) sit at the origin
+
+Preview scans (entries of kind "preview", the cheap scan taken before a full
+one of the same spot) are left out, so they don't split the point budget.
+
+Every scan is rotated by its yaw and moved to its position, then the merged
+cloud is voxel-downsampled to the point budget. Scans with tiles only read
+their top levels (each already an even sample), as many as their share of the
+budget needs.
+'''
+
+from datetime import datetime
+import json
+import math
+import os
+
+import numpy as np
+
+from utils import file_utils    # read_cloud_file(), read_telemetry_records()
+from utils import octree_utils  # tiles_are_current(), tiles_folder()
+from utils import preview_utils # get_number(), record_speed_mps()
+
+VOXEL_ITERATIONS = 6            # Voxel size adjustments to meet a budget
+MAX_TRACK_POINTS = 500          # Odometry track points sent with a map
+
+
+def odometry_track(records: list[dict]) -> np.ndarray:
+    """
+    Dead reckons the rover's path from its telemetry.
+
+    Args:
+        records (list[dict]): Telemetry records, one per second.
+    Returns:
+        track (np.ndarray): (N, 2) x and y in meters at the start of every
+            record, from (0, 0). Heading is IMU yaw, 0 degrees along +x, and
+            speed is signed, so reversing backs up and spinning stays put.
+    """
+
+    speeds = np.array([preview_utils.record_speed_mps(r) for r in records])
+    yaws = np.array([preview_utils.get_number(r, "imu", "yaw_deg") for r in records],
+                    dtype=np.float64)
+    # Hold the last known heading through missing IMU readings
+    known = ~np.isnan(yaws)
+    if known.any():
+        last = np.maximum.accumulate(np.where(known, np.arange(len(yaws)), -1))
+        yaws = np.where(last >= 0, yaws[np.maximum(last, 0)], yaws[known][0])
+    else:
+        yaws = np.zeros(len(records))
+
+    heading = np.deg2rad(yaws)
+    steps = np.stack([speeds * np.cos(heading), speeds * np.sin(heading)], axis=1)
+    track = np.zeros((len(records) + 1, 2))
+    np.cumsum(steps, axis=0, out=track[1:])
+    return track
+
+
+def trip_start_s(trip: dict) -> float | None:
+    '''
+    When a trip started, from its JSON's timestamp, as a Unix time.
+    '''
+    try:
+        return datetime.strptime(trip["timestamp"], "%Y%m%d_%H%M%S").timestamp()
+    except (KeyError, ValueError):
+        return None
+
+
+def scan_poses(trip_json: str) -> tuple[dict[str, dict], np.ndarray, set[str]]:
+    """
+    Finds where each of a trip's scans was taken.
+
+    Args:
+        trip_json (str): The trip JSON.
+    Returns:
+        out (tuple[dict[str, dict], np.ndarray, set[str]]): Per scan file
+            name, its pose (x_m, y_m, z_m, yaw_deg and source, see above),
+            the odometry track, and the file names of preview scans.
+    """
+
+    with open(trip_json, 'r') as file:
+        trip: dict = json.load(file)
+    try:
+        _, records = file_utils.read_telemetry_records(trip_json)
+    except FileNotFoundError:
+        records = trip.get("telemetry", [])
+
+    track: np.ndarray = odometry_track(records)
+    start_s = trip_start_s(trip)
+
+    poses: dict[str, dict] = {}
+    previews: set[str] = set()
+    for entry in trip.get("scans", []):
+        if not entry.get("file"):
+            continue
+        if entry.get("kind") == "preview":
+            previews.add(entry["file"])
+            continue
+        pose: dict = entry.get("pose") or {}
+        yaw = pose.get("yaw_deg")
+        if pose.get("x_m") is not None and pose.get("y_m") is not None:
+            x, y, z, source = pose["x_m"], pose["y_m"], pose.get("z_m") or 0.0, "registered"
+        else:
+            seconds = (entry.get("submitted_s") or 0) - start_s if start_s else 0
+            x, y = track[int(np.clip(seconds, 0, len(track) - 1))]
+            z, source = 0.0, "odometry"
+        poses[entry["file"]] = {"x_m": round(float(x), 3), "y_m": round(float(y), 3),
+                                "z_m": round(float(z), 3),
+                                "yaw_deg": float(yaw) if yaw is not None else 0.0,
+                                "source": source}
+    return poses, track, previews
+
+
+def transform(points: np.ndarray, pose: dict) -> np.ndarray:
+    '''
+    Rotates points by a pose's yaw about +z and moves them to its position.
+    '''
+    yaw: float = math.radians(pose["yaw_deg"])
+    rotation = np.array([[math.cos(yaw), -math.sin(yaw)],
+                         [math.sin(yaw),  math.cos(yaw)]], dtype=np.float32)
+    out = points.copy()
+    out[:, :2] = points[:, :2] @ rotation.T + np.array([pose["x_m"], pose["y_m"]], dtype=np.float32)
+    out[:, 2] += pose["z_m"]
+    return out
+
+
+def load_scan_points(cloud_filename: str, max_points: int) -> np.ndarray:
+    '''
+    A scan's (N, 4) points. With tiles, only the top levels are read, level
+    by level, until there are at least max_points; otherwise the whole cloud.
+    '''
+    if not octree_utils.tiles_are_current(cloud_filename):
+        return file_utils.read_cloud_file(cloud_filename)
+
+    folder: str = octree_utils.tiles_folder(cloud_filename)
+    with open(os.path.join(folder, 'index.json')) as file:
+        nodes: dict[str, int] = json.load(file)["nodes"]   # Shallowest first
+
+    tiles: list[np.ndarray] = []
+    total, depth = 0, 0
+    for node, count in nodes.items():
+        if total >= max_points and len(node) > depth:
+            break       # Whole levels only, so the sample stays even
+        depth = len(node)
+        tiles.append(np.fromfile(os.path.join(folder, f"{node}.bin"),
+                                 dtype='<f4').reshape(4, -1).T)
+        total += count
+    return np.concatenate(tiles) if tiles else np.zeros((0, 4), dtype=np.float32)
+
+
+def voxel_downsample(points: np.ndarray, max_points: int,
+                     seed: int = 0) -> tuple[np.ndarray, float]:
+    """
+    Keeps one point per voxel, with the voxel size adjusted until at most
+    max_points remain (then thinned at random if still over).
+
+    Args:
+        points (np.ndarray): (N, 3+) points.
+        max_points (int): The point budget.
+        seed (int): Randomizes which point represents a voxel.
+    Returns:
+        out (tuple[np.ndarray, float]): The indices kept, in their original
+            order, and the final voxel size in meters (0 if not needed).
+    """
+
+    if len(points) <= max_points:
+        return np.arange(len(points)), 0.0
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(points))
+    extent = points[:, :3].max(axis=0) - points[:, :3].min(axis=0)
+    # Scans are mostly surfaces, so points per voxel go with its area
+    voxel: float = max(float(np.sqrt(np.prod(np.sort(extent)[1:]) / max_points)), 1e-3)
+
+    low = points[:, :3].min(axis=0)
+    keep = order
+    for _ in range(VOXEL_ITERATIONS):
+        cells = ((points[order, :3] - low) / voxel).astype(np.int64)
+        dims = cells.max(axis=0) + 1
+        keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+        _, first = np.unique(keys, return_index=True)
+        keep = order[first]
+        if 0.8 * max_points <= len(keep) <= max_points:
+            break
+        voxel *= math.sqrt(len(keep) / max_points)
+
+    if len(keep) > max_points:
+        keep = rng.choice(keep, size=max_points, replace=False)
+    return np.sort(keep), voxel
+
+
+def merge_scans(trip_folder: str, trip_json: str | None,
+                max_points: int) -> tuple[np.ndarray, dict]:
+    """
+    Places every saved scan of a trip (not partial clouds or previews) in
+    one map.
+
+    Args:
+        trip_folder (str): The trip's folder.
+        trip_json (str | None): The trip JSON, for poses. Without one every
+            scan sits at the origin.
+        max_points (int): The map's point budget.
+    Returns:
+        out (tuple[np.ndarray, dict]): The map's (N, 4) float32 points,
+            grouped by scan in the index's order, and the index: each scan's
+            file, pose and point count, the voxel size and the odometry track.
+    """
+
+    poses, track, previews = scan_poses(trip_json) if trip_json \
+        else ({}, np.zeros((1, 2)), set())
+    names: list[str] = sorted(
+        name for name in os.listdir(trip_folder)
+        if name.startswith('cloud_') and not name.startswith('cloud_partial')
+        and name.endswith('.txt') and name not in previews)
+    origin = {"x_m": 0.0, "y_m": 0.0, "z_m": 0.0, "yaw_deg": 0.0, "source": "none"}
+
+    share: int = max_points // max(len(names), 1)
+    clouds: list[np.ndarray] = []
+    for name in names:
+        points = load_scan_points(os.path.join(trip_folder, name), share)
+        clouds.append(transform(points, poses.get(name, origin)))
+
+    merged = np.concatenate(clouds) if clouds else np.zeros((0, 4), dtype=np.float32)
+    scan_ids = np.repeat(np.arange(len(clouds)), [len(c) for c in clouds])
+    keep, voxel = voxel_downsample(merged, max_points)
+    # Kept indices are sorted, so points stay grouped by scan
+    counts = np.bincount(scan_ids[keep], minlength=len(names))
+
+    stride: int = max(1, math.ceil(len(track) / MAX_TRACK_POINTS))
+    index: dict = {
+        "points": int(len(keep)),
+        "voxel_m": round(voxel, 4),
+        "scans": [{"file": name, "pose": poses.get(name, origin), "points": int(count)}
+                  for name, count in zip(names, counts)],
+        "track": np.round(track[::stride], 3).tolist()
+    }
+    return merged[keep].astype(np.float32), index
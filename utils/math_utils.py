@@ -62,4 +62,115 @@ def sph_to_cart_array(points: list[list[float]]) -> list[list[float]]:
     
     """
 
-    return [sph_to_cart(*point) for point in points]
\ No newline at end of file
+    return [sph_to_cart(*point) for point in points]
+
+def polar_min_histogram(ranges: np.ndarray, angles: np.ndarray,
+                        bins: int = 360) -> np.ndarray:
+    '''
+    Reduces a ring to the nearest return in each angular bin.
+
+    Args:
+        ranges (np.ndarray): Distances of the ring's points. Zero means no 
+            return and is ignored.
+        angles (np.ndarray): Angles of the ring's points in degrees.
+        bins (int): The number of equal bins around the full circle.
+    Returns:
+        histogram (np.ndarray): The minimum distance in each bin (float32), or
+            zero if the bin had no returns.
+    '''
+
+    valid = ranges > 0
+    idx = (angles[valid] % 360 * bins / 360).astype(np.intp) % bins
+    histogram = np.full(bins, np.inf, dtype=np.float32)
+    np.minimum.at(histogram, idx, ranges[valid])
+    histogram[np.isinf(histogram)] = 0
+
+    return histogram
+
+
+def sph_to_cart_np(points: np.ndarray) -> np.ndarray:
+    '''
+    Vectorized sph_to_cart_array() for an (N, 3) or (N, 4) array of 
+    (dist, lidar angle, motor angle[, intensity]) points.
+
+    Args:
+        points (np.ndarray): The spherical points, angles in degrees.
+    Returns:
+        cartesian_points (np.ndarray): The (x, y, z[, intensity]) points, 
+            rounded to 4 decimals like sph_to_cart().
+    '''
+
+    dist = points[:, 0].astype(np.float64)
+    l_angle = np.deg2rad(points[:, 1].astype(np.float64))
+    m_angle = np.deg2rad(points[:, 2].astype(np.float64))
+
+    cartesian_points = np.empty((len(points), points.shape[1]), dtype=np.float64)
+    cartesian_points[:, 0] = dist*np.cos(l_angle)*np.cos(m_angle) + SENSOR_OFFSET_MM*np.sin(m_angle)
+    cartesian_points[:, 1] = dist*np.cos(l_angle)*np.sin(m_angle) + SENSOR_OFFSET_MM*np.cos(m_angle)
+    cartesian_points[:, 2] = dist*np.sin(l_angle)
+    if points.shape[1] > 3:
+        cartesian_points[:, 3] = points[:, 3]
+
+    return np.round(cartesian_points, 4)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    '''
+    Largest-Triangle-Three-Buckets downsampling. Keeps the first and last 
+    points and, from each of n - 2 equal buckets in between, the point making
+    the largest triangle with the point kept before it and the next bucket's
+    average, which preserves the shape of a line plot.
+
+    Args:
+        x (np.ndarray): Increasing x values.
+        y (np.ndarray): The y values, without NaNs.
+        n (int): The number of points to keep.
+    Returns:
+        indices (np.ndarray): The indices of the kept points, in order.
+    '''
+
+    if n >= len(x):
+        return np.arange(len(x))
+    if n < 3:
+        return np.array([0, len(x) - 1][:max(n, 0)], dtype=np.intp)
+
+    edges = np.linspace(1, len(x) - 1, n - 1).astype(np.intp)
+    indices = np.empty(n, dtype=np.intp)
+    indices[0], indices[-1] = 0, len(x) - 1
+
+    prev = 0
+    for b in range(n - 2):
+        lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+        next_lo, next_hi = hi, max(edges[b + 2] if b + 2 < len(edges) else len(x), hi + 1)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev])
+                      - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        indices[b + 1] = prev
+
+    return indices
+
+
+def minmax_indices(y: np.ndarray, n: int) -> np.ndarray:
+    '''
+    Min/max downsampling. Keeps the lowest and highest point of each of n / 2
+    equal buckets, so spikes always survive.
+
+    Args:
+        y (np.ndarray): The y values, without NaNs.
+        n (int): The number of points to keep (about).
+    Returns:
+        indices (np.ndarray): The indices of the kept points, in order.
+    '''
+
+    if n >= len(y):
+        return np.arange(len(y))
+
+    edges = np.linspace(0, len(y), max(n // 2, 1) + 1).astype(np.intp)
+    indices: list[int] = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            indices.extend(sorted({lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))}))
+
+    return np.array(indices, dtype=np.intp)
@@ -0,0 +1,131 @@
+# Metrics Utilities
+# Created 10/19/2026
+
+'''
+Lightweight counters and stage timers for the scanner pipeline. Every Lidar,
+Motor and Scanner keeps a Metrics object that only ever adds to dictionaries,
+so instrumentation is cheap enough to leave on permanently.
+
+The scan worker and the obstacle stream add to them while the telemetry thread
+reads them, so every update and copy holds the object's lock, and readers only
+ever format a copy.
+
+Each stage also remembers its last time, so compact() can summarize everything
+in a few numbers (e.g. for every telemetry record).
+
+Counters and timers are cumulative. To measure one scan, snapshot before and
+after and subtract:
+
+    before = metrics.snapshot()
+    ...
+    this_scan = metrics.since(before)
+'''
+
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator
+import time
+
+
+class Metrics:
+    """
+    A named set of counters and stage timers.
+
+    Attributes:
+        counters (dict[str, int]): Event counts (e.g. packets read).
+        timers (dict[str, list[float]]): Per stage: [calls, total seconds,
+            max seconds].
+        last (dict[str, float]): Per stage, the seconds its last call took.
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[str, int] = {}
+        self.timers: dict[str, list[float]] = {}
+        self.last: dict[str, float] = {}
+        self._lock = Lock()
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timer: list[float] = self.timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            self.last[name] = seconds
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        '''
+        Times the body of a with statement as one call of a stage.
+        '''
+        start_s: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_s)
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            snapshot (dict): Copies of the counters and timers, for since().
+        """
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "timers": {name: list(timer) for name, timer in self.timers.items()}}
+
+    def since(self, before: dict) -> dict:
+        """
+        Args:
+            before (dict): An earlier snapshot() of these metrics.
+        Returns:
+            metrics (dict): The counters and timers accumulated since then, as
+                in summary(). Maximums are over the whole lifetime.
+        """
+
+        now: dict = self.snapshot()
+        counters: dict[str, int] = {
+            name: count - before["counters"].get(name, 0)
+            for name, count in now["counters"].items()}
+        timers: dict[str, list[float]] = {}
+        for name, (calls, total_s, max_s) in now["timers"].items():
+            prev: list[float] = before["timers"].get(name, [0, 0.0, 0.0])
+            timers[name] = [calls - prev[0], total_s - prev[1], max_s]
+
+        return format_metrics(counters, timers)
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            metrics (dict): Every counter, and each timer's calls, total and
+                mean in milliseconds, as '<stage>_ms' entries.
+        """
+        now: dict = self.snapshot()
+        return format_metrics(now["counters"], now["timers"])
+
+    def compact(self) -> dict:
+        """
+        Returns:
+            metrics (dict): Every counter, and each stage's last time in
+                milliseconds, as '<stage>_ms' entries.
+        """
+        with self._lock:
+            return {**self.counters, **{f"{name}_ms": round(seconds * 1000, 3)
+                                        for name, seconds in self.last.items()}}
+
+
+def format_metrics(counters: dict[str, int], timers: dict[str, list[float]]) -> dict:
+    '''
+    Formats counters and timers as a JSON-serializable dictionary.
+    '''
+    out: dict = dict(counters)
+    for name, (calls, total_s, max_s) in timers.items():
+        out[f"{name}_ms"] = {
+            "calls": int(calls),
+            "total": round(total_s * 1000, 3),
+            "mean":  round(total_s * 1000 / calls, 3) if calls else None,
+            "max":   round(max_s * 1000, 3)
+        }
+    return out
@@ -0,0 +1,206 @@
+# Octree Utilities
+# Created 10/19/2026
+
+'''
+Builds level-of-detail tiles for saved clouds, so the viewer can show a coarse
+version of any scan at once and refine only what the camera is looking at.
+
+A cloud's bounding cube is split recursively into octants. Every node keeps a
+spatially even sample of at most TILE_POINTS of its points (one per voxel of a
+grid over the node) and passes the rest down to its children, so each level
+adds detail to the ones above it and a node plus its ancestors is a complete
+view of its region at that level. Nodes are named by their path from the root:
+'r', then one digit per level for the octant (x + 2y + 4z, set bits meaning
+the upper half), e.g. 'r', 'r5', 'r53'.
+
+Tiles are saved next to the cloud, e.g. cloud_19690420_080085.txt gets
+
+    cloud_19690420_080085.tiles/index.json    Bounds and point count per node
+    cloud_19690420_080085.tiles/<node>.bin    Points, as in TILE_FORMAT
+
+Run as a script to build tiles for every cloud in one trip or all trips:
+
+    python -m utils.octree_utils [trip folder]
+'''
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils import file_utils    # read_cloud_file(), TRIPS_FOLDER
+
+TILE_POINTS = 20000     # Most points in one node
+TILE_GRID = 128         # Voxels per side when sampling a node
+MAX_DEPTH = 12          # Nodes this deep keep all of their points
+TILES_EXT = '.tiles'
+TILE_FORMAT = "float32 LE, planar: every x, then y, z, intensity"
+
+
+def tiles_folder(cloud_filename: str) -> str:
+    return os.path.splitext(cloud_filename)[0] + TILES_EXT
+
+
+def tiles_are_current(cloud_filename: str) -> bool:
+    '''
+    Whether a cloud has tiles built since it was last written.
+    '''
+    index: str = os.path.join(tiles_folder(cloud_filename), 'index.json')
+    return os.path.isfile(index) and \
+        os.path.getmtime(index) >= os.path.getmtime(cloud_filename)
+
+
+def sample_node(points: np.ndarray, origin: np.ndarray, size: float,
+                rng: np.random.Generator) -> np.ndarray:
+    """
+    Picks the points a node keeps: a random point from each occupied voxel of
+    a TILE_GRID^3 grid, thinned at random to TILE_POINTS.
+
+    Args:
+        points (np.ndarray): The (N, 4) points in the node.
+        origin (np.ndarray): The node cube's lowest corner.
+        size (float): The node cube's side length.
+        rng (np.random.Generator): Randomizes which point represents a voxel.
+    Returns:
+        keep (np.ndarray): A boolean mask of the points kept.
+    """
+
+    order = rng.permutation(len(points))
+    cells = ((points[order, :3] - origin) * (TILE_GRID / size)).astype(np.int64)
+    np.clip(cells, 0, TILE_GRID - 1, out=cells)
+    keys = (cells[:, 0] * TILE_GRID + cells[:, 1]) * TILE_GRID + cells[:, 2]
+    _, first = np.unique(keys, return_index=True)
+    chosen = order[first]
+    if len(chosen) > TILE_POINTS:
+        chosen = rng.choice(chosen, size=TILE_POINTS, replace=False)
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[chosen] = True
+    return keep
+
+
+def build_tiles(cloud_filename: str, force: bool = False) -> str:
+    """
+    Builds the level-of-detail tiles of a saved (Cartesian) cloud. The tiles
+    are written to a temporary folder of their own and swapped in when
+    complete.
+
+    Args:
+        cloud_filename (str): The cloud, e.g. './path/to/cloud_19690420_080085.txt'.
+        force (bool): Whether to rebuild tiles that are already current.
+    Returns:
+        folder (str): The tiles folder.
+    """
+
+    folder: str = tiles_folder(cloud_filename)
+    if not force and tiles_are_current(cloud_filename):
+        return folder
+
+    start_time_s: float = time.time()
+    cloud: np.ndarray = file_utils.read_cloud_file(cloud_filename)
+    rng = np.random.default_rng(0)
+
+    if len(cloud):
+        bbox_min, bbox_max = cloud[:, :3].min(axis=0), cloud[:, :3].max(axis=0)
+    else:
+        bbox_min = bbox_max = np.zeros(3, dtype=np.float32)
+    cube_size: float = max(float((bbox_max - bbox_min).max()), 1e-3)
+
+    # Unique per build, since the rover and the viewer can build the same tiles
+    parent, name = os.path.split(folder)
+    temp_folder: str = tempfile.mkdtemp(prefix=name + '.', suffix='.tmp', dir=parent or '.')
+    os.chmod(temp_folder, 0o755)
+
+    try:
+        nodes: dict[str, int] = {}
+        stack: list[tuple[str, np.ndarray, np.ndarray, float]] = \
+            [("r", cloud, bbox_min.astype(np.float64), cube_size)]
+        while stack:
+            node, points, origin, size = stack.pop()
+            depth: int = len(node) - 1
+
+            if len(points) <= TILE_POINTS or depth >= MAX_DEPTH:
+                keep = np.ones(len(points), dtype=bool)
+            else:
+                keep = sample_node(points, origin, size, rng)
+
+            kept: np.ndarray = points[keep]
+            with open(os.path.join(temp_folder, f"{node}.bin"), 'wb') as file:
+                file.write(np.ascontiguousarray(kept.T, dtype='<f4').tobytes())
+            nodes[node] = len(kept)
+
+            rest: np.ndarray = points[~keep]
+            if not len(rest):
+                continue
+            half: float = size / 2
+            upper = (rest[:, :3] >= origin + half)
+            octants = upper[:, 0] + 2 * upper[:, 1] + 4 * upper[:, 2]
+            for octant in range(8):
+                child: np.ndarray = rest[octants == octant]
+                if len(child):
+                    offset = np.array([octant & 1, (octant >> 1) & 1, (octant >> 2) & 1])
+                    stack.append((f"{node}{octant}", child, origin + offset * half, half))
+
+        index: dict = {
+            "cloud": os.path.basename(cloud_filename),
+            "points": len(cloud),
+            "format": TILE_FORMAT,
+            "tile_points": TILE_POINTS,
+            "bbox_min": [round(float(v), 4) for v in bbox_min],
+            "bbox_max": [round(float(v), 4) for v in bbox_max],
+            "cube_min": [round(float(v), 4) for v in bbox_min],
+            "cube_size": round(cube_size, 4),
+            "nodes": dict(sorted(nodes.items(), key=lambda item: (len(item[0]), item[0])))
+        }
+        with open(os.path.join(temp_folder, 'index.json'), 'w') as file:
+            json.dump(index, file)
+    except BaseException:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+
+    shutil.rmtree(folder, ignore_errors=True)
+    try:
+        os.replace(temp_folder, folder)
+    except OSError:
+        # Another build of the same cloud landed first, and its tiles are the same
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+    duration_s: float = round(time.time() - start_time_s, 2)
+    print(f"[RUN] octree_utils.py: Built {len(nodes)} tiles for {cloud_filename} "
+          f"in {duration_s} seconds.")
+    return folder
+
+
+def build_trip_tiles(trip_folder: str, force: bool = False) -> list[str]:
+    """
+    Builds tiles for every saved cloud in a trip folder (not partial clouds).
+
+    Args:
+        trip_folder (str): The trip's folder.
+        force (bool): Whether to rebuild tiles that are already current.
+    Returns:
+        folders (list[str]): The tiles folders.
+    """
+
+    folders: list[str] = []
+    for name in sorted(os.listdir(trip_folder)):
+        if name.startswith('cloud_') and not name.startswith('cloud_partial') \
+                and name.endswith('.txt'):
+            try:
+                folders.append(build_tiles(os.path.join(trip_folder, name), force))
+            except Exception as e:
+                print(f"[ERR] octree_utils.py: Couldn't build tiles for {name}! ({e})")
+    return folders
+
+
+if __name__ == "__main__":
+    trips: list[str] = sys.argv[1:] or [
+        os.path.join(file_utils.TRIPS_FOLDER, trip)
+        for trip in sorted(os.listdir(file_utils.TRIPS_FOLDER))
+        if os.path.isdir(os.path.join(file_utils.TRIPS_FOLDER, trip))]
+    for trip in trips:
+        build_trip_tiles(trip)
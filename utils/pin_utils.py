@@ -18,5 +18,8 @@ MS3_PIN  = 23 # From GPIO 6
 ARDUINO_PORT = '/dev/ttyAMA2' # UART port on GPIO 4 and 5
 
 # STATUS BOARD LED PIN
-import board
-LED_CTL_PIN = board.D18 # Must be a hardware PWM pin!
+try:
+    import board
+    LED_CTL_PIN = board.D18 # Must be a hardware PWM pin!
+except (ImportError, NotImplementedError):  # Not on the Pi (e.g. lidar_benchmark.py)
+    LED_CTL_PIN = None
@@ -0,0 +1,291 @@
+# Preview Utilities
+# Created 10/19/2026
+
+'''
+Small previews the viewer can show before loading anything big: a top-down
+thumbnail of each scan, and a summary of each trip.
+
+    cloud_19690420_080085.txt   ->  cloud_19690420_080085.thumb.png
+    tel_19690420_080085.json    ->  tel_19690420_080085.summary
+
+Thumbnails are binned from the scan's root tile when it has tiles (a spatially
+even sample, so a few thousand points are read instead of the whole cloud).
+Each pixel's brightness is how many points fell in it and its color is the
+highest of them, blue (low) to red (high). They are written as PNGs with
+zlib, so no imaging library is needed.
+
+Run as a script to make previews for every scan and trip in one trip or all
+trips:
+
+    python -m utils.preview_utils [trip folder]
+'''
+
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from utils import file_utils    # read_cloud_file(), read_telemetry_records(), TRIPS_FOLDER
+from utils import octree_utils  # tiles_are_current(), tiles_folder()
+
+THUMB_EXT = '.thumb.png'
+SUMMARY_EXT = '.summary'
+THUMB_SIZE = 160                # Pixels per side
+WHEEL_DIAMETER_M = 0.12         # Drive wheels, for the distance estimate
+MOTORS = ("front_left", "mid_left", "rear_left",
+          "front_right", "mid_right", "rear_right")
+
+# Height colors, blue (low) through cyan, green and yellow to red (high)
+HEIGHT_COLORS = np.array([[0, 0, 255], [0, 255, 255], [0, 255, 0],
+                          [255, 255, 0], [255, 0, 0]], dtype=np.float32)
+
+
+def thumbnail_filename(cloud_filename: str) -> str:
+    return os.path.splitext(cloud_filename)[0] + THUMB_EXT
+
+
+def summary_filename(trip_json: str) -> str:
+    return os.path.splitext(trip_json)[0] + SUMMARY_EXT
+
+
+def write_png(filename: str, rgb: np.ndarray) -> None:
+    """
+    Writes an 8-bit RGB image as a PNG.
+
+    Args:
+        filename (str): The PNG to write.
+        rgb (np.ndarray): An (H, W, 3) uint8 image.
+    """
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data))
+
+    height, width = rgb.shape[:2]
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+
+    with open(filename + '.tmp', 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 9)))
+        file.write(chunk(b'IEND', b''))
+    os.replace(filename + '.tmp', filename)
+
+
+def thumbnail_image(points: np.ndarray, size: int = THUMB_SIZE) -> np.ndarray:
+    """
+    Renders points top-down: brightness is log point density, color is the
+    highest point's height.
+
+    Args:
+        points (np.ndarray): (N, 3+) points, x, y and z first.
+        size (int): Pixels per side. The scan's longer side fills the image.
+    Returns:
+        rgb (np.ndarray): A (size, size, 3) uint8 image, +y up.
+    """
+
+    rgb = np.zeros((size, size, 3), dtype=np.uint8)
+    if not len(points):
+        return rgb
+
+    xy, z = points[:, :2], points[:, 2]
+    low, high = xy.min(axis=0), xy.max(axis=0)
+    scale: float = (size - 1) / max(float((high - low).max()), 1e-6)
+    offset = ((size - 1) - (high - low) * scale) / 2    # Centers the shorter side
+    cols, rows = ((xy - low) * scale + offset).astype(np.int64).T
+    pixels = (size - 1 - rows) * size + cols
+
+    density = np.bincount(pixels, minlength=size * size).astype(np.float32)
+    top = np.full(size * size, -np.inf, dtype=np.float32)
+    np.maximum.at(top, pixels, z)
+
+    hit = density > 0
+    brightness = np.zeros_like(density)
+    brightness[hit] = 0.35 + 0.65 * np.log1p(density[hit]) / np.log1p(density.max())
+
+    z_low, z_high = np.percentile(z, [2, 98])
+    heights = np.clip((top[hit] - z_low) / max(z_high - z_low, 1e-6), 0, 1)
+    position = heights * (len(HEIGHT_COLORS) - 1)
+    below = np.minimum(position.astype(np.int64), len(HEIGHT_COLORS) - 2)
+    blend = (position - below)[:, None]
+    colors = HEIGHT_COLORS[below] * (1 - blend) + HEIGHT_COLORS[below + 1] * blend
+
+    flat = rgb.reshape(-1, 3)
+    flat[hit] = (colors * brightness[hit, None]).astype(np.uint8)
+    return rgb
+
+
+def make_thumbnail(cloud_filename: str, force: bool = False) -> str:
+    """
+    Saves a top-down thumbnail of a saved (Cartesian) cloud next to it.
+
+    Args:
+        cloud_filename (str): The cloud, e.g. './path/to/cloud_19690420_080085.txt'.
+        force (bool): Whether to redo a thumbnail newer than the cloud.
+    Returns:
+        filename (str): The thumbnail.
+    """
+
+    filename: str = thumbnail_filename(cloud_filename)
+    if not force and os.path.isfile(filename) and \
+            os.path.getmtime(filename) >= os.path.getmtime(cloud_filename):
+        return filename
+
+    if octree_utils.tiles_are_current(cloud_filename):
+        root: str = os.path.join(octree_utils.tiles_folder(cloud_filename), 'r.bin')
+        points = np.fromfile(root, dtype='<f4').reshape(4, -1).T
+    else:
+        points = file_utils.read_cloud_file(cloud_filename, fields=3)
+
+    write_png(filename, thumbnail_image(points))
+    return filename
+
+
+def get_number(record: dict, *keys: str) -> float | None:
+    value = record
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return None if math.isnan(value) else float(value)
+
+
+def side_rpms(record: dict) -> tuple[float | None, float | None]:
+    '''
+    The mean signed wheel RPM of the left and right sides in a telemetry
+    record (positive forward), each None without readings.
+    '''
+    sides: list[float | None] = []
+    for motors in (MOTORS[:3], MOTORS[3:]):
+        rpms = [get_number(record, "motors", motor, "rpm") for motor in motors]
+        rpms = [rpm for rpm in rpms if rpm is not None]
+        sides.append(sum(rpms) / len(rpms) if rpms else None)
+    return sides[0], sides[1]
+
+
+def record_speed_mps(record: dict) -> float:
+    '''
+    The rover's forward speed in a telemetry record, from the mean of its two
+    sides' wheel RPMs: negative in reverse, about 0 spinning in place.
+    '''
+    rpms = [rpm for rpm in side_rpms(record) if rpm is not None]
+    if not rpms:
+        return 0.0
+    return sum(rpms) / len(rpms) / 60 * math.pi * WHEEL_DIAMETER_M
+
+
+def summarize_trip(trip_json: str) -> dict:
+    """
+    Summarizes a trip from its telemetry: one record per second, with the
+    distance estimated from the forward speed, forwards or in reverse. Turns
+    where the sides drive opposite ways (spinning in place) aren't counted.
+
+    Args:
+        trip_json (str): The trip JSON.
+    Returns:
+        summary (dict): Duration, distance, scan and video counts, battery
+            minimum and maximum, and each motor's peak current.
+    """
+
+    with open(trip_json, 'r') as file:
+        trip: dict = json.load(file)
+    try:
+        _, records = file_utils.read_telemetry_records(trip_json)
+    except FileNotFoundError:
+        records = trip.get("telemetry", [])
+
+    distance_m: float = 0.0
+    battery: dict[str, list[float]] = {"capacity_pct": [], "voltage_v": []}
+    peak_current_a: dict[str, float | None] = dict.fromkeys(MOTORS)
+    for record in records:
+        left, right = side_rpms(record)
+        if left is None or right is None or left * right >= 0:
+            distance_m += abs(record_speed_mps(record))    # One record per second
+        for key, values in battery.items():
+            value = get_number(record, "ugv", "battery", key)
+            if value is not None:
+                values.append(value)
+        for motor in MOTORS:
+            current = get_number(record, "motors", motor, "current_a")
+            if current is not None:
+                peak = peak_current_a[motor]
+                peak_current_a[motor] = current if peak is None else max(peak, current)
+
+    return {
+        "trip": os.path.basename(os.path.dirname(os.path.abspath(trip_json))),
+        "records": len(records),
+        "duration_s": len(records),
+        "distance_m": round(distance_m, 1),
+        "scans": len(trip.get("scans", [])),
+        "videos": len(trip.get("videos", [])),
+        "battery": {key: {"min": min(values, default=None), "max": max(values, default=None)}
+                    for key, values in battery.items()},
+        "peak_current_a": peak_current_a
+    }
+
+
+def write_trip_summary(trip_json: str) -> str:
+    """
+    Saves a trip's summarize_trip() next to its trip JSON.
+
+    Args:
+        trip_json (str): The trip JSON.
+    Returns:
+        filename (str): The summary.
+    """
+
+    filename: str = summary_filename(trip_json)
+    with open(filename + '.tmp', 'w') as file:
+        json.dump(summarize_trip(trip_json), file, indent=2)
+    os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def make_trip_previews(trip_folder: str, force: bool = False) -> list[str]:
+    """
+    Makes thumbnails for every saved cloud in a trip folder (not partial
+    clouds) and the trip's summary.
+
+    Args:
+        trip_folder (str): The trip's folder.
+        force (bool): Whether to redo thumbnails that are already current.
+    Returns:
+        filenames (list[str]): The thumbnails and summary.
+    """
+
+    filenames: list[str] = []
+    names: list[str] = sorted(os.listdir(trip_folder))
+    for name in names:
+        if name.startswith('cloud_') and not name.startswith('cloud_partial') \
+                and name.endswith('.txt'):
+            try:
+                filenames.append(make_thumbnail(os.path.join(trip_folder, name), force))
+            except Exception as e:
+                print(f"[ERR] preview_utils.py: Couldn't make a thumbnail of {name}! ({e})")
+
+    trip_jsons = sorted((name for name in names if name.endswith('.json')),
+                        key=lambda name: (len(name), name))
+    if trip_jsons:
+        try:
+            filenames.append(write_trip_summary(os.path.join(trip_folder, trip_jsons[0])))
+        except (OSError, ValueError) as e:
+            print(f"[ERR] preview_utils.py: Couldn't summarize {trip_folder}! ({e})")
+    return filenames
+
+
+if __name__ == "__main__":
+    trips: list[str] = sys.argv[1:] or [
+        os.path.join(file_utils.TRIPS_FOLDER, trip)
+        for trip in sorted(os.listdir(file_utils.TRIPS_FOLDER))
+        if os.path.isdir(os.path.join(file_utils.TRIPS_FOLDER, trip))]
+    for trip in trips:
+        made = make_trip_previews(trip)
+        print(f"[RUN] preview_utils.py: Made {len(made)} previews for {trip}.")
@@ -0,0 +1,177 @@
+# Ring Feed Utilities
+# Created 10/19/2026
+
+'''
+Streams the rings of a running scan from the rover to the web viewer as they
+are captured, so the viewer can grow the cloud while the scan is still going
+and a bad scan can be stopped early.
+
+The rover's scan worker decimates each ring to RING_POINTS points, converts it
+to Cartesian and publishes it (with the few rings before it, so a reader that
+polls a little late doesn't miss any) in a shared memory snapshot, as in
+telemetry_utils. Points are packed as in the viewer's /cloud route (planar
+little-endian float32: every x, then y, z, intensity), base64 encoded.
+
+The web viewer runs one RingFeedCollector, which polls the snapshot and keeps
+every ring of the current scan, so a browser that connects mid-scan gets the
+whole scan so far and then each new ring.
+'''
+
+from collections import deque
+from threading import Lock, Thread
+import base64
+import os
+import time
+
+import numpy as np
+
+from utils import math_utils        # sph_to_cart_np()
+from utils import telemetry_utils   # TelemetrySnapshot
+
+SCAN_RINGS_NAME = "aegis_scan_rings"
+SCAN_RINGS_SIZE = 65536         # Bytes, enough for RINGS_PER_PUBLISH rings
+RING_POINTS = 256               # Points kept per ring
+RINGS_PER_PUBLISH = 4           # Latest rings in every snapshot
+MAX_COLLECTED_RINGS = 4096      # Rings kept per scan by the collector
+COLLECT_POLL_S = 0.05
+ATTACH_RETRY_S = 2.0
+
+
+def encode_ring(ring: np.ndarray, max_points: int = RING_POINTS) -> tuple[str, int]:
+    """
+    Decimates and converts a ring for the feed.
+
+    Args:
+        ring (np.ndarray): (rho, phi, theta, intensity) points.
+        max_points (int): The most points to keep, evenly spaced around the
+            ring. Points without a return are dropped first.
+    Returns:
+        out (tuple[str, int]): The packed, base64 encoded points and their
+            count.
+    """
+
+    ring = ring[ring[:, 0] > 0]
+    if len(ring) > max_points:
+        ring = ring[np.linspace(0, len(ring) - 1, max_points).astype(np.int64)]
+    points = math_utils.sph_to_cart_np(ring)
+    packed: bytes = np.ascontiguousarray(points.T, dtype='<f4').tobytes()
+    return base64.b64encode(packed).decode(), len(points)
+
+
+class RingFeed:
+    """
+    Publishes a running scan's rings (the writer, on the rover).
+
+    Attributes:
+        snapshot (TelemetrySnapshot): The shared memory block.
+        recent (deque[dict]): The latest encoded rings of the current scan.
+    """
+
+    def __init__(self, name: str = SCAN_RINGS_NAME, size: int = SCAN_RINGS_SIZE) -> None:
+        self.snapshot = telemetry_utils.TelemetrySnapshot(name=name, size=size, create=True)
+        self.recent: deque[dict] = deque(maxlen=RINGS_PER_PUBLISH)
+        self._job: int | None = None
+
+    def publish(self, job_id: int, index: int, ring: np.ndarray) -> None:
+        """
+        Publishes one ring of a scan.
+
+        Args:
+            job_id (int): The scan job the ring belongs to. A new id starts a
+                new scan.
+            index (int): The ring's index in the scan.
+            ring (np.ndarray): The ring's (rho, phi, theta, intensity) points.
+        """
+
+        if job_id != self._job:
+            self._job = job_id
+            self.recent.clear()
+        data, count = encode_ring(ring)
+        self.recent.append({"index": index, "points": count, "data": data})
+        self.snapshot.publish({"job": job_id, "rings": list(self.recent)})
+
+    def close(self) -> None:
+        self.snapshot.close()
+
+
+class RingFeedCollector:
+    """
+    Collects every ring of the current scan from the feed (the reader, in
+    the web viewer) on a background thread.
+
+    Attributes:
+        job (int | None): The scan job being collected.
+        rings (list[dict]): Its rings in arrival order, as published.
+    """
+
+    def __init__(self, name: str = SCAN_RINGS_NAME) -> None:
+        self.name: str = name
+        self.job: int | None = None
+        self.rings: list[dict] = []
+        self._seen: set[int] = set()
+        self._lock = Lock()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        '''
+        Starts collecting. Has no effect if already started.
+        '''
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def since(self, job: int | None, count: int) -> tuple[int | None, list[dict]]:
+        """
+        Args:
+            job (int | None): The scan the caller has rings of.
+            count (int): How many of its rings the caller has.
+        Returns:
+            out (tuple[int | None, list[dict]]): The current scan, and its
+                rings after the first count, or all of them if the current
+                scan isn't job.
+        """
+        with self._lock:
+            if job != self.job:
+                return self.job, list(self.rings)
+            return self.job, self.rings[count:]
+
+    def _run(self) -> None:
+        snapshot = None
+        seq = 0
+        while True:
+            if snapshot is None:
+                try:
+                    snapshot = telemetry_utils.TelemetrySnapshot(name=self.name)
+                except FileNotFoundError:
+                    time.sleep(ATTACH_RETRY_S)
+                    continue
+                seq = 0
+                with self._lock:    # A restarted rover numbers its jobs from 1
+                    self.job, self.rings, self._seen = None, [], set()
+
+            try:
+                if snapshot.seq != seq:
+                    seq, feed = snapshot.read()
+                    if feed is not None:
+                        self._collect(feed)
+            except TimeoutError:
+                pass
+
+            # The rover removes the block when it exits
+            if not os.path.exists(f"/dev/shm/{self.name}"):
+                snapshot.close()
+                snapshot = None
+                continue
+            time.sleep(COLLECT_POLL_S)
+
+    def _collect(self, feed: dict) -> None:
+        with self._lock:
+            if feed["job"] != self.job:
+                self.job = feed["job"]
+                self.rings, self._seen = [], set()
+            for ring in feed["rings"]:
+                if ring["index"] not in self._seen and len(self.rings) < MAX_COLLECTED_RINGS:
+                    self._seen.add(ring["index"])
+                    self.rings.append(ring)
@@ -1,6 +1,9 @@
 # Serial Connection Utilities
 # Created on 6/26/2025
 
+import asyncio
+from serial import Serial
+
 UGV_BAUDRATE = 115200
 LIDAR_BAUDRATE = 921600
 
@@ -31,4 +34,80 @@ CRC_TABLE: list[int] = [
     0xbe, 0xf3, 0xaf, 0xe2, 0x35, 0x78, 0xd6, 0x9b, 0x4c, 0x01,
     0xf4, 0xb9, 0x6e, 0x23, 0x8d, 0xc0, 0x17, 0x5a, 0x06, 0x4b,
     0x9c, 0xd1, 0x7f, 0x32, 0xe5, 0xa8
-]
\ No newline at end of file
+]
+
+class AsyncSerial:
+    """
+    Asyncio wrapper around an open pyserial connection. Incoming bytes are
+    pulled off the port by an event loop reader callback (no thread, no
+    blocking read), and writes are serialized through a lock so that every
+    task sharing the port gets whole commands onto the wire.
+
+    Attributes:
+        serial (Serial): The wrapped, already open serial connection.
+        write_lock (asyncio.Lock): Serializes writers sharing the port.
+    """
+
+    def __init__(self, serial_conn: Serial) -> None:
+        """
+        Wraps the connection and registers its file descriptor with the
+        running event loop. Must be called from inside the loop.
+
+        Args:
+            serial_conn (Serial): An open serial connection.
+        """
+
+        self.serial: Serial = serial_conn
+        self.serial.timeout = 0             # Reader callback must not block
+        self.write_lock = asyncio.Lock()
+        self._rx = bytearray()
+        self._rx_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.serial.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        '''
+        Event loop callback: moves every waiting byte into the receive buffer.
+        '''
+        data: bytes = self.serial.read(max(1, self.serial.in_waiting))
+        if data:
+            self._rx.extend(data)
+            self._rx_event.set()
+
+    async def readline(self, expected: bytes = b'\n') -> bytes:
+        """
+        Waits for and returns the next line, terminator included.
+
+        Args:
+            expected (bytes): The line terminator. Defaults to b'\\n'.
+        Returns:
+            line (bytes): The received line.
+        """
+
+        while (idx := self._rx.find(expected)) < 0:
+            self._rx_event.clear()
+            await self._rx_event.wait()
+
+        line = bytes(self._rx[:idx + len(expected)])
+        del self._rx[:idx + len(expected)]
+        return line
+
+    async def write(self, data: bytes) -> int:
+        """
+        Writes data to the port without interleaving with other writers.
+
+        Args:
+            data (bytes): The bytes to write.
+        Returns:
+            written (int): The number of bytes written.
+        """
+
+        async with self.write_lock:
+            return self.serial.write(data) or 0
+
+    def close(self) -> None:
+        '''
+        Unregisters the port from the event loop and closes it.
+        '''
+        self._loop.remove_reader(self.serial.fileno())
+        self.serial.close()
@@ -0,0 +1,166 @@
+# Telemetry Utilities
+# Created 10/19/2026
+
+'''
+Publishes the freshest telemetry record so that other threads and processes
+(the autopilot, the web viewer, LED logic) don't have to parse the trip JSON to
+find out what the rover is doing right now.
+
+The record lives in a small multiprocessing.shared_memory block protected by a
+sequence lock:
+
+    [ seq (u64) | length (u32) | JSON payload ... ]
+
+The writer makes seq odd, writes the payload, then makes seq even again. A
+reader copies the payload between two reads of seq and retries if seq was odd
+or changed underneath it. Only one writer (the telemetry thread) is allowed.
+
+Readers in the writer's own process skip the shared memory entirely and get
+the last published (seq, record) tuple, which is swapped in atomically.
+
+The scan worker publishes the progress of the scan job it is running the same
+way, in a second block (SCAN_PROGRESS_NAME), once per ring, and the drive mode
+obstacle stream its latest histogram in a third (OBSTACLES_NAME). The scanner's
+metrics are published next to each record, in a fourth (METRICS_NAME), rather
+than inside it, so they aren't written to the trip JSON every second.
+'''
+
+from multiprocessing import resource_tracker, shared_memory
+import json
+import struct
+import time
+
+SNAPSHOT_NAME = "aegis_latest_telemetry"
+SCAN_PROGRESS_NAME = "aegis_scan_progress"   # Latest scan job, see ScanJob.to_dict()
+SCAN_PROGRESS_SIZE = 4096
+OBSTACLES_NAME = "aegis_obstacles"      # Latest ObstacleStream.histogram_summary()
+OBSTACLES_SIZE = 8192
+METRICS_NAME = "aegis_scanner_metrics"  # Latest Scanner.metrics_summary()
+METRICS_SIZE = 16384
+SNAPSHOT_SIZE = 16384                   # Bytes, a record is ~2 kB of JSON
+SNAPSHOT_HEADER = struct.Struct("<QI")  # seq, payload length
+READ_RETRIES = 100
+
+class TelemetrySnapshot:
+    """
+    A seqlock-protected, shared-memory copy of the latest telemetry record.
+
+    Attributes:
+        name (str): The name of the shared memory block.
+        is_writer (bool): Whether or not this object created the block and is
+            allowed to publish to it.
+        shm (SharedMemory): The shared memory block.
+    """
+
+    def __init__(self, name: str = SNAPSHOT_NAME, size: int = SNAPSHOT_SIZE,
+                 create: bool = False) -> None:
+        """
+        Creates (writer) or attaches to (reader) the shared memory block. A
+        writer reuses a block left behind by a previous run that didn't exit
+        cleanly.
+
+        Args:
+            name (str): The name of the shared memory block.
+            size (int): The size of the block in bytes. Only used on create.
+            create (bool): Whether or not to create the block as its writer.
+                Defaults to False.
+        Raises:
+            FileNotFoundError: If attaching to a block that doesn't exist yet.
+        """
+
+        self.name: str = name
+        self.is_writer: bool = create
+        self._latest: tuple[int, dict | None] = (0, None)
+
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=size)
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(name=name)
+            SNAPSHOT_HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Readers must not unlink the writer's block when they exit
+            resource_tracker.unregister(self.shm._name, "shared_memory") # type: ignore
+
+    @property
+    def seq(self) -> int:
+        '''
+        The sequence number of the current record. Increases by 2 per record.
+        '''
+        return SNAPSHOT_HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def publish(self, record: dict) -> int:
+        """
+        Publishes a new latest record.
+
+        Args:
+            record (dict): The telemetry record. Must be JSON serializable.
+        Returns:
+            seq (int): The sequence number of the published record.
+        Raises:
+            RuntimeError: If called on a reader.
+            ValueError: If the encoded record doesn't fit in the block.
+        """
+
+        if not self.is_writer:
+            raise RuntimeError("[ERR] telemetry_utils.py: Readers can't publish!")
+
+        payload: bytes = json.dumps(record).encode()
+        if len(payload) > self.shm.size - SNAPSHOT_HEADER.size:
+            raise ValueError(
+                f"[ERR] telemetry_utils.py: Record too large ({len(payload)} B)!")
+
+        seq: int = self._latest[0]
+        buf = self.shm.buf
+
+        SNAPSHOT_HEADER.pack_into(buf, 0, seq + 1, 0)       # Odd: write open
+        buf[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + len(payload)] = payload
+        SNAPSHOT_HEADER.pack_into(buf, 0, seq + 2, len(payload))
+
+        self._latest = (seq + 2, record)
+        return seq + 2
+
+    def read(self) -> tuple[int, dict | None]:
+        """
+        Reads the latest record without blocking the writer.
+
+        Returns:
+            out (tuple[int, dict | None]): The sequence number and the record,
+                or (0, None) if nothing has been published yet.
+        Raises:
+            TimeoutError: If a consistent copy couldn't be taken.
+        """
+
+        if self.is_writer:
+            return self._latest
+
+        buf = self.shm.buf
+        for _ in range(0, READ_RETRIES):
+            seq, length = SNAPSHOT_HEADER.unpack_from(buf, 0)
+            if seq % 2:
+                time.sleep(0)           # Writer mid-update, yield and retry
+                continue
+
+            payload = bytes(buf[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length])
+            if SNAPSHOT_HEADER.unpack_from(buf, 0)[0] != seq:
+                continue                # Header itself can be read torn
+            if seq == 0:
+                return 0, None
+
+            # A torn copy that slipped past the seq check won't decode
+            try:
+                return seq, json.loads(payload)
+            except ValueError:
+                continue
+
+        raise TimeoutError("[ERR] telemetry_utils.py: Snapshot kept changing!")
+
+    def close(self) -> None:
+        '''
+        Detaches from the block. The writer also removes it.
+        '''
+        self.shm.close()
+        if self.is_writer:
+            self.shm.unlink()